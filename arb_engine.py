@@ -0,0 +1,175 @@
+# arb_engine.py
+# Arbitraje de complementarios YES/NO sobre los books que ya descarga el scanner.
+#
+# YES + NO siempre pagan 1 entre los dos, así que:
+#   - BUY_BOTH:  comprar YES al ask + NO al ask, si askYes + askNo + fees < 1 - min_edge
+#   - SELL_BOTH: vender YES al bid + NO al bid (o mint 1 USDC -> YES+NO y vender),
+#                si bidYes + bidNo - fees > 1 + min_edge
+# (desigualdades estrictas: un par a exactamente 1.00 no es oportunidad)
+# Se recorre la profundidad de ambos libros nivel a nivel mientras el par siga
+# siendo rentable para obtener el tamaño máximo ejecutable y el edge total.
+#
+# No depende de scanner.py: recibe tops con .bids/.asks = ((precio, tamaño), ...)
+# ordenados de mejor a peor.
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+# =======================
+# CONFIG
+# =======================
+
+ARB_FEE_BPS = 0.0          # fee taker sobre el nocional de cada pata
+ARB_MIN_EDGE = 0.0         # edge mínimo por par (después de fees); se exige estrictamente mayor
+ARB_EDGE_EPS = 1e-9        # tolerancia float: un par a exactamente 1.00 no es arbitraje
+ARB_MIN_SIZE = 1.0         # tamaño mínimo (shares por pata) para emitir
+ARB_RECENT_EVENTS = 200
+ARB_MAX_BOOK_AGE_SEC = 1.0     # pata más vieja que esto => no se evalúa (spread fantasma)
+
+Levels = Sequence[Tuple[float, float]]
+
+
+@dataclass
+class ArbOpportunity:
+    market_id: str
+    side: str                  # "BUY_BOTH" | "SELL_BOTH"
+    size: float                # shares de cada pata
+    avg_pair_price: float      # precio medio YES+NO por par
+    edge_per_pair: float       # después de fees
+    edge_total: float          # edge_per_pair * size
+    levels_yes: int            # niveles consumidos del libro YES
+    levels_no: int
+    top_pair_price: float      # askYes+askNo (o bidYes+bidNo) en el mejor nivel
+    book_ts: float             # timestamp de los books evaluados
+    detected_ts: float         # time.time() al detectar
+    question: str = ""
+    legs: Dict = field(default_factory=dict)
+
+
+class ComplementArbEngine:
+    def __init__(
+        self,
+        fee_bps: float = ARB_FEE_BPS,
+        min_edge: float = ARB_MIN_EDGE,
+        min_size: float = ARB_MIN_SIZE,
+        recent_events: int = ARB_RECENT_EVENTS,
+        max_book_age: float = ARB_MAX_BOOK_AGE_SEC,
+    ):
+        self.fee_rate = float(fee_bps) / 10000.0
+        self.min_edge = float(min_edge)
+        self.min_size = float(min_size)
+        self.max_book_age = float(max_book_age)
+
+        self.listeners: List[Callable[[ArbOpportunity], None]] = []
+        self.recent: Deque[ArbOpportunity] = deque(maxlen=int(recent_events))
+
+        self.evaluated = 0
+        self.stale_skipped = 0
+        self.opportunities = 0
+        self.best: Optional[ArbOpportunity] = None
+
+    def _pair_edge(self, pair: float, buy: bool) -> float:
+        """
+        Edge de un par YES+NO después de fees (comprar por `pair` o venderlo).
+        """
+        if buy:
+            return 1.0 - pair * (1.0 + self.fee_rate)
+        return pair * (1.0 - self.fee_rate) - 1.0
+
+    def _profitable(self, pair: float, buy: bool) -> bool:
+        return self._pair_edge(pair, buy) > self.min_edge + ARB_EDGE_EPS
+
+    # ------------- DEPTH WALK -------------
+    def _walk(self, yes: Levels, no: Levels, buy: bool) -> Tuple[float, float, int, int]:
+        """
+        Empareja niveles YES/NO de mejor a peor mientras el par sea rentable.
+        Devuelve (size, valor total de los pares, niveles YES usados, niveles NO usados).
+        """
+        i = j = 0
+        rem_y = yes[0][1] if yes else 0.0
+        rem_n = no[0][1] if no else 0.0
+        size = 0.0
+        value = 0.0
+        used_y = used_n = 0
+
+        while i < len(yes) and j < len(no):
+            pair = yes[i][0] + no[j][0]
+            if not self._profitable(pair, buy):
+                break
+
+            q = min(rem_y, rem_n)
+            if q > 0:
+                size += q
+                value += q * pair
+                used_y = i + 1
+                used_n = j + 1
+            rem_y -= q
+            rem_n -= q
+            if rem_y <= 1e-12:
+                i += 1
+                rem_y = yes[i][1] if i < len(yes) else 0.0
+            if rem_n <= 1e-12:
+                j += 1
+                rem_n = no[j][1] if j < len(no) else 0.0
+
+        return size, value, used_y, used_n
+
+    # ------------- EVALUATE -------------
+    def evaluate(self, market_id: str, top_yes, top_no, book_ts: float, question: str = "") -> List[ArbOpportunity]:
+        """
+        Evalúa un mercado. Chequeo O(1) con el mejor nivel antes de recorrer profundidad.
+        book_ts = llegada del book más viejo de las dos patas; si supera max_book_age no se evalúa.
+        """
+        self.evaluated += 1
+        out: List[ArbOpportunity] = []
+        if time.time() - book_ts > self.max_book_age:
+            self.stale_skipped += 1
+            return out
+
+        ask_pair = top_yes.ask + top_no.ask
+        bid_pair = top_yes.bid + top_no.bid
+
+        if self._profitable(ask_pair, True) and top_yes.asks and top_no.asks:
+            opp = self._build(market_id, "BUY_BOTH", top_yes.asks, top_no.asks, ask_pair, book_ts, question)
+            if opp:
+                out.append(opp)
+
+        if self._profitable(bid_pair, False) and top_yes.bids and top_no.bids:
+            opp = self._build(market_id, "SELL_BOTH", top_yes.bids, top_no.bids, bid_pair, book_ts, question)
+            if opp:
+                out.append(opp)
+
+        for opp in out:
+            self.opportunities += 1
+            self.recent.append(opp)
+            if self.best is None or opp.edge_total > self.best.edge_total:
+                self.best = opp
+            for cb in self.listeners:
+                cb(opp)
+        return out
+
+    def _build(self, market_id: str, side: str, yes: Levels, no: Levels, top_pair: float,
+               book_ts: float, question: str) -> Optional[ArbOpportunity]:
+        buy = side == "BUY_BOTH"
+        size, value, ly, ln = self._walk(yes, no, buy)
+        if size < self.min_size or size <= 0:
+            return None
+        avg = value / size
+        edge = self._pair_edge(avg, buy)
+        return ArbOpportunity(
+            market_id=market_id,
+            side=side,
+            size=size,
+            avg_pair_price=avg,
+            edge_per_pair=edge,
+            edge_total=edge * size,
+            levels_yes=ly,
+            levels_no=ln,
+            top_pair_price=top_pair,
+            book_ts=book_ts,
+            detected_ts=time.time(),
+            question=question,
+            legs={"yes": tuple(yes[:ly]), "no": tuple(no[:ln])},
+        )
@@ -0,0 +1,330 @@
+# bench_scanner.py
+# Micro-benchmarks offline del pipeline del scanner sobre payloads grabados
+# (fixtures/). No toca las APIs de Polymarket.
+#
+# Uso:
+#   python bench_scanner.py                      # escala base + 5k events + 1k tokens
+#   python bench_scanner.py --scales base        # solo fixtures tal cual
+#   python bench_scanner.py --compare bench_results/anterior.json
+
+import argparse
+import copy
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ranking_index import RankingIndex
+from scanner import EventScannerGamma
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+GAMMA_FIXTURE = os.path.join(FIXTURES_DIR, "gamma_events.json")
+BOOKS_FIXTURE = os.path.join(FIXTURES_DIR, "clob_books.json")
+RESULTS_DIR = "bench_results"
+
+SCALE_EVENTS = 5000
+SCALE_TOKENS = 1000
+
+MIN_BENCH_SEC = 0.5
+MIN_REPEATS = 3
+
+
+# ---------------- FIXTURES ----------------
+def load_fixtures() -> Tuple[List[Dict], Dict[str, Dict]]:
+    with open(GAMMA_FIXTURE, "r", encoding="utf-8") as f:
+        events = json.load(f)
+    with open(BOOKS_FIXTURE, "r", encoding="utf-8") as f:
+        books = json.load(f)
+    return events, books
+
+
+def _new_token_id(tid: str, k: int) -> str:
+    # Mismo largo que un token id real, distinto por copia
+    return f"{k}{tid[len(str(k)):]}"
+
+
+def scale_events(events: List[Dict], n_events: int) -> List[Dict]:
+    """
+    Clona los events grabados (ids y token ids nuevos) hasta n_events.
+    """
+    out = []
+    k = 0
+    while len(out) < n_events:
+        for e in events:
+            if len(out) >= n_events:
+                break
+            e2 = copy.deepcopy(e)
+            e2["id"] = f"{e['id']}-{k}"
+            for m in e2.get("markets") or []:
+                m["id"] = f"{m['id']}-{k}"
+                try:
+                    tids = json.loads(m.get("clobTokenIds") or "[]")
+                    m["clobTokenIds"] = json.dumps([_new_token_id(t, k + 1) for t in tids])
+                except Exception:
+                    pass
+            out.append(e2)
+        k += 1
+    return out
+
+
+def scale_books(books: Dict[str, Dict], n_tokens: int) -> Dict[str, Dict]:
+    """
+    Clona los books grabados (token ids nuevos) hasta n_tokens.
+    """
+    out: Dict[str, Dict] = {}
+    k = 0
+    items = list(books.items())
+    while len(out) < n_tokens:
+        for tid, b in items:
+            if len(out) >= n_tokens:
+                break
+            new_tid = tid if k == 0 else _new_token_id(tid, k)
+            b2 = copy.deepcopy(b)
+            b2["asset_id"] = new_tid
+            out[new_tid] = b2
+        k += 1
+    return out
+
+
+def markets_for_books(books: Dict[str, Dict]) -> List[Dict]:
+    """
+    Construye markets sintéticos (pares YES/NO) que apuntan a los books dados,
+    para poder medir update_top_with_books sobre N tokens.
+    """
+    tids = list(books.keys())
+    markets = []
+    for i in range(0, len(tids) - 1, 2):
+        markets.append({
+            "id": f"bench-{i // 2}",
+            "question": f"Bench market {i // 2}",
+            "outcomes": "[\"Yes\", \"No\"]",
+            "outcomePrices": "[\"0.5\", \"0.5\"]",
+            "clobTokenIds": json.dumps([tids[i], tids[i + 1]]),
+            "liquidityNum": 10000.0,
+            "volumeNum": 50000.0,
+        })
+    return markets
+
+
+# ---------------- SCANNER OFFLINE ----------------
+def make_offline_scanner(books: Dict[str, Dict], n_markets: int) -> EventScannerGamma:
+    scanner = EventScannerGamma(
+        min_liquidity=0,
+        min_volume=0,
+        categories=None,
+        multi_outcome=False,
+        top_n_orderbook=n_markets,
+        orderbook_cooldown=0.0,
+    )
+    # Books servidos desde fixtures en vez de CLOB
+    scanner.fetch_orderbook = books.get
+    return scanner
+
+
+# ---------------- TIMING ----------------
+def bench(fn: Callable[[], int], min_sec: float = MIN_BENCH_SEC) -> Dict:
+    """
+    Ejecuta fn() repetidamente durante min_sec. fn devuelve cuántos items procesó.
+    Luego una pasada extra con tracemalloc para medir allocations.
+    """
+    fn()  # warm-up
+
+    calls = 0
+    items = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_sec or calls < MIN_REPEATS:
+        items += fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    diff = after.compare_to(before, "filename")
+    alloc_blocks = sum(d.count_diff for d in diff if d.count_diff > 0)
+    alloc_bytes = sum(d.size_diff for d in diff if d.size_diff > 0)
+
+    items_per_call = items / calls if calls else 0
+    return {
+        "calls": calls,
+        "seconds": round(elapsed, 4),
+        "ops_per_sec": round(calls / elapsed, 2) if elapsed > 0 else 0.0,
+        "items_per_call": items_per_call,
+        "items_per_sec": round(items / elapsed, 2) if elapsed > 0 else 0.0,
+        "us_per_item": round(elapsed / items * 1e6, 3) if items else None,
+        "peak_kib": round(peak / 1024.0, 1),
+        "retained_blocks": alloc_blocks,
+        "retained_kib": round(alloc_bytes / 1024.0, 1),
+    }
+
+
+# ---------------- STAGES ----------------
+def run_stages(events: List[Dict], books: Dict[str, Dict], min_sec: float) -> Dict[str, Dict]:
+    book_markets = markets_for_books(books)
+    scanner = make_offline_scanner(books, len(book_markets))
+
+    filtered = scanner.filter_markets(events)
+    book_list = list(books.values())
+
+    def st_filter():
+        scanner.filter_markets(events)
+        return len(events)
+
+    def st_parse_outcomes():
+        for m in filtered:
+            scanner.parse_outcomes(m)
+        return len(filtered)
+
+    def st_token_ids():
+        for m in filtered:
+            scanner.get_yes_no_token_ids(m)
+        return len(filtered)
+
+    def st_score():
+        for m in filtered:
+            scanner.market_score(m)
+        return len(filtered)
+
+    def st_rank_full():
+        scored = [(scanner.market_score(m), m) for m in filtered]
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return len(filtered)
+
+    ranking = RankingIndex()
+    ranking.update(filtered, scanner.market_score)
+
+    def st_rank_incremental():
+        # Refresh sin cambios en Gamma: solo fingerprints + slice del top-N
+        ranking.update(filtered, scanner.market_score)
+        ranking.top(scanner.top_n_orderbook)
+        return len(filtered)
+
+    def st_best_bid_ask():
+        for b in book_list:
+            scanner.best_bid_ask(b)
+        return len(book_list)
+
+    def st_update_top():
+        scanner.update_top_with_books(book_markets)
+        return len(book_markets)
+
+    stages = {
+        "filter_markets": st_filter,
+        "parse_outcomes": st_parse_outcomes,
+        "get_yes_no_token_ids": st_token_ids,
+        "market_score": st_score,
+        "rank_full_sort": st_rank_full,
+        "rank_incremental": st_rank_incremental,
+        "best_bid_ask": st_best_bid_ask,
+        "update_top_with_books": st_update_top,
+    }
+
+    out = {}
+    for name, fn in stages.items():
+        out[name] = bench(fn, min_sec)
+    out["_sizes"] = {
+        "events": len(events),
+        "markets_filtered": len(filtered),
+        "books": len(books),
+        "book_markets": len(book_markets),
+    }
+    return out
+
+
+# ---------------- REPORT ----------------
+def git_rev() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def print_results(results: Dict[str, Dict], baseline: Optional[Dict] = None):
+    for scale, stages in results.items():
+        sizes = stages.get("_sizes", {})
+        print("=" * 95)
+        print(f"📦 Escala: {scale} | {sizes}")
+        print("-" * 95)
+        print(f"{'stage':<24}{'ops/s':>12}{'items/s':>14}{'us/item':>10}{'peak KiB':>11}{'blocks':>9}{'Δ ops/s':>12}")
+        for name, r in stages.items():
+            if name.startswith("_"):
+                continue
+            delta = ""
+            if baseline:
+                old = (baseline.get(scale) or {}).get(name)
+                if old and old.get("ops_per_sec"):
+                    delta = f"{(r['ops_per_sec'] / old['ops_per_sec'] - 1.0) * 100:+.1f}%"
+            print(
+                f"{name:<24}{r['ops_per_sec']:>12.1f}{r['items_per_sec']:>14.0f}"
+                f"{(r['us_per_item'] or 0):>10.2f}{r['peak_kib']:>11.1f}{r['retained_blocks']:>9}{delta:>12}"
+            )
+    print("=" * 95)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks offline del scanner")
+    ap.add_argument("--scales", default="base,events5k,tokens1k",
+                    help="Escalas separadas por coma: base, events5k, tokens1k")
+    ap.add_argument("--min-sec", type=float, default=MIN_BENCH_SEC)
+    ap.add_argument("--out", default=None, help="Fichero JSON de resultados")
+    ap.add_argument("--compare", default=None, help="JSON de una ejecución anterior")
+    args = ap.parse_args(argv)
+
+    events, books = load_fixtures()
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+
+    results = {}
+    for scale in scales:
+        if scale == "base":
+            ev, bk = events, books
+        elif scale == "events5k":
+            ev, bk = scale_events(events, SCALE_EVENTS), books
+        elif scale == "tokens1k":
+            ev, bk = events, scale_books(books, SCALE_TOKENS)
+        else:
+            print(f"[Bench] Escala desconocida: {scale}")
+            continue
+        print(f"[Bench] Ejecutando escala {scale}...")
+        results[scale] = run_stages(ev, bk, args.min_sec)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results")
+
+    print_results(results, baseline)
+
+    out_path = args.out
+    if out_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out_path = os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+
+    payload = {
+        "ts": time.time(),
+        "git_rev": git_rev(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "min_sec": args.min_sec,
+        "results": results,
+    }
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(f"[Bench] Resultados guardados en {out_path}")
+
+
+if __name__ == "__main__":
+    main()
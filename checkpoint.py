@@ -0,0 +1,142 @@
+# checkpoint.py
+# Checkpoint binario (pickle) del estado completo del scanner y de los bots.
+#
+# Cada componente registrado implementa:
+#   checkpoint_state() -> dict      (copia consistente, tomada bajo su lock)
+#   restore_checkpoint(state)       (al arrancar, antes de lanzar threads)
+# El fichero se escribe de forma atómica (tmp + rename) al parar y, opcionalmente,
+# cada interval_sec en un thread de fondo.
+#
+# Uso:
+#   ckpt = Checkpointer(CHECKPOINT_PATH, interval_sec=60)
+#   ckpt.add("scanner", scanner)
+#   ckpt.add("momentum", bot)
+#   ckpt.restore()
+#   ckpt.start()
+#   ...
+#   ckpt.stop()     # último checkpoint
+
+import os
+import pickle
+import threading
+import time
+from typing import Dict, Optional
+
+# =======================
+# CONFIG
+# =======================
+
+CHECKPOINT_PATH = os.environ.get("SCANNER_CHECKPOINT", "scanner_checkpoint.pkl")
+CHECKPOINT_INTERVAL_SEC = 60.0      # 0 = solo al parar
+CHECKPOINT_MAX_AGE_SEC = 3600.0     # checkpoint más viejo => se ignora
+CHECKPOINT_VERSION = 2
+
+
+class Checkpointer:
+    def __init__(
+        self,
+        path: str = CHECKPOINT_PATH,
+        interval_sec: float = CHECKPOINT_INTERVAL_SEC,
+        max_age_sec: float = CHECKPOINT_MAX_AGE_SEC,
+    ):
+        self.path = path
+        self.interval_sec = float(interval_sec)
+        self.max_age_sec = float(max_age_sec)
+        self.components: Dict[str, object] = {}
+
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.save_lock = threading.Lock()
+
+        # Stats
+        self.saves = 0
+        self.last_save_ms = 0.0
+        self.last_save_bytes = 0
+
+    def add(self, name: str, component) -> "Checkpointer":
+        self.components[name] = component
+        return self
+
+    # ------------- SAVE -------------
+    def save(self) -> int:
+        start = time.time()
+        payload = {
+            "version": CHECKPOINT_VERSION,
+            "saved_ts": start,
+            "state": {name: c.checkpoint_state() for name, c in self.components.items()},
+        }
+        raw = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.save_lock:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, self.path)
+        self.saves += 1
+        self.last_save_bytes = len(raw)
+        self.last_save_ms = (time.time() - start) * 1000.0
+        return len(raw)
+
+    # ------------- RESTORE -------------
+    def restore(self) -> bool:
+        """
+        Restaura los componentes presentes en el checkpoint. False si no hay / no vale.
+        """
+        start = time.time()
+        try:
+            with open(self.path, "rb") as f:
+                payload = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"⚠️ Checkpoint ilegible ({self.path}): {e}")
+            return False
+
+        if not isinstance(payload, dict) or payload.get("version") != CHECKPOINT_VERSION:
+            print("⚠️ Checkpoint de otra versión: se ignora")
+            return False
+        age = start - float(payload.get("saved_ts") or 0.0)
+        if age > self.max_age_sec:
+            print(f"🧊 Checkpoint descartado: {age:.0f}s de antigüedad")
+            return False
+
+        state = payload.get("state") or {}
+        restored = []
+        for name, c in self.components.items():
+            if name in state:
+                c.restore_checkpoint(state[name])
+                restored.append(name)
+
+        print(
+            f"♻️ Checkpoint restaurado ({', '.join(restored) or 'nada'}) | "
+            f"de hace {age:.0f}s | {(time.time() - start) * 1000.0:.0f} ms"
+        )
+        return bool(restored)
+
+    # ------------- BACKGROUND -------------
+    def _loop(self):
+        while not self.stop_event.wait(self.interval_sec):
+            self._safe_save()
+
+    def _safe_save(self) -> bool:
+        try:
+            self.save()
+            return True
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el checkpoint: {e}")
+            return False
+
+    def start(self) -> "Checkpointer":
+        if self.interval_sec > 0 and self.thread is None:
+            self.thread = threading.Thread(target=self._loop, name="checkpoint", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        """
+        Para el thread de fondo y escribe el checkpoint final.
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+        if self._safe_save():
+            print(f"💾 Checkpoint guardado: {self.last_save_bytes / 1024:.0f} KiB en {self.last_save_ms:.0f} ms")
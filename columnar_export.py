@@ -0,0 +1,417 @@
+# columnar_export.py
+# Export columnar (Parquet) de ticks del scanner para análisis offline / backtests.
+#
+# Layout (particionado hive, legible con pyarrow.dataset / pandas / duckdb):
+#   <out>/ticks/date=YYYY-MM-DD/part-<sesión>-<n>.parquet
+#   <out>/markets.parquet        1 fila por mercado: pregunta, token ids, rango de ts, filas
+#
+# Columnas de ticks: market_id + SNAPSHOT_FIELDS (shm_ring.py, features rolling incluidas),
+# todas float64 salvo market_id; None => null. Un fichero por día y sesión (no por
+# mercado: con miles de mercados vivos serían miles de ficheros diminutos); dentro de
+# cada row group las filas van ordenadas por market_id, así que las estadísticas
+# min/max del row group sirven para filtrar por mercado.
+#
+# Fuentes:
+#   - history en vivo: attach(scanner) encola cada snapshot y un thread escribe
+#     (nunca se escribe disco bajo el lock del scanner)
+#   - history en memoria: export_history(scanner.history)
+#   - logs grabados: JSONL (.jsonl / .jsonl.gz, un snapshot por línea con market_id),
+#     cache de arranque (warm_cache.py, .json) o checkpoint (checkpoint.py, .pkl)
+#
+# Memoria acotada: cada día acumula hasta rows_per_group filas (columnas array('d')
+# por mercado, NaN = null) antes de escribir un row group, con un tope global de
+# max_buffered_rows; como mucho max_open_files ficheros abiertos (LRU por día; al
+# reabrir un día se empieza otro part-*.parquet).
+#
+# Lectura de un día / de un mercado:
+#   import pyarrow.dataset as ds
+#   d = ds.dataset("ticks_export/ticks", format="parquet", partitioning="hive")
+#   t = d.to_table(filter=ds.field("date") == "2026-10-19")
+#   t = d.to_table(filter=ds.field("market_id") == "<market_id>")
+#
+# Uso:
+#   python columnar_export.py --out ticks_export scanner_checkpoint.pkl ticks.jsonl.gz
+#   python columnar_export.py --out ticks_export --live      # scanner en vivo hasta Ctrl+C
+
+import argparse
+import array
+import gzip
+import json
+import os
+import pickle
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from shm_ring import SNAPSHOT_FIELDS
+
+# =======================
+# CONFIG
+# =======================
+
+EXPORT_DIR = "ticks_export"
+EXPORT_ROWS_PER_GROUP = 5000        # filas por row group (y por buffer de día)
+EXPORT_MAX_OPEN_FILES = 256
+EXPORT_MAX_BUFFERED_ROWS = 200_000  # tope global de filas en memoria (~8 B por campo) => flush de todo
+EXPORT_QUEUE_MAX = 200_000          # cola del modo en vivo; llena => se descartan ticks
+EXPORT_COMPRESSION = "zstd"
+
+META_FIELDS = ("market_id", "question", "yes_token_id", "no_token_id",
+               "liquidity", "volume", "first_ts", "last_ts", "rows")
+
+
+NAN = float("nan")
+
+
+def _partition_date(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+
+class TickExporter:
+    def __init__(
+        self,
+        out_dir: str = EXPORT_DIR,
+        rows_per_group: int = EXPORT_ROWS_PER_GROUP,
+        max_open_files: int = EXPORT_MAX_OPEN_FILES,
+        max_buffered_rows: int = EXPORT_MAX_BUFFERED_ROWS,
+        fields: Sequence[str] = SNAPSHOT_FIELDS,
+        compression: str = EXPORT_COMPRESSION,
+    ):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("columnar_export requiere pyarrow (pip install pyarrow)")
+        self._pa = pa
+        self._pq = pq
+
+        self.out_dir = out_dir
+        self.ticks_dir = os.path.join(out_dir, "ticks")
+        self.rows_per_group = max(1, int(rows_per_group))
+        self.max_open_files = max(1, int(max_open_files))
+        self.max_buffered_rows = max(self.rows_per_group, int(max_buffered_rows))
+        self.fields = tuple(fields)
+        self.compression = compression
+        self.schema = pa.schema(
+            [pa.field("market_id", pa.string())] + [pa.field(f, pa.float64()) for f in self.fields]
+        )
+        # Sesión en el nombre de fichero: varias ejecuciones sobre el mismo out_dir no se pisan
+        self.session = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+
+        self.lock = threading.Lock()
+        # date -> market_id -> una columna array('d') por campo
+        self.buffers: Dict[str, Dict[str, List[array.array]]] = {}
+        self.date_rows: Dict[str, int] = {}
+        self.buffered = 0
+        self.writers: "OrderedDict[str, object]" = OrderedDict()
+        self.parts: Dict[str, int] = {}
+        self.meta: Dict[str, Dict] = {}
+
+        # Modo en vivo
+        self.queue: "queue.Queue" = queue.Queue(maxsize=EXPORT_QUEUE_MAX)
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+
+        # Stats
+        self.rows = 0
+        self.row_groups = 0
+        self.files = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.errors = 0             # ticks del modo en vivo que fallaron al añadirse/escribirse
+        self.last_error: Optional[str] = None
+
+    # ------------- INGEST -------------
+    def add(self, market_id: str, snap: Dict):
+        ts = snap.get("ts")
+        if ts is None:
+            self.skipped += 1
+            return
+        market_id = str(market_id)
+        date = _partition_date(ts)
+
+        with self.lock:
+            day = self.buffers.get(date)
+            if day is None:
+                day = self.buffers[date] = {}
+            cols = day.get(market_id)
+            if cols is None:
+                cols = day[market_id] = [array.array("d") for _ in self.fields]
+            for col, f in zip(cols, self.fields):
+                col.append(_as_float(snap.get(f)))
+            rows = self.date_rows[date] = self.date_rows.get(date, 0) + 1
+            self.buffered += 1
+            self._update_meta(market_id, snap, ts)
+
+            if rows >= self.rows_per_group:
+                self._flush_date(date)
+            elif self.buffered >= self.max_buffered_rows:
+                self._flush_all()
+
+    def export_history(self, history: Dict[str, List[Dict]]) -> int:
+        n = 0
+        for market_id, snaps in history.items():
+            for snap in snaps:
+                self.add(market_id, snap)
+                n += 1
+        return n
+
+    def export_file(self, path: str) -> int:
+        n = 0
+        for market_id, snap in iter_snapshot_log(path):
+            self.add(market_id, snap)
+            n += 1
+        return n
+
+    def _update_meta(self, market_id: str, snap: Dict, ts: float):
+        m = self.meta.get(market_id)
+        if m is None:
+            m = self.meta[market_id] = {"market_id": market_id, "first_ts": ts, "last_ts": ts, "rows": 0}
+        m["rows"] += 1
+        m["first_ts"] = min(m["first_ts"], ts)
+        m["last_ts"] = max(m["last_ts"], ts)
+        for k in ("question", "yes_token_id", "no_token_id", "liquidity", "volume"):
+            v = snap.get(k)
+            if v is not None:
+                m[k] = v
+
+    # ------------- WRITE -------------
+    def _writer(self, date: str):
+        w = self.writers.get(date)
+        if w is not None:
+            self.writers.move_to_end(date)
+            return w
+        if len(self.writers) >= self.max_open_files:
+            _, old = self.writers.popitem(last=False)
+            old.close()
+
+        part_dir = os.path.join(self.ticks_dir, f"date={date}")
+        os.makedirs(part_dir, exist_ok=True)
+        n = self.parts.get(date, 0)
+        self.parts[date] = n + 1
+        path = os.path.join(part_dir, f"part-{self.session}-{n}.parquet")
+        w = self._pq.ParquetWriter(path, self.schema, compression=self.compression)
+        self.writers[date] = w
+        self.files += 1
+        return w
+
+    def _flush_date(self, date: str):
+        """
+        Escribe lo acumulado de un día como row group(s), mercados en orden de market_id.
+        """
+        day = self.buffers.pop(date, None)
+        n = self.date_rows.pop(date, 0)
+        if not day:
+            return
+        self.buffered -= n
+        ids: List[str] = []
+        merged = [array.array("d") for _ in self.fields]
+        for market_id in sorted(day):
+            cols = day[market_id]
+            ids.extend([market_id] * len(cols[0]))
+            for out, col in zip(merged, cols):
+                out.extend(col)
+        pa = self._pa
+        arrays = [pa.array(ids, pa.string())]
+        arrays += [pa.array(col, pa.float64(), from_pandas=True) for col in merged]
+        table = pa.Table.from_arrays(arrays, schema=self.schema)
+        self._writer(date).write_table(table, row_group_size=self.rows_per_group)
+        self.rows += n
+        self.row_groups += -(-n // self.rows_per_group)
+
+    def _flush_all(self):
+        for date in list(self.buffers.keys()):
+            self._flush_date(date)
+
+    def flush(self):
+        with self.lock:
+            self._flush_all()
+
+    def write_markets(self) -> int:
+        """
+        markets.parquet: fusiona con el de exports anteriores en el mismo out_dir.
+        """
+        path = os.path.join(self.out_dir, "markets.parquet")
+        merged: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            for row in self._pq.read_table(path).to_pylist():
+                merged[row["market_id"]] = row
+        for market_id, m in self.meta.items():
+            old = merged.get(market_id)
+            row = {f: m.get(f) for f in META_FIELDS}
+            if old is not None:
+                row["first_ts"] = min(old["first_ts"], row["first_ts"])
+                row["last_ts"] = max(old["last_ts"], row["last_ts"])
+                row["rows"] = old["rows"] + row["rows"]
+                for f in META_FIELDS:
+                    if row[f] is None:
+                        row[f] = old.get(f)
+            merged[market_id] = row
+
+        pa = self._pa
+        schema = pa.schema([
+            pa.field("market_id", pa.string()),
+            pa.field("question", pa.string()),
+            pa.field("yes_token_id", pa.string()),
+            pa.field("no_token_id", pa.string()),
+            pa.field("liquidity", pa.float64()),
+            pa.field("volume", pa.float64()),
+            pa.field("first_ts", pa.float64()),
+            pa.field("last_ts", pa.float64()),
+            pa.field("rows", pa.int64()),
+        ])
+        rows = list(merged.values())
+        table = pa.Table.from_pydict({f: [r.get(f) for r in rows] for f in META_FIELDS}, schema=schema)
+        os.makedirs(self.out_dir, exist_ok=True)
+        tmp = f"{path}.tmp"
+        self._pq.write_table(table, tmp, compression=self.compression)
+        os.replace(tmp, path)
+        return len(rows)
+
+    def close(self):
+        """
+        Para el modo en vivo (drenando la cola), escribe lo pendiente y la tabla de mercados.
+        """
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+        with self.lock:
+            self._flush_all()
+            for w in self.writers.values():
+                w.close()
+            self.writers.clear()
+        self.write_markets()
+
+    # ------------- LIVE -------------
+    def attach(self, scanner) -> "TickExporter":
+        """
+        Exporta cada snapshot nuevo del scanner. El listener solo encola (corre bajo el lock del scanner).
+        """
+        def _on_snapshot(market_id: str, snap: Dict):
+            try:
+                self.queue.put_nowait((market_id, snap))
+            except queue.Full:
+                self.dropped += 1
+
+        scanner.snapshot_listeners.append(_on_snapshot)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._drain, name="tick-export", daemon=True)
+            self.thread.start()
+        return self
+
+    def _drain(self):
+        while not (self.stop_event.is_set() and self.queue.empty()):
+            try:
+                market_id, snap = self.queue.get(timeout=0.25)
+            except queue.Empty:
+                continue
+            # Un tick que falla (disco lleno, valor raro...) se cuenta; el thread sigue drenando
+            try:
+                self.add(market_id, snap)
+            except Exception as e:
+                self.errors += 1
+                if self.last_error is None:
+                    print(f"⚠️ [export] error exportando tick de {market_id}: {e!r}")
+                self.last_error = repr(e)
+
+    # ------------- STATS -------------
+    def stats(self) -> Dict:
+        return {
+            "rows": self.rows,
+            "buffered": self.buffered,
+            "row_groups": self.row_groups,
+            "files": self.files,
+            "open_files": len(self.writers),
+            "markets": len(self.meta),
+            "queued": self.queue.qsize(),
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
+
+
+def _as_float(x) -> float:
+    if x is None:
+        return NAN
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return NAN
+
+
+# ---------------- LOGS GRABADOS ----------------
+def iter_snapshot_log(path: str) -> Iterator[Tuple[str, Dict]]:
+    """
+    (market_id, snap) de un log grabado. JSONL se lee en streaming; la cache de
+    arranque y el checkpoint se cargan enteros (ya están acotados por max_snapshots).
+    """
+    name = path.lower()
+    if name.endswith((".jsonl", ".jsonl.gz", ".ndjson", ".ndjson.gz")):
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                snap = json.loads(line)
+                yield str(snap.get("market_id") or "unknown"), snap
+        return
+
+    if name.endswith(".pkl"):
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        history = ((payload.get("state") or {}).get("scanner") or {}).get("history") or {}
+    else:
+        with open(path, "rb") as f:
+            payload = json.loads(f.read())
+        history = payload.get("history") or {}
+
+    for market_id, snaps in history.items():
+        for snap in snaps:
+            yield str(market_id), snap
+
+
+# ---------------- MAIN ----------------
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export columnar (Parquet) de ticks del scanner")
+    ap.add_argument("inputs", nargs="*", help="Logs .jsonl[.gz], cache de arranque .json o checkpoint .pkl")
+    ap.add_argument("--out", default=EXPORT_DIR)
+    ap.add_argument("--rows-per-group", type=int, default=EXPORT_ROWS_PER_GROUP)
+    ap.add_argument("--live", action="store_true", help="Exportar el scanner en vivo hasta Ctrl+C")
+    args = ap.parse_args()
+
+    exporter = TickExporter(args.out, rows_per_group=args.rows_per_group)
+    start = time.time()
+
+    for path in args.inputs:
+        t0 = time.time()
+        n = exporter.export_file(path)
+        print(f"📥 {path}: {n} snapshots ({(time.time() - t0) * 1000.0:.0f} ms)")
+
+    if args.live:
+        from scanner import EventScannerGamma, WARM_CACHE_PATH
+
+        scanner = EventScannerGamma(warm_cache_path=WARM_CACHE_PATH)
+        exporter.attach(scanner)
+        scan_thread = threading.Thread(target=scanner.live_scan, daemon=True)
+        scan_thread.start()
+        print(f"🔴 Exportando ticks en vivo a {args.out} (Ctrl+C para parar)")
+        try:
+            while True:
+                time.sleep(5.0)
+                s = exporter.stats()
+                print(f"🧾 filas {s['rows']} | buffer {s['buffered']} | ficheros {s['files']} | "
+                      f"cola {s['queued']} | descartados {s['dropped']} | errores {s['errors']}")
+        except KeyboardInterrupt:
+            scanner.stop()
+            scan_thread.join(timeout=2)
+
+    exporter.close()
+    s = exporter.stats()
+    print(
+        f"💾 Export: {s['rows']} filas | {s['markets']} mercados | {s['files']} ficheros | "
+        f"{s['row_groups']} row groups | {(time.time() - start):.1f}s -> {args.out}"
+    )
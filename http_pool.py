@@ -0,0 +1,222 @@
+# http_pool.py
+# Transporte HTTP del scanner con pool de conexiones dimensionado a la concurrencia.
+#
+# requests.Session() trae un HTTPAdapter con pool_maxsize=10: con 16 workers de
+# CLOB las conexiones que sobran se descartan al devolverse y el siguiente loop
+# abre otras nuevas (TCP + handshake TLS dentro de la latencia del loop).
+# Aquí:
+#   - pool_maxsize = workers y pool_block=True (nunca se abren conexiones de más)
+#   - prewarm(): abre todas las conexiones en paralelo antes del primer loop
+#   - opcional HTTP/2 (httpx + h2): todos los books multiplexados en pocas conexiones
+#   - stats: requests, conexiones nuevas (= handshakes), reuso
+#
+# Uso:
+#   pool = HttpPool(16, http2=False)
+#   pool.prewarm("https://clob.polymarket.com/")
+#   raw = pool.get(url, params={...}, headers={...}, timeout=2.5)   # bytes o None
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# =======================
+# CONFIG
+# =======================
+
+HTTP_POOL_HOSTS = 4             # pools por host que guarda el adapter
+HTTP_PREWARM_TIMEOUT = 5.0
+
+
+def base_url(url: str) -> str:
+    """
+    https://host/path?x => https://host/
+    """
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+class HttpPool:
+    def __init__(self, pool_size: int, http2: bool = False, name: str = "http"):
+        self.pool_size = max(1, int(pool_size))
+        self.name = name
+        self.lock = threading.Lock()
+
+        self.client = None
+        self.session = None
+        self.http2 = False
+        if http2:
+            try:
+                import httpx
+                import h2  # noqa: F401  (httpx necesita h2 para http2=True)
+
+                self.client = httpx.Client(
+                    http2=True,
+                    limits=httpx.Limits(
+                        max_connections=self.pool_size,
+                        max_keepalive_connections=self.pool_size,
+                    ),
+                )
+                self._httpx_error = httpx.HTTPError
+                self.http2 = True
+            except ImportError:
+                print(f"⚠️ [{name}] HTTP/2 pedido pero falta httpx[http2]; se usa requests (HTTP/1.1)")
+
+        if self.client is None:
+            self.session = requests.Session()
+            self._mount_adapter()
+
+        # Stats
+        self.requests = 0
+        self.errors = 0
+        self.h2_responses = 0
+        self._connects = 0          # httpx (trace)
+        self._tls = 0
+        self.prewarmed = 0
+        self.prewarm_ms = 0.0
+
+    def _mount_adapter(self):
+        self.adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_HOSTS,
+            pool_maxsize=self.pool_size,
+            pool_block=True,
+        )
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def resize(self, pool_size: int):
+        """
+        Cambia el tope de conexiones (p.ej. load_controller sube los workers).
+        Con requests se monta un adapter nuevo y se cierra el viejo (sus conexiones,
+        incluidas las pre-abiertas, se pierden): mejor dar el tamaño final en el
+        constructor, antes de prewarm(). Con HTTP/2 no hace falta (los streams se
+        multiplexan en las conexiones existentes).
+        """
+        pool_size = max(1, int(pool_size))
+        if pool_size == self.pool_size:
+            return
+        self.pool_size = pool_size
+        if self.session is not None:
+            old = self.adapter
+            self._mount_adapter()
+            old.close()
+
+    # ------------- REQUEST -------------
+    def _trace(self, event: str, info: Dict):
+        if event == "connection.connect_tcp.complete":
+            with self.lock:
+                self._connects += 1
+        elif event == "connection.start_tls.complete":
+            with self.lock:
+                self._tls += 1
+
+    def get(self, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+            timeout: float = 5.0) -> Optional[bytes]:
+        """
+        GET -> cuerpo en bytes; None si falla o el status no es 2xx.
+        """
+        with self.lock:
+            self.requests += 1
+        try:
+            if self.client is not None:
+                r = self.client.get(url, params=params, headers=headers, timeout=timeout,
+                                    extensions={"trace": self._trace})
+                r.raise_for_status()
+                if r.http_version == "HTTP/2":
+                    with self.lock:
+                        self.h2_responses += 1
+                return r.content
+
+            r = self.session.get(url, params=params, headers=headers, timeout=timeout)
+            r.raise_for_status()
+            return r.content
+        except requests.RequestException:
+            pass
+        except Exception as e:
+            if self.client is None or not isinstance(e, self._httpx_error):
+                raise
+        with self.lock:
+            self.errors += 1
+        return None
+
+    # ------------- PREWARM -------------
+    def prewarm(self, url: str, connections: Optional[int] = None) -> int:
+        """
+        Abre `connections` conexiones (por defecto pool_size; 1 con HTTP/2) a la vez
+        contra `url`, para que el handshake no caiga en el primer loop.
+        Cuenta como abierta aunque la respuesta no sea 2xx.
+        """
+        n = connections if connections is not None else (1 if self.http2 else self.pool_size)
+        n = max(1, min(int(n), self.pool_size))
+        before = self.stats()["connections"]
+        with self.lock:
+            counted = (self.requests, self.errors)
+        start = time.time()
+
+        barrier = threading.Barrier(n)
+
+        def _open(_):
+            try:
+                barrier.wait(HTTP_PREWARM_TIMEOUT)
+            except threading.BrokenBarrierError:
+                pass
+            self.get(url, timeout=HTTP_PREWARM_TIMEOUT)
+
+        with ThreadPoolExecutor(max_workers=n) as ex:
+            list(ex.map(_open, range(n)))
+
+        self.prewarm_ms = (time.time() - start) * 1000.0
+        # Las requests de calentamiento no cuentan como requests / errores del scanner
+        with self.lock:
+            self.requests, self.errors = counted
+        self.prewarmed = self.stats()["connections"] - before
+        return self.prewarmed
+
+    # ------------- STATS -------------
+    def _urllib3_counts(self):
+        """
+        (conexiones, handshakes TLS, requests) sumando los pools vivos del adapter.
+        """
+        pools = self.adapter.poolmanager.pools
+        connections = tls = sent = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            n = getattr(pool, "num_connections", 0)
+            connections += n
+            sent += getattr(pool, "num_requests", 0)
+            if getattr(pool, "scheme", "") == "https":
+                tls += n
+        return connections, tls, sent
+
+    def stats(self) -> Dict:
+        if self.client is not None:
+            connections, handshakes = self._connects, self._tls
+            sent = max(self.requests - self.errors, connections)
+        else:
+            connections, handshakes, sent = self._urllib3_counts()
+        reused = max(0, sent - connections)
+        return {
+            "http2": self.http2,
+            "pool_size": self.pool_size,
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections": connections,
+            "handshakes": handshakes,
+            "reused": reused,
+            "reuse_pct": (100.0 * reused / sent) if sent > 0 else 0.0,
+            "h2_responses": self.h2_responses,
+            "prewarmed": self.prewarmed,
+            "prewarm_ms": self.prewarm_ms,
+        }
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+        if self.session is not None:
+            self.session.close()
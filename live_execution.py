@@ -0,0 +1,293 @@
+# live_execution.py
+# Camino de ejecución de baja latencia para las estrategias (MomentumMicroBot).
+#
+# Todo lo que no depende de la señal se hace antes de que llegue:
+#   - plantillas por token (tick size, neg_risk, fee, opciones del order builder)
+#     construidas en background cuando el token aparece en el set trackeado,
+#     así create_order no hace GETs al CLOB en el momento de disparar
+#   - conexión caliente: ping periódico al exchange para que el keep-alive
+#     (y el handshake TLS) no caigan dentro del camino de la señal
+# Al disparar solo se rellenan precio y tamaño, se firma y se envía por el gateway.
+#
+# Se miden tiempos señal -> submit -> ack (y firma, en el transporte CLOB).
+# Funciona igual contra MockExchange / PaperFillSimulator para tests locales.
+#
+# Uso:
+#   gateway = OrderGateway(TemplatedClobTransport(client))   # o MockExchange()
+#   ex = LiveExecutor(gateway).start()
+#   ex.attach(scanner)
+#   client_id = ex.fire(token_id, "BUY", 0.42, 10, signal_ts=ts)
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+from order_gateway import ClobOrderTransport, OrderAck, OrderGateway, OrderIntent
+
+# =======================
+# CONFIG
+# =======================
+
+LIVE_KEEPALIVE_SEC = 15.0       # ping al exchange para mantener la conexión viva
+LIVE_PREPARE_WORKERS = 4        # threads que construyen plantillas
+LIVE_TIMING_WINDOW = 500        # órdenes recientes para percentiles
+
+
+@dataclass
+class OrderTemplate:
+    token_id: str
+    tick_size: str = "0.01"
+    neg_risk: bool = False
+    fee_rate_bps: int = 0
+    options: Any = None         # PartialCreateOrderOptions ya construido
+    built_ts: float = 0.0
+    build_ms: float = 0.0
+
+
+def _percentile(values: Iterable[float], p: float) -> Optional[float]:
+    v = sorted(values)
+    if not v:
+        return None
+    return v[min(len(v) - 1, int(p / 100.0 * len(v)))]
+
+
+# ---------------- TRANSPORT ----------------
+class TemplatedClobTransport(ClobOrderTransport):
+    """
+    ClobOrderTransport que firma con la plantilla del token: pasa tick size /
+    neg_risk / fee ya resueltos a create_order (sin ellos py-clob-client los
+    pide al CLOB en cada orden).
+    """
+
+    def __init__(self, client, workers: int = 4):
+        super().__init__(client, workers)
+        self.templates: Dict[str, OrderTemplate] = {}
+        self.sign_ms: Deque[float] = deque(maxlen=LIVE_TIMING_WINDOW)
+        self.template_misses = 0
+        self.pings = 0
+        self.last_ping_ms: Optional[float] = None
+
+    def prepare(self, token_id: str) -> OrderTemplate:
+        from py_clob_client.clob_types import PartialCreateOrderOptions
+
+        start = time.time()
+        tick = str(self.client.get_tick_size(token_id))
+        neg = bool(self.client.get_neg_risk(token_id))
+        fee = 0
+        if hasattr(self.client, "get_fee_rate_bps"):
+            fee = int(self.client.get_fee_rate_bps(token_id) or 0)
+
+        tpl = OrderTemplate(
+            token_id=token_id,
+            tick_size=tick,
+            neg_risk=neg,
+            fee_rate_bps=fee,
+            options=PartialCreateOrderOptions(tick_size=tick, neg_risk=neg),
+            built_ts=time.time(),
+        )
+        tpl.build_ms = (tpl.built_ts - start) * 1000.0
+        self.templates[token_id] = tpl
+        return tpl
+
+    def _sign(self, it: OrderIntent):
+        from py_clob_client.clob_types import OrderArgs
+        from py_clob_client.order_builder.constants import BUY, SELL
+
+        tpl = self.templates.get(it.token_id)
+        if tpl is None:
+            # Token no preparado: se paga la construcción aquí (queda cacheada)
+            self.template_misses += 1
+            tpl = self.prepare(it.token_id)
+
+        start = time.time()
+        signed = self.client.create_order(
+            OrderArgs(
+                price=it.price,
+                size=it.size,
+                side=BUY if it.side == "BUY" else SELL,
+                token_id=it.token_id,
+                fee_rate_bps=tpl.fee_rate_bps,
+            ),
+            tpl.options,
+        )
+        self.sign_ms.append((time.time() - start) * 1000.0)
+        return signed
+
+    def warm(self):
+        start = time.time()
+        self.client.get_ok()
+        self.pings += 1
+        self.last_ping_ms = (time.time() - start) * 1000.0
+
+
+# ---------------- EXECUTOR ----------------
+class LiveExecutor:
+    def __init__(
+        self,
+        gateway: OrderGateway,
+        keepalive_sec: float = LIVE_KEEPALIVE_SEC,
+        prepare_workers: int = LIVE_PREPARE_WORKERS,
+    ):
+        self.gateway = gateway
+        self.transport = gateway.transport
+        self.keepalive_sec = float(keepalive_sec)
+        self.pool = ThreadPoolExecutor(max_workers=int(prepare_workers), thread_name_prefix="live-prep")
+
+        # Tokens con plantilla lista / en construcción
+        self.prepared: set = set()
+        self._pending: set = set()
+        self.lock = threading.Lock()
+
+        self.stop_event = threading.Event()
+        self._keepalive_thread: Optional[threading.Thread] = None
+
+        # Tiempos por orden (ms)
+        self.signal_to_submit: Deque[float] = deque(maxlen=LIVE_TIMING_WINDOW)
+        self.submit_to_ack: Deque[float] = deque(maxlen=LIVE_TIMING_WINDOW)
+        self.signal_to_ack: Deque[float] = deque(maxlen=LIVE_TIMING_WINDOW)
+
+        # Stats
+        self.fired = 0
+        self.hits = 0
+        self.misses = 0
+        self.prepare_errors = 0
+        self.warm_errors = 0
+
+    # ------------- LIFECYCLE -------------
+    def start(self) -> "LiveExecutor":
+        self.gateway.start()
+        self.warm()
+        if self._keepalive_thread is None and hasattr(self.transport, "warm"):
+            self._keepalive_thread = threading.Thread(target=self._keepalive, name="live-keepalive", daemon=True)
+            self._keepalive_thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.pool.shutdown(wait=False)
+
+    def warm(self):
+        warm = getattr(self.transport, "warm", None)
+        if warm is None:
+            return
+        try:
+            warm()
+        except Exception as e:
+            self.warm_errors += 1
+            print(f"⚠️ Ping al exchange falló: {e}")
+
+    def _keepalive(self):
+        while not self.stop_event.wait(self.keepalive_sec):
+            self.warm()
+
+    # ------------- TEMPLATES -------------
+    def prepare(self, token_ids: Iterable[Optional[str]]):
+        """
+        Programa la construcción de plantillas de los tokens nuevos (no bloquea).
+        """
+        build = getattr(self.transport, "prepare", None)
+        for tid in token_ids:
+            if not tid:
+                continue
+            with self.lock:
+                if tid in self.prepared or tid in self._pending:
+                    continue
+                if build is None:
+                    # Transporte sin plantillas (mock / paper): nada que construir
+                    self.prepared.add(tid)
+                    continue
+                self._pending.add(tid)
+            try:
+                self.pool.submit(self._prepare_one, build, tid)
+            except RuntimeError:
+                with self.lock:
+                    self._pending.discard(tid)
+
+    def _prepare_one(self, build: Callable[[str], Any], token_id: str):
+        try:
+            build(token_id)
+            ok = True
+        except Exception as e:
+            ok = False
+            self.prepare_errors += 1
+            print(f"⚠️ Plantilla de {token_id} falló: {e}")
+        with self.lock:
+            self._pending.discard(token_id)
+            if ok:
+                self.prepared.add(token_id)
+
+    def prepare_snapshot(self, snap: Dict):
+        self.prepare((snap.get("yes_token_id"), snap.get("no_token_id")))
+
+    def attach(self, scanner) -> "LiveExecutor":
+        """
+        Prepara plantillas en cuanto un mercado trackeado produce su primer snapshot.
+        """
+        def _on_snapshot(market_id: str, snap: Dict):
+            self.prepare_snapshot(snap)
+
+        scanner.snapshot_listeners.append(_on_snapshot)
+        return self
+
+    # ------------- FIRE -------------
+    def fire(
+        self,
+        token_id: str,
+        side: str,
+        price: float,
+        size: float,
+        signal_ts: Optional[float] = None,
+        callback: Optional[Callable[[OrderAck], None]] = None,
+        tag: str = "",
+    ) -> str:
+        """
+        Envía la orden ya con precio y tamaño; devuelve el client_id sin esperar al ack.
+        """
+        if token_id in self.prepared or token_id in getattr(self.transport, "templates", ()):
+            self.hits += 1
+        else:
+            # Sin plantilla: el transporte la construye (y cachea) al firmar
+            self.misses += 1
+            if not hasattr(self.transport, "prepare"):
+                with self.lock:
+                    self.prepared.add(token_id)
+
+        intent = OrderIntent.place(token_id, side, price, size, tag=tag)
+        signal_ts = time.time() if signal_ts is None else signal_ts
+
+        def _done(ack: OrderAck):
+            self.signal_to_submit.append((intent.submitted_ts - signal_ts) * 1000.0)
+            self.submit_to_ack.append(ack.latency_ms)
+            self.signal_to_ack.append((ack.ts - signal_ts) * 1000.0)
+            if callback is not None:
+                callback(ack)
+
+        self.fired += 1
+        self.gateway.submit(intent, _done)
+        return intent.client_id
+
+    # ------------- STATS -------------
+    def stats(self) -> Dict:
+        out = {
+            "fired": self.fired,
+            "templates": len(getattr(self.transport, "templates", None) or self.prepared),
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "prepare_errors": self.prepare_errors,
+            "warm_errors": self.warm_errors,
+            "signal_to_submit_p50_ms": _percentile(self.signal_to_submit, 50),
+            "submit_to_ack_p50_ms": _percentile(self.submit_to_ack, 50),
+            "signal_to_ack_p50_ms": _percentile(self.signal_to_ack, 50),
+            "signal_to_ack_p99_ms": _percentile(self.signal_to_ack, 99),
+        }
+        sign_ms: List[float] = list(getattr(self.transport, "sign_ms", ()))
+        if sign_ms:
+            out["sign_p50_ms"] = _percentile(sign_ms, 50)
+        if hasattr(self.transport, "pings"):
+            out["pings"] = self.transport.pings
+            out["last_ping_ms"] = self.transport.last_ping_ms
+        return out
@@ -0,0 +1,243 @@
+# load_controller.py
+# Control de carga adaptativo del scanner.
+#
+# Cada interval_sec mide sobre la ventana:
+#   - ticks/market/sec: snapshots nuevos / (segundos x mercados del top-N)
+#   - p99 de la latencia de loop (inicio del fetch de books -> snapshots construidos)
+# y mueve como mucho UN parámetro un paso, dentro de sus límites:
+#   - p99 > objetivo            => más workers CLOB; si no, menos mercados (top-N)
+#   - ticks < objetivo          => menos intervalo de loop (si limita), más workers,
+#                                  menos mercados
+#   - ticks y p99 con holgura   => más mercados; luego más intervalo / cooldown (menos carga)
+# build_snapshots emite un snapshot por mercado y loop (también con tops de la
+# cache), así que ticks/market/sec es el ritmo de loops: bajar el cooldown no da
+# ticks, solo más fetches por loop (loops más largos), y no se toca con pocos ticks.
+# El intervalo de loop se salta si no limita (por debajo del periodo real del loop).
+# Tras un ajuste se descarta una ventana (el sistema se asienta y la medida no
+# mezcla el antes y el después).
+# Cada ajuste se imprime y queda en `adjustments` (el dashboard muestra el último).
+#
+# Uso:
+#   ctrl = LoadController(scanner, target_ticks=1.0, target_p99_ms=1500).start()
+#   ...
+#   ctrl.stop()
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+# =======================
+# CONFIG
+# =======================
+
+LOAD_TARGET_TICKS_PER_MARKET = 1.0      # ticks/market/sec objetivo
+LOAD_TARGET_P99_MS = 1500.0             # p99 de latencia de loop objetivo
+LOAD_CONTROL_INTERVAL_SEC = 5.0
+LOAD_HYSTERESIS = 0.15                  # banda muerta alrededor de los objetivos
+LOAD_MIN_LOOPS = 3                      # loops mínimos en la ventana para decidir
+
+# Límites (min, max) de cada parámetro
+LOAD_TOP_N_BOUNDS = (10, 200)
+LOAD_WORKERS_BOUNDS = (4, 48)
+LOAD_COOLDOWN_BOUNDS = (0.10, 1.00)
+LOAD_LOOP_INTERVAL_BOUNDS = (0.05, 0.50)
+
+LOAD_WORKERS_STEP = 4
+LOAD_TOP_N_STEP = 0.15                  # fracción del top-N actual
+LOAD_TIME_STEP = 1.25                   # factor para cooldown / intervalo
+
+LOAD_ADJUSTMENTS_KEPT = 50
+
+
+def _p99(values: List[float]) -> Optional[float]:
+    v = sorted(values)
+    if not v:
+        return None
+    return v[min(len(v) - 1, int(0.99 * len(v)))]
+
+
+class LoadController:
+    def __init__(
+        self,
+        scanner,
+        target_ticks: float = LOAD_TARGET_TICKS_PER_MARKET,
+        target_p99_ms: float = LOAD_TARGET_P99_MS,
+        interval_sec: float = LOAD_CONTROL_INTERVAL_SEC,
+        top_n_bounds: Tuple[int, int] = LOAD_TOP_N_BOUNDS,
+        workers_bounds: Tuple[int, int] = LOAD_WORKERS_BOUNDS,
+        cooldown_bounds: Tuple[float, float] = LOAD_COOLDOWN_BOUNDS,
+        loop_interval_bounds: Tuple[float, float] = LOAD_LOOP_INTERVAL_BOUNDS,
+        hysteresis: float = LOAD_HYSTERESIS,
+    ):
+        self.scanner = scanner
+        self.target_ticks = float(target_ticks)
+        self.target_p99_ms = float(target_p99_ms)
+        self.interval_sec = float(interval_sec)
+        self.hysteresis = float(hysteresis)
+        self.bounds = {
+            "top_n_orderbook": top_n_bounds,
+            "clob_workers": workers_bounds,
+            "orderbook_cooldown": cooldown_bounds,
+            "min_loop_interval": loop_interval_bounds,
+        }
+
+        # Pool CLOB dimensionado al máximo de workers: subir workers no bloquea en el pool.
+        # Lo normal es crear el scanner con clob_pool_size=workers_bounds[1]; si no, se
+        # redimensiona aquí (cierra el adapter viejo y pierde las conexiones pre-abiertas)
+        if scanner.clob_http.pool_size < workers_bounds[1]:
+            scanner.clob_http.resize(workers_bounds[1])
+        scanner.load_controller = self
+
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+        # Ventana de medida
+        self._last_ts = time.time()
+        self._last_snaps = scanner.snapshots_total
+        self._last_loops = scanner.loops
+
+        # Última medida y ajustes
+        self.ticks: Optional[float] = None
+        self.p99_ms: Optional[float] = None
+        self.loop_period: Optional[float] = None
+        self.state = "midiendo"
+        self._settling = False
+        self.adjustments: Deque[Dict] = deque(maxlen=LOAD_ADJUSTMENTS_KEPT)
+
+    # ------------- MEDIDA -------------
+    def measure(self) -> Optional[Dict]:
+        """
+        Métricas desde la medida anterior; None si no hay loops suficientes.
+        """
+        sc = self.scanner
+        now = time.time()
+        with sc.lock:
+            snaps = sc.snapshots_total
+            loops = sc.loops
+            markets = sc.last_loop_topN
+            lat = [ms for ts, ms in sc.loop_ms if ts >= self._last_ts]
+
+        dt = max(now - self._last_ts, 1e-9)
+        d_snaps = snaps - self._last_snaps
+        d_loops = loops - self._last_loops
+        self._last_ts, self._last_snaps, self._last_loops = now, snaps, loops
+
+        if markets <= 0 or d_loops < LOAD_MIN_LOOPS or len(lat) < LOAD_MIN_LOOPS:
+            return None
+        self.ticks = d_snaps / dt / markets
+        self.p99_ms = _p99(lat)
+        self.loop_period = dt / d_loops
+        return {"ticks": self.ticks, "p99_ms": self.p99_ms, "loop_period": self.loop_period, "markets": markets}
+
+    # ------------- DECISIÓN -------------
+    def _step(self, knob: str, direction: int) -> Optional[Tuple]:
+        sc = self.scanner
+        lo, hi = self.bounds[knob]
+        cur = getattr(sc, knob)
+        if knob == "top_n_orderbook":
+            delta = max(1, int(round(cur * LOAD_TOP_N_STEP)))
+            new = cur + direction * delta
+        elif knob == "clob_workers":
+            new = cur + direction * LOAD_WORKERS_STEP
+        else:
+            new = round(cur * (LOAD_TIME_STEP if direction > 0 else 1.0 / LOAD_TIME_STEP), 3)
+        new = type(cur)(min(hi, max(lo, new)))
+        if new == cur:
+            return None
+        setattr(sc, knob, new)
+        return knob, cur, new
+
+    def _binding(self, knob: str) -> bool:
+        """
+        ¿Limita hoy el ritmo de ticks? (un intervalo por debajo del periodo real no limita)
+        """
+        period = self.loop_period or 0.0
+        if knob == "min_loop_interval":
+            return self.scanner.min_loop_interval >= 0.8 * period
+        return True
+
+    def decide(self, m: Dict) -> Optional[Tuple]:
+        h = self.hysteresis
+        ladder: List[Tuple[str, int]]
+        if m["p99_ms"] > self.target_p99_ms * (1.0 + h):
+            self.state = "lento"
+            ladder = [("clob_workers", +1), ("top_n_orderbook", -1)]
+        elif m["ticks"] < self.target_ticks * (1.0 - h):
+            self.state = "pocos ticks"
+            ladder = [
+                ("min_loop_interval", -1),
+                ("clob_workers", +1),
+                ("top_n_orderbook", -1),
+            ]
+        elif m["ticks"] > self.target_ticks * (1.0 + h) and m["p99_ms"] < self.target_p99_ms * (1.0 - h):
+            self.state = "holgura"
+            ladder = [("top_n_orderbook", +1), ("min_loop_interval", +1), ("orderbook_cooldown", +1)]
+        else:
+            self.state = "en objetivo"
+            return None
+
+        for knob, direction in ladder:
+            if direction < 0 and not self._binding(knob):
+                continue
+            change = self._step(knob, direction)
+            if change is not None:
+                return change
+        self.state += " (en límites)"
+        return None
+
+    def control_once(self) -> Optional[Dict]:
+        m = self.measure()
+        if m is None:
+            return None
+        if self._settling:
+            self._settling = False
+            return None
+        change = self.decide(m)
+        if change is None:
+            return None
+
+        knob, old, new = change
+        self._settling = True
+        adj = {"ts": time.time(), "knob": knob, "old": old, "new": new, "reason": self.state, **m}
+        self.adjustments.append(adj)
+        print(
+            f"🎛️ Carga ({self.state}): {knob} {old} -> {new} | "
+            f"ticks/mkt/s {m['ticks']:.3f} (obj {self.target_ticks:.2f}) | "
+            f"p99 loop {m['p99_ms']:.0f} ms (obj {self.target_p99_ms:.0f}) | {m['markets']} mercados"
+        )
+        return adj
+
+    # ------------- THREAD -------------
+    def _loop(self):
+        while not self.stop_event.wait(self.interval_sec):
+            try:
+                self.control_once()
+            except Exception as e:
+                print(f"⚠️ Control de carga falló: {e}")
+
+    def start(self) -> "LoadController":
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._loop, name="load-control", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+    # ------------- STATS -------------
+    def stats(self) -> Dict:
+        sc = self.scanner
+        return {
+            "state": self.state,
+            "ticks": self.ticks,
+            "p99_ms": self.p99_ms,
+            "top_n_orderbook": sc.top_n_orderbook,
+            "clob_workers": sc.clob_workers,
+            "orderbook_cooldown": sc.orderbook_cooldown,
+            "min_loop_interval": sc.min_loop_interval,
+            "adjustments": len(self.adjustments),
+            "last": self.adjustments[-1] if self.adjustments else None,
+        }
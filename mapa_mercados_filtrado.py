@@ -1,55 +1,342 @@
 # mapa_mercados_filtrado.py
-from scanner import EventScannerGamma
+# Explorador del universo de mercados de Gamma.
+#
+# Descarga el universo una vez (todas las páginas de /events), lo guarda en una
+# cache JSON local y construye índices en memoria:
+#   - categoría (slug / label de los tags del evento) -> filas
+#   - número de outcomes -> filas
+#   - liquidez y volumen: arrays ordenados (bisect) para rangos y top-k
+# Las consultas (rangos + top-k) corren en milisegundos sobre miles de mercados
+# sin volver a pedir Gamma mientras la cache sea reciente.
+#
+# Uso:
+#   python mapa_mercados_filtrado.py                          # filtros de config.py, multi-outcome
+#   python mapa_mercados_filtrado.py --outcomes-min 2 --min-liq 0 --top 20 --sort volume
+#   python mapa_mercados_filtrado.py --category politics --min-vol 1e5 --export out.csv
+#   python mapa_mercados_filtrado.py --export out.parquet     # columnar (requiere pyarrow)
+#   python mapa_mercados_filtrado.py -i                       # consultas interactivas
+#   python mapa_mercados_filtrado.py --refresh                # ignora la cache
+
+import argparse
+import bisect
+import csv
+import heapq
+import json
+import os
+import shlex
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
 import config
+from scanner import EventScannerGamma, safe_float
 
-if __name__ == "__main__":
-    scanner = EventScannerGamma(
-        min_liquidity=0,       # filtraremos manualmente abajo
-        min_volume=0,
-        categories=None,
-        multi_outcome=False,
-        display_delay=0,
-        fetch_delay=0,
-        max_snapshots=None
-    )
+# =======================
+# CONFIG
+# =======================
 
-    # Parámetros de filtrado
-    MIN_LIQUIDITY = config.MIN_LIQUIDITY
-    MIN_VOLUME = config.MIN_VOLUME
-    CATEGORIES = config.CATEGORIES
-    MULTI_OUTCOME = True  # solo multi-outcome
+UNIVERSE_CACHE_PATH = os.environ.get("MAPA_UNIVERSE_CACHE", "mapa_universo.json")
+UNIVERSE_CACHE_MAX_AGE_SEC = 600.0
+UNIVERSE_CACHE_VERSION = 1
 
-    events = scanner.fetch_events()
-    filtered_markets = []
+EXPORT_FIELDS = ("id", "question", "category", "outcomes", "liquidity", "volume", "p_yes", "end_date", "event_id")
+SORT_FIELDS = ("volume", "liquidity", "outcomes")
+PRINT_LIMIT = 50
 
-    for e in events:
-        category = e.get("tags", [""])[0] if e.get("tags") else ""
-        if CATEGORIES and category.lower() not in [c.lower() for c in CATEGORIES]:
-            continue
 
-        for m in e.get("markets", []):
-            outcomes = scanner.parse_outcomes(m)
-            liquidity = float(m.get("liquidityNum", 0))
-            volume = float(m.get("volume", 0))
+# ---------------- UNIVERSO ----------------
+def fetch_universe(scanner: EventScannerGamma) -> List[Dict]:
+    """
+    Una fila plana por market (dedupe por id), con las categorías del evento.
+    """
+    rows = []
+    seen = set()
+    for e in scanner.fetch_events():
+        cats = scanner.event_categories(e)
+        labels = [t.get("label") for t in (e.get("tags") or []) if isinstance(t, dict) and t.get("label")]
+        category = str(labels[0]) if labels else (sorted(cats)[0] if cats else "n/a")
 
-            if MULTI_OUTCOME and len(outcomes) <= 2:
-                continue
-            if liquidity < MIN_LIQUIDITY or volume < MIN_VOLUME:
+        for m in (e.get("markets") or []):
+            key = str(m.get("id") or m.get("conditionId") or "")
+            if not key or key in seen:
                 continue
-
-            filtered_markets.append({
-                "id": m.get("id"),
-                "question": m.get("question"),
-                "outcomes": len(outcomes),
-                "liquidity": liquidity,
-                "volume": volume,
-                "category": category
+            seen.add(key)
+            p_yes, _ = scanner.parse_outcome_prices(m)
+            rows.append({
+                "id": key,
+                "question": m.get("question") or "",
+                "category": category,
+                "categories": sorted(cats),
+                "outcomes": len(scanner.parse_outcomes(m)),
+                "liquidity": safe_float(m.get("liquidityNum") or m.get("liquidity") or 0),
+                "volume": safe_float(m.get("volumeNum") or m.get("volume") or 0),
+                "p_yes": p_yes,
+                "end_date": m.get("endDate") or e.get("endDate"),
+                "event_id": str(e.get("id") or ""),
             })
+    return rows
+
+
+def load_universe(path: str, max_age_sec: float) -> Optional[Dict]:
+    try:
+        with open(path, "rb") as f:
+            payload = json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(payload, dict) or payload.get("version") != UNIVERSE_CACHE_VERSION:
+        return None
+    if time.time() - float(payload.get("saved_ts") or 0.0) > max_age_sec:
+        return None
+    return payload
+
+
+def save_universe(path: str, rows: List[Dict]):
+    payload = {"version": UNIVERSE_CACHE_VERSION, "saved_ts": time.time(), "rows": rows}
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    os.replace(tmp, path)
+
+
+def get_universe(path: str = UNIVERSE_CACHE_PATH, max_age_sec: float = UNIVERSE_CACHE_MAX_AGE_SEC,
+                 refresh: bool = False) -> List[Dict]:
+    """
+    Universo desde la cache si es reciente; si no, Gamma (y se reescribe la cache).
+    """
+    if not refresh:
+        payload = load_universe(path, max_age_sec)
+        if payload is not None:
+            age = time.time() - float(payload["saved_ts"])
+            print(f"♻️ Universo desde cache: {len(payload['rows'])} mercados (de hace {age:.0f}s)")
+            return payload["rows"]
+
+    # Sin filtros: se descarga todo y se filtra con los índices
+    scanner = EventScannerGamma(min_liquidity=0, min_volume=0, categories=None, multi_outcome=False)
+    start = time.time()
+    rows = fetch_universe(scanner)
+    print(
+        f"🌐 Universo desde Gamma: {len(rows)} mercados | {scanner.gamma_refresh['pages']} páginas | "
+        f"{(time.time() - start) * 1000.0:.0f} ms"
+    )
+    if not scanner.gamma_refresh.get("ok", True):
+        # Universo parcial: no se cachea (se pediría entero en la próxima ejecución)
+        print("⚠️ Refresh de Gamma incompleto: no se guarda la cache del universo")
+    elif rows:
+        try:
+            save_universe(path, rows)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la cache del universo: {e}")
+    return rows
+
+
+# ---------------- ÍNDICES ----------------
+class MarketIndex:
+    def __init__(self, rows: List[Dict]):
+        start = time.time()
+        self.rows = rows
+
+        self.by_category: Dict[str, List[int]] = {}
+        self.by_outcomes: Dict[int, List[int]] = {}
+        for i, r in enumerate(rows):
+            for c in r["categories"]:
+                self.by_category.setdefault(c, []).append(i)
+            self.by_outcomes.setdefault(r["outcomes"], []).append(i)
+
+        # field -> (valores ordenados, filas en ese orden)
+        self.sorted: Dict[str, tuple] = {}
+        for field in SORT_FIELDS:
+            order = sorted(range(len(rows)), key=lambda i: rows[i][field])
+            self.sorted[field] = ([rows[i][field] for i in order], order)
+
+        self.build_ms = (time.time() - start) * 1000.0
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def range_ids(self, field: str, lo: Optional[float] = None, hi: Optional[float] = None) -> List[int]:
+        """
+        Filas con lo <= field <= hi (bisect sobre el array ordenado).
+        """
+        values, order = self.sorted[field]
+        a = bisect.bisect_left(values, lo) if lo is not None else 0
+        b = bisect.bisect_right(values, hi) if hi is not None else len(values)
+        return order[a:b]
+
+    def query(
+        self,
+        categories: Optional[Sequence[str]] = None,
+        outcomes_min: Optional[int] = None,
+        outcomes_max: Optional[int] = None,
+        min_liq: Optional[float] = None,
+        max_liq: Optional[float] = None,
+        min_vol: Optional[float] = None,
+        max_vol: Optional[float] = None,
+        sort_by: str = "volume",
+        top: Optional[int] = None,
+    ) -> List[Dict]:
+        # Cada filtro da un conjunto de filas; se intersecta empezando por el más pequeño
+        sets: List[Iterable[int]] = []
+        if categories:
+            ids: List[int] = []
+            for c in categories:
+                ids.extend(self.by_category.get(str(c).lower(), ()))
+            sets.append(ids)
+        if outcomes_min is not None or outcomes_max is not None:
+            sets.append(self.range_ids("outcomes", outcomes_min, outcomes_max))
+        if min_liq is not None or max_liq is not None:
+            sets.append(self.range_ids("liquidity", min_liq, max_liq))
+        if min_vol is not None or max_vol is not None:
+            sets.append(self.range_ids("volume", min_vol, max_vol))
+
+        order = self.sorted[sort_by][1]
+        if not sets:
+            # Sin filtros: el índice ya está ordenado por el campo
+            picked = order[::-1] if top is None else order[max(0, len(order) - top):][::-1]
+            return [self.rows[i] for i in picked]
+
+        sets.sort(key=len)
+        ids = set(sets[0])
+        for s in sets[1:]:
+            if not ids:
+                break
+            ids.intersection_update(s)
+
+        key = lambda i: self.rows[i][sort_by]
+        if top is not None:
+            picked = heapq.nlargest(top, ids, key=key)
+        else:
+            picked = sorted(ids, key=key, reverse=True)
+        return [self.rows[i] for i in picked]
+
+    def category_counts(self) -> List[tuple]:
+        return sorted(((c, len(v)) for c, v in self.by_category.items()), key=lambda x: x[1], reverse=True)
+
+
+# ---------------- EXPORT ----------------
+def export_rows(rows: List[Dict], path: str) -> int:
+    """
+    .parquet / .feather => columnar (pyarrow); cualquier otra extensión => CSV.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".parquet", ".feather", ".arrow"):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise SystemExit("❌ Export columnar requiere pyarrow (pip install pyarrow); usa .csv")
+        table = pa.table({f: [r.get(f) for r in rows] for f in EXPORT_FIELDS})
+        if ext == ".parquet":
+            import pyarrow.parquet as pq
+            pq.write_table(table, path)
+        else:
+            import pyarrow.feather as feather
+            feather.write_feather(table, path)
+        return len(rows)
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        w.writeheader()
+        w.writerows(rows)
+    return len(rows)
+
+
+# ---------------- CLI ----------------
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description="Explorador indexado del universo de mercados")
+    ap.add_argument("--refresh", action="store_true", help="Ignorar la cache y pedir Gamma")
+    ap.add_argument("--cache", default=UNIVERSE_CACHE_PATH)
+    ap.add_argument("--max-age", type=float, default=UNIVERSE_CACHE_MAX_AGE_SEC)
+    ap.add_argument("-i", "--interactive", action="store_true", help="Consultas interactivas sobre el índice")
+    add_query_args(ap)
+    return ap
+
+
+def add_query_args(ap: argparse.ArgumentParser):
+    ap.add_argument("--category", action="append", default=None,
+                    help="Categoría (slug o label); repetible. Por defecto config.CATEGORIES")
+    ap.add_argument("--all-categories", action="store_true")
+    ap.add_argument("--outcomes-min", type=int, default=3, help="3 = solo multi-outcome (por defecto)")
+    ap.add_argument("--outcomes-max", type=int, default=None)
+    ap.add_argument("--min-liq", type=float, default=config.MIN_LIQUIDITY)
+    ap.add_argument("--max-liq", type=float, default=None)
+    ap.add_argument("--min-vol", type=float, default=config.MIN_VOLUME)
+    ap.add_argument("--max-vol", type=float, default=None)
+    ap.add_argument("--sort", choices=SORT_FIELDS, default="volume")
+    ap.add_argument("--top", type=int, default=None)
+    ap.add_argument("--export", default=None, help="Fichero .csv / .parquet / .feather")
+    ap.add_argument("--quiet", action="store_true", help="No listar mercados")
+
+
+def run_query(index: MarketIndex, args) -> List[Dict]:
+    categories = None if args.all_categories else (args.category or config.CATEGORIES)
+    start = time.perf_counter()
+    rows = index.query(
+        categories=categories,
+        outcomes_min=args.outcomes_min,
+        outcomes_max=args.outcomes_max,
+        min_liq=args.min_liq,
+        max_liq=args.max_liq,
+        min_vol=args.min_vol,
+        max_vol=args.max_vol,
+        sort_by=args.sort,
+        top=args.top,
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+    if not args.quiet:
+        print("\n=== Mercados filtrados ===\n")
+        for m in rows[:PRINT_LIMIT]:
+            print(f"ID: {m['id']}, Question: {m['question']}")
+            print(f"Outcomes: {m['outcomes']}, Liquidity: {m['liquidity']}, Volume: {m['volume']}, Category: {m['category']}")
+            print("-" * 60)
+        if len(rows) > PRINT_LIMIT:
+            print(f"... {len(rows) - PRINT_LIMIT} más (usa --export o --top)")
+
+    print(f"\nTotal mercados filtrados: {len(rows)} de {len(index)} | consulta {elapsed_ms:.2f} ms")
+
+    if args.export:
+        start = time.perf_counter()
+        n = export_rows(rows, args.export)
+        print(f"💾 Exportados {n} mercados a {args.export} ({(time.perf_counter() - start) * 1000.0:.0f} ms)")
+    return rows
+
+
+def interactive(index: MarketIndex):
+    ap = argparse.ArgumentParser(prog="consulta", add_help=True, exit_on_error=False)
+    add_query_args(ap)
+    print("🔎 Modo interactivo: mismos flags de consulta (p.ej. --top 20 --min-vol 1e5), "
+          "'cats' lista categorías, 'q' sale")
+    while True:
+        try:
+            line = input("mapa> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            return
+        if line in ("q", "quit", "exit"):
+            return
+        if line == "cats":
+            for c, n in index.category_counts()[:PRINT_LIMIT]:
+                print(f"   {c}: {n}")
+            continue
+        try:
+            args = ap.parse_args(shlex.split(line))
+        except SystemExit:
+            # argparse ya imprimió el error / la ayuda
+            continue
+        except (argparse.ArgumentError, ValueError) as e:
+            print(f"⚠️ {e}")
+            continue
+        run_query(index, args)
+
+
+# ---------------- MAIN ----------------
+if __name__ == "__main__":
+    args = build_parser().parse_args()
 
-    print("\n=== Mercados filtrados ===\n")
-    for m in filtered_markets:
-        print(f"ID: {m['id']}, Question: {m['question']}")
-        print(f"Outcomes: {m['outcomes']}, Liquidity: {m['liquidity']}, Volume: {m['volume']}, Category: {m['category']}")
-        print("-"*60)
+    rows = get_universe(args.cache, args.max_age, refresh=args.refresh)
+    index = MarketIndex(rows)
+    print(f"🗂️ Índices: {len(index.by_category)} categorías | {len(index.by_outcomes)} tamaños de outcome | "
+          f"{index.build_ms:.0f} ms")
 
-    print(f"\nTotal mercados filtrados multi-outcome: {len(filtered_markets)}")
\ No newline at end of file
+    if args.interactive:
+        interactive(index)
+    else:
+        run_query(index, args)
@@ -1,17 +1,34 @@
 # market_maker.py
 import time
 import threading
-from scanner import EventScannerGamma
+from scanner import EventScannerGamma, MAX_BOOK_AGE_SEC, WARM_CACHE_PATH
 import config
 import os
 import platform
 import requests
+import heapq
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from order_gateway import FillEvent, OrderAck, OrderGateway, OrderIntent
+from paper_fills import PaperFillSimulator
+from position_ledger import PositionLedger
 
 # Configuración
 MAX_ORDER_SIZE = 50        # Tamaño máximo por orden (ajustable)
 SPREAD = 0.02              # Spread deseado sobre precios actuales
 ORDER_REFRESH = 10         # Cada cuántos segundos refrescar órdenes
 API_KEY = "TU_API_KEY_POLYMARKET"  # Si tu wallet/API lo requiere
+QUOTE_TICK = 0.001         # Tick de precio del CLOB
+REQUOTE_TICKS = 1          # Solo se reemplaza una quote si el precio se mueve >= N ticks
+ORDER_TTL_SEC = 60         # Órdenes vivas más de esto se cancelan (heap de expiración)
+INVENTORY_SKEW = 0.005     # Desplazamiento del precio justo por cada MAX_ORDER_SIZE de inventario
+
+# Campos del snapshot cuyo cambio obliga a re-cotizar el mercado
+BOOK_SIGNATURE_KEYS = (
+    "bestBid_yes", "bestAsk_yes", "bidSize_yes", "askSize_yes",
+    "bestBid_no", "bestAsk_no", "bidSize_no", "askSize_no",
+)
 
 def clear_screen():
     if platform.system() == "Windows":
@@ -19,71 +36,281 @@ def clear_screen():
     else:
         os.system("clear")
 
+QuoteKey = Tuple[str, str, str]  # (market, outcome, side)
+
+class QuoteManager:
+    """
+    Una quote deseada por (market, outcome, side) comparada con la orden viva.
+    Solo cancela / reemplaza si el precio se mueve >= requote_ticks ticks o cambia el tamaño.
+    El CLOB no tiene amend: reemplazar = cancel + place.
+    """
+
+    def __init__(
+        self,
+        place_fn: Callable[[str, str, str, float, float], str],
+        cancel_fn: Callable[[str], None],
+        is_live_fn: Callable[[str], bool],
+        tick: float = QUOTE_TICK,
+        requote_ticks: int = REQUOTE_TICKS,
+    ):
+        self.place_fn = place_fn
+        self.cancel_fn = cancel_fn
+        self.is_live_fn = is_live_fn
+        self.tick = float(tick)
+        self.threshold = max(1, int(requote_ticks)) * self.tick - 1e-9
+
+        # key -> (order_id, price, size)
+        self.live: Dict[QuoteKey, Tuple[str, float, float]] = {}
+        # market -> keys con quote viva (para retirar un mercado sin recorrer todo)
+        self.by_market: Dict[str, set] = {}
+
+        # Mensajes enviados vs. los de cancelar y reponer todo en cada refresh
+        self.placed = 0
+        self.cancelled = 0
+        self.kept = 0
+        self.baseline_messages = 0
+
+    @property
+    def messages(self) -> int:
+        return self.placed + self.cancelled
+
+    @property
+    def saved(self) -> int:
+        return self.baseline_messages - self.messages
+
+    def round_price(self, price: float) -> float:
+        return round(round(price / self.tick) * self.tick, 6)
+
+    def note_idle(self, n_quotes: int):
+        """
+        Quotes que no se re-evaluaron porque su book no cambió (cuentan como ahorro).
+        """
+        self.kept += n_quotes
+        self.baseline_messages += 2 * n_quotes
+
+    def sync(self, key: QuoteKey, price: float, size: float) -> Optional[str]:
+        """
+        Ajusta la orden viva de `key` a (price, size). Devuelve el order_id vivo.
+        """
+        price = self.round_price(price)
+        cur = self.live.get(key)
+
+        # Una orden que ya no está viva (ejecutada / cancelada fuera) no cuenta
+        if cur is not None and not self.is_live_fn(cur[0]):
+            self.live.pop(key, None)
+            cur = None
+
+        self.baseline_messages += 1 if cur is None else 2
+
+        if cur is not None:
+            order_id, live_price, live_size = cur
+            if abs(price - live_price) < self.threshold and size == live_size:
+                self.kept += 1
+                return order_id
+            self.cancel_fn(order_id)
+            self.cancelled += 1
+
+        market_id, outcome_id, side = key
+        order_id = self.place_fn(market_id, outcome_id, side, size, price)
+        self.placed += 1
+        self.live[key] = (order_id, price, size)
+        self.by_market.setdefault(market_id, set()).add(key)
+        return order_id
+
+    def withdraw(self, key: QuoteKey):
+        cur = self.live.pop(key, None)
+        keys = self.by_market.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_market[key[0]]
+        if cur is not None and self.is_live_fn(cur[0]):
+            self.cancel_fn(cur[0])
+            self.cancelled += 1
+
+    def retire_markets(self, active_markets: set):
+        """
+        Cancela las quotes de mercados que ya no se trackean.
+        """
+        for market_id in [m for m in self.by_market if m not in active_markets]:
+            for key in list(self.by_market.get(market_id, ())):
+                self.withdraw(key)
+
 class MarketMaker:
-    def __init__(self, scanner: EventScannerGamma):
+    def __init__(self, scanner: EventScannerGamma, gateway: Optional[OrderGateway] = None,
+                 max_book_age: Optional[float] = None):
         self.scanner = scanner
-        self.active_orders = {}      # order_id -> dict(market, outcome, side, price, size, ts)
+        # No se cotiza sobre una pata cuyo book es más viejo que esto
+        self.max_book_age = float(max_book_age if max_book_age is not None
+                                  else getattr(scanner, "max_book_age", MAX_BOOK_AGE_SEC))
+        self.stale_withdrawals = 0
+        self.active_orders = {}      # order_id -> dict(market, outcome, side, price, size, ts, status, exchange_id)
         self.completed_orders = []   # lista de órdenes ejecutadas
-        self.pnl = 0.0               # PnL acumulado real
         self.start_time = time.time()
         self.session = requests.Session()
 
-    def get_market_prices(self, market):
+        # Envío de órdenes asíncrono y por lotes (sin gateway => paper: simulador de
+        # fills con cola alimentado por los books del scanner)
+        if gateway is None:
+            sim = PaperFillSimulator()
+            if hasattr(scanner, "snapshot_listeners"):
+                sim.attach(scanner)
+            gateway = OrderGateway(sim)
+        self.gateway = gateway.start()
+        self.rejected_orders = 0
+
+        # Fills del gateway (llegan desde otro thread; se procesan en check_orders)
+        self.fill_queue: Deque[FillEvent] = deque()
+        self.gateway.fill_listeners.append(self.fill_queue.append)
+
+        # (expira_ts, order_id); entradas de órdenes ya cerradas se descartan al salir
+        self.expiry_heap: List[Tuple[float, str]] = []
+        self.expired_orders = 0
+
+        # Posición / cash por (market, outcome) y PnL realizado / no realizado
+        self.ledger = PositionLedger()
+
+        # Solo se re-cotizan los mercados cuyo book cambió (o con fills nuevos)
+        self.book_sigs: Dict[str, Tuple] = {}
+        self.dirty_markets: set = set()
+        # ... y solo se re-marcan las posiciones de mercados con book nuevo (o fills)
+        self.mark_markets: set = set()
+        self.requoted_markets = 0
+        self._listening = hasattr(scanner, "snapshot_listeners")
+        if self._listening:
+            with scanner.lock:
+                scanner.snapshot_listeners.append(self._on_snapshot)
+        self.quotes = QuoteManager(
+            self.place_order,
+            self.cancel_order,
+            lambda order_id: order_id in self.active_orders,
+        )
+
+    def get_market_prices(self, snapshot, outcome: str = "yes", inventory: float = 0.0):
         """
-        Retorna precio de compra/venta basándose en bestBid/bestAsk de la API.
+        Precios de compra/venta para el token `outcome` ("yes" / "no") a partir de su propio
+        book en el snapshot del scanner: microprice (o mid) +- SPREAD, desplazado por
+        inventario y sin cruzar el book. (None, None) si el token no tiene bid/ask.
         """
-        best_bid = float(market.get("bestBid") or 0)
-        best_ask = float(market.get("bestAsk") or 1)
-        mid_price = (best_bid + best_ask) / 2
-        buy_price = round(mid_price * (1 - SPREAD), 4)
-        sell_price = round(mid_price * (1 + SPREAD), 4)
+        best_bid = snapshot.get(f"bestBid_{outcome}")
+        best_ask = snapshot.get(f"bestAsk_{outcome}")
+        if best_bid is None or best_ask is None:
+            return None, None
+
+        fair = snapshot.get(f"microprice_{outcome}") or snapshot.get(f"mid_{outcome}") or (best_bid + best_ask) / 2
+        # Largo => bajamos ambas quotes para soltar inventario (y al revés)
+        fair -= INVENTORY_SKEW * inventory / MAX_ORDER_SIZE
+
+        buy_price = min(fair * (1 - SPREAD), best_ask - QUOTE_TICK)
+        sell_price = max(fair * (1 + SPREAD), best_bid + QUOTE_TICK)
+        buy_price = round(min(max(buy_price, QUOTE_TICK), 1 - QUOTE_TICK), 4)
+        sell_price = round(min(max(sell_price, QUOTE_TICK), 1 - QUOTE_TICK), 4)
         return buy_price, sell_price
 
+    # ------------- BOOK CHANGES -------------
+    @staticmethod
+    def book_signature(snapshot) -> Tuple:
+        return tuple(snapshot.get(k) for k in BOOK_SIGNATURE_KEYS)
+
+    def leg_stale(self, snap: Dict, outcome: str, now: float) -> bool:
+        """
+        True si el book del token `outcome` del snapshot es más viejo que max_book_age.
+        """
+        fetched = snap.get(f"fetch_ts_{outcome}") or snap.get("ts", 0.0)
+        return (now - fetched) > self.max_book_age
+
+    def _on_snapshot(self, market_id: str, snap: Dict):
+        # Thread del scanner, bajo scanner.lock
+        sig = self.book_signature(snap)
+        if self.book_sigs.get(market_id) != sig:
+            self.book_sigs[market_id] = sig
+            self.dirty_markets.add(market_id)
+            self.mark_markets.add(market_id)
+
     def place_order(self, market_id, outcome_id, side, size, price):
         """
-        Coloca orden real en Polymarket via API.
-        Aquí debes reemplazar con tu wallet/API real.
+        Encola la orden en el gateway y vuelve al instante con el id de cliente.
+        El id del exchange llega con el ack (_on_ack).
         """
-        # Simulación de envío de orden usando requests.post si tu API lo soporta
-        # Ejemplo:
-        # payload = {"marketId": market_id, "outcomeId": outcome_id, "side": side, "size": size, "price": price}
-        # headers = {"Authorization": f"Bearer {API_KEY}"}
-        # r = self.session.post("https://api.polymarket.com/orders", json=payload, headers=headers)
-        # order_id = r.json().get("orderId")
-        order_id = f"{market_id}_{outcome_id}_{side}_{int(time.time()*1000)}"
+        intent = OrderIntent.place(str(outcome_id), side, price, size, tag=str(market_id))
+        order_id = intent.client_id
         self.active_orders[order_id] = {
             "market": market_id,
             "outcome": outcome_id,
             "side": side,
             "size": size,
             "price": price,
-            "ts": time.time()
+            "ts": time.time(),
+            "status": "pending",
+            "exchange_id": None,
         }
+        heapq.heappush(self.expiry_heap, (time.time() + ORDER_TTL_SEC, order_id))
+        self.gateway.submit(intent, self._on_ack)
         return order_id
 
+    def _on_ack(self, ack: OrderAck):
+        # Corre en el thread del gateway
+        if ack.kind != "place":
+            return
+        o = self.active_orders.get(ack.client_id)
+        if ack.ok:
+            if o is not None:
+                o["status"] = "live"
+                o["exchange_id"] = ack.order_id
+                o["ack_ms"] = ack.latency_ms
+        else:
+            self.active_orders.pop(ack.client_id, None)
+            self.rejected_orders += 1
+
+    @property
+    def pnl(self) -> float:
+        return self.ledger.pnl
+
     def check_orders(self):
         """
-        Aquí deberías revisar la API de Polymarket para ver cuáles órdenes se han ejecutado.
-        Para cada orden ejecutada, actualizar PnL real.
+        Coste O(cambios): fills encolados por el gateway, órdenes expiradas
+        del heap y re-mark con los mids del scanner de las posiciones abiertas
+        en mercados cuyo book cambió desde el ciclo anterior.
         """
-        executed = []
-        for order_id, o in list(self.active_orders.items()):
-            # Lógica real: comprobar con la API si la orden fue ejecutada
-            # Ejemplo simplificado: asumimos que si ha pasado más de X seg, se ejecuta
-            if time.time() - o["ts"] > ORDER_REFRESH:
-                self.completed_orders.append(o)
-                self.pnl += o["size"] * (o["price"] if o["side"]=="sell" else o["price"])
-                executed.append(order_id)
+        now = time.time()
 
-        for order_id in executed:
-            self.active_orders.pop(order_id, None)
+        while self.fill_queue:
+            fill = self.fill_queue.popleft()
+            o = self.active_orders.get(fill.client_id)
+            market_id = o["market"] if o is not None else fill.tag
+            outcome_id = o["outcome"] if o is not None else fill.token_id
+            self.ledger.apply_fill((market_id, str(outcome_id)), fill.side, fill.price, fill.size)
+            # El inventario cambió: re-cotizar con el nuevo skew
+            self.dirty_markets.add(market_id)
+            self.mark_markets.add(market_id)
+            if fill.remaining <= 0 and o is not None:
+                self.active_orders.pop(fill.client_id, None)
+                self.completed_orders.append(dict(o, fill_price=fill.price, fill_ts=fill.ts))
+
+        while self.expiry_heap and self.expiry_heap[0][0] <= now:
+            _, order_id = heapq.heappop(self.expiry_heap)
+            if order_id in self.active_orders:
+                self.cancel_order(order_id)
+                self.expired_orders += 1
+
+        with self.scanner.lock:
+            marks, self.mark_markets = self.mark_markets, set()
+        for market_id in marks:
+            hist = self.scanner.history.get(market_id)
+            if not hist:
+                continue
+            snap = hist[-1]
+            for outcome in ("yes", "no"):
+                key = (market_id, str(snap.get(f"{outcome}_token_id")))
+                if key in self.ledger.open:
+                    self.ledger.mark(key, snap.get(f"mid_{outcome}"))
 
     def cancel_order(self, order_id):
         """
-        Cancela orden real usando API.
+        Cancela vía gateway (si el place aún no tiene ack, el gateway espera a tenerlo).
         """
-        # requests.post("https://api.polymarket.com/cancel", json={"orderId": order_id}, headers={"Authorization": f"Bearer {API_KEY}"})
         self.active_orders.pop(order_id, None)
+        self.gateway.cancel(order_id)
 
     def display_dashboard(self):
         clear_screen()
@@ -98,8 +325,32 @@ class MarketMaker:
         print(f"⏱️ Uptime: {uptime}s")
         print(f"🟢 Órdenes activas en curso: {len(self.active_orders)}")
         print(f"✅ Órdenes completadas: {executed_orders}")
-        print(f"💹 PnL acumulado: {round(self.pnl, 2)}")
+        print(
+            f"💹 PnL: {self.pnl:+.2f} (realizado {self.ledger.realized_total:+.2f} / "
+            f"no realizado {self.ledger.unrealized_total:+.2f}) | cash {self.ledger.cash_total:+.2f}"
+        )
+        print(f"📦 Posiciones abiertas: {len(self.ledger.open)} | fills: {self.ledger.fills} | expiradas: {self.expired_orders}")
+        print(f"🔄 Mercados re-cotizados (último ciclo): {self.requoted_markets} | quotes vivas: {len(self.quotes.live)} | "
+              f"retiradas por book viejo: {self.stale_withdrawals}")
         print(f"📊 Ratio de éxito: {round(success_rate, 2)}%")
+        print(
+            f"📨 Mensajes de órdenes: {self.quotes.messages} (place {self.quotes.placed} / cancel {self.quotes.cancelled}) "
+            f"| ahorrados: {self.quotes.saved} | quotes sin cambio: {self.quotes.kept}"
+        )
+        gw = self.gateway.stats()
+        p50 = f"{gw['ack_p50_ms']:.1f}" if gw["ack_p50_ms"] is not None else "-"
+        p99 = f"{gw['ack_p99_ms']:.1f}" if gw["ack_p99_ms"] is not None else "-"
+        print(
+            f"🚚 Gateway: {gw['acked']} acks / {gw['rejected']} rechazos / {gw['pending']} pendientes "
+            f"| lote medio {gw['avg_batch']:.1f} | ack p50 {p50} ms p99 {p99} ms"
+        )
+        transport = getattr(self.gateway, "transport", None)
+        if isinstance(transport, PaperFillSimulator):
+            ps = transport.stats()
+            print(
+                f"🧪 Paper: {ps['resting']} en book / {ps['open']} abiertas | cola delante {ps['queue_ahead']:.0f} "
+                f"| fills {ps['fills']} (parciales {ps['partial_fills']}, taker {ps['taker_fills']})"
+            )
         print("-"*60)
         if self.completed_orders:
             print("Últimas órdenes ejecutadas:")
@@ -107,25 +358,68 @@ class MarketMaker:
                 print(f" {o['side'].upper()} | Market: {o['market']} | Outcome: {o['outcome']} | Price: {o['price']} | Size: {o['size']}")
         print("="*60 + "\n")
 
-    def run(self):
-        print("Market Maker iniciado con datos reales...")
-        while True:
-            markets = list(self.scanner.history.keys())
-            for market_id in markets:
-                last_snapshot = self.scanner.history[market_id][-1]
-                outcomes = last_snapshot.get("outcomes") or [{"id": "1"}, {"id": "2"}]
+    def refresh_quotes(self):
+        """
+        Re-cotiza YES y NO de cada mercado con cambios, cada token con su propio book.
+        Las quotes de un token cuyo book supera max_book_age se retiran.
+        """
+        with self.scanner.lock:
+            tracked = set(self.scanner.tracked_market_ids)
+            if not self._listening:
+                # Sin listeners (p.ej. SharedHistoryClient): comparar firmas aquí
+                for market_id in tracked:
+                    hist = self.scanner.history.get(market_id)
+                    if hist:
+                        self._on_snapshot(market_id, hist[-1])
+            dirty, self.dirty_markets = self.dirty_markets, set()
+
+        self.quotes.retire_markets(tracked)
 
-                for idx, outcome in enumerate(outcomes):
-                    outcome_id = outcome.get("id", idx)
-                    buy_price, sell_price = self.get_market_prices(last_snapshot)
+        # Mercados con cambios + los que tienen quotes vivas (su book puede haber envejecido)
+        now = time.time()
+        synced = 0
+        for market_id in (dirty | set(self.quotes.by_market)) & tracked:
+            hist = self.scanner.history.get(market_id)
+            if not hist:
+                continue
+            snap = hist[-1]
+            for outcome in ("yes", "no"):
+                token_id = snap.get(f"{outcome}_token_id")
+                if not token_id:
+                    continue
+                if self.leg_stale(snap, outcome, now):
+                    # Book viejo: se retiran sus quotes y el próximo snapshot re-cotiza
+                    for side in ("buy", "sell"):
+                        key = (market_id, str(token_id), side)
+                        if key in self.quotes.live:
+                            self.quotes.withdraw(key)
+                            self.stale_withdrawals += 1
+                    self.book_sigs.pop(market_id, None)
+                    continue
+                if market_id not in dirty:
+                    continue
+                pos = self.ledger.positions.get((market_id, str(token_id)))
+                buy_price, sell_price = self.get_market_prices(snap, outcome, pos.qty if pos else 0.0)
+                for side, price in (("buy", buy_price), ("sell", sell_price)):
+                    key = (market_id, str(token_id), side)
+                    if price is None:
+                        self.quotes.withdraw(key)
+                        continue
+                    # Solo se tocan las órdenes cuya quote cambió
+                    self.quotes.sync(key, price, MAX_ORDER_SIZE)
+                    synced += 1
 
-                    # Coloca órdenes reales
-                    self.place_order(market_id, outcome_id, "buy", MAX_ORDER_SIZE, buy_price)
-                    self.place_order(market_id, outcome_id, "sell", MAX_ORDER_SIZE, sell_price)
+        self.quotes.note_idle(max(0, len(self.quotes.live) - synced))
+        self.requoted_markets = len(dirty & tracked)
 
-            # Revisar órdenes ejecutadas y actualizar PnL
+    def run(self):
+        print("Market Maker iniciado con datos reales...")
+        while True:
+            # Fills / expiraciones primero: el inventario entra en el skew
             self.check_orders()
 
+            self.refresh_quotes()
+
             # Mostrar dashboard propio
             self.display_dashboard()
             time.sleep(ORDER_REFRESH)
@@ -138,9 +432,8 @@ if __name__ == "__main__":
         min_volume=config.MIN_VOLUME,
         categories=config.CATEGORIES,
         multi_outcome=config.MULTI_OUTCOME,
-        display_delay=config.DISPLAY_DELAY,
-        fetch_delay=config.FETCH_DELAY,
-        max_snapshots=config.MAX_SNAPSHOTS
+        max_snapshots=config.MAX_SNAPSHOTS,
+        warm_cache_path=WARM_CACHE_PATH,
     )
 
     # Ejecutar scanner en hilo aparte
@@ -148,4 +441,7 @@ if __name__ == "__main__":
 
     # Ejecutar Market Maker real
     mm = MarketMaker(scanner)
-    mm.run()
\ No newline at end of file
+    try:
+        mm.run()
+    except KeyboardInterrupt:
+        scanner.stop()
\ No newline at end of file
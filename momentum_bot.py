@@ -5,7 +5,12 @@ import time
 import math
 import threading
 from dataclasses import dataclass
-from typing import Dict, Optional, List, Tuple
+from collections import deque
+from typing import Deque, Dict, Optional, List, Tuple
+
+from live_execution import LiveExecutor, TemplatedClobTransport
+from order_gateway import FillEvent, OrderAck, OrderGateway
+from paper_fills import PaperFillSimulator
 
 def clamp(x: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, x))
@@ -45,6 +50,9 @@ class MomentumConfig:
     # Si no sales en X segundos, sales por market
     max_hold_sec: float = 25.0
 
+    # Edad máxima de cada pata del book para decidir (segundos desde que llegó)
+    max_book_age: float = 1.0
+
     # Slippage interno: entramos pegados al bid/ask
     # (para evitar comprar en el ask cuando el spread está abierto)
     entry_mode: str = "maker"  # "maker" o "taker-lite"
@@ -67,7 +75,7 @@ class MomentumMicroBot:
     Maneja TP/SL/timeout.
     """
 
-    def __init__(self, scanner, config: MomentumConfig):
+    def __init__(self, scanner, config: MomentumConfig, gateway: Optional[OrderGateway] = None):
         self.scanner = scanner
         self.cfg = config
 
@@ -85,6 +93,47 @@ class MomentumMicroBot:
         if self.cfg.live:
             self._init_clob()
 
+        # Órdenes por el gateway asíncrono: el loop nunca espera al exchange.
+        # Paper => simulador de fills local; live => py-clob-client en threads
+        # firmando con plantillas por token.
+        # Paper sin listeners en el scanner (p.ej. SharedHistoryClient): el bot alimenta
+        # el simulador con el book del mercado en posición.
+        self.paper: Optional[PaperFillSimulator] = None
+        self._feed_paper = False
+        self._own_gateway = gateway is None
+        if gateway is None:
+            if self.cfg.live:
+                gateway = OrderGateway(TemplatedClobTransport(self.clob))
+            else:
+                self.paper = PaperFillSimulator()
+                if hasattr(scanner, "snapshot_listeners"):
+                    self.paper.attach(scanner)
+                else:
+                    self._feed_paper = True
+                gateway = OrderGateway(self.paper)
+        self.gateway = gateway.start()
+
+        # Plantillas por token + conexión caliente; al disparar solo precio/tamaño
+        self.executor = LiveExecutor(self.gateway).start()
+        self._attached = hasattr(scanner, "snapshot_listeners")
+        if self._attached:
+            self.executor.attach(scanner)
+
+        # Fills (desde el thread del gateway / scanner), procesados en el loop
+        self.fill_queue: Deque[FillEvent] = deque()
+        self.gateway.fill_listeners.append(self.fill_queue.append)
+        # oid de venta -> precio medio de entrada (para PnL realizado)
+        self.exit_orders: Dict[str, float] = {}
+        # oid de venta -> (token_id, precio, tamaño pendiente): para reponerla tras un checkpoint
+        self.exit_legs: Dict[str, Tuple[str, float, float]] = {}
+        # Entradas cerradas cuyo cancel aún puede cruzarse con un fill tardío
+        self.closed_entries: Dict[str, str] = {}
+        # token_id -> (market_id, "yes"/"no", ts última orden) a alimentar en paper
+        self.order_tokens: Dict[str, Tuple[str, str, float]] = {}
+        self.realized_pnl = 0.0
+        self.fills = 0
+        self.stale_skips = 0
+
     # ------------- LIVE SETUP -------------
     def _init_clob(self):
         """
@@ -125,6 +174,48 @@ class MomentumMicroBot:
 
     def stop(self):
         self.stop_event.set()
+        self.executor.stop()
+        if self._own_gateway:
+            self.gateway.stop()
+
+    # ------------- CHECKPOINT -------------
+    def checkpoint_state(self) -> Dict:
+        return {
+            "last_trade_ts": dict(self.last_trade_ts),
+            "position": dict(self.position) if self.position else None,
+            "exit_orders": dict(self.exit_orders),
+            "exit_legs": dict(self.exit_legs),
+            # id del exchange de cada salida viva (para cancelarla al restaurar)
+            "exit_exchange_ids": {oid: self.gateway.order_ids.get(oid) for oid in self.exit_orders},
+            "realized_pnl": self.realized_pnl,
+            "fills": self.fills,
+        }
+
+    def restore_checkpoint(self, state: Dict):
+        self.last_trade_ts = state["last_trade_ts"]
+        self.position = state["position"]
+        self.realized_pnl = state["realized_pnl"]
+        self.fills = state["fills"]
+        if self.position:
+            self._log(
+                f"Posición restaurada: {self.position['direction']} market={self.position['market_id']} "
+                f"filled={self.position['filled']:.2f}/{self.position['size']:.2f}"
+            )
+        # Salidas de la sesión anterior: este gateway no conoce sus ids. Se cancela la
+        # orden vieja (si llegó a tener id del exchange) y se repone lo pendiente.
+        for oid, entry in state["exit_orders"].items():
+            leg = state["exit_legs"].get(oid)
+            if leg is None or leg[2] <= 0:
+                continue
+            token_id, price, remaining = leg
+            exchange_id = state["exit_exchange_ids"].get(oid)
+            if exchange_id:
+                self.gateway.order_ids[oid] = exchange_id
+                self.gateway.cancel(oid)
+            new_oid = self._place_order(token_id, "SELL", price, remaining)
+            self.exit_orders[new_oid] = entry
+            self.exit_legs[new_oid] = (token_id, price, remaining)
+            self._log(f"Salida restaurada: {remaining:.2f}@{price:.4f} oid={oid} -> {new_oid}")
 
     # ------------- HISTORY HELPERS -------------
     def _get_recent_snaps(self, market_id: str, now: float) -> List[Dict]:
@@ -145,6 +236,16 @@ class MomentumMicroBot:
         out.reverse()
         return out
 
+    def _stale(self, snap: Dict, now: float) -> bool:
+        """
+        True si alguna pata del snapshot es más vieja que max_book_age.
+        """
+        oldest = min(
+            snap.get("fetch_ts_yes") or snap.get("ts", 0.0),
+            snap.get("fetch_ts_no") or snap.get("ts", 0.0),
+        )
+        return (now - oldest) > self.cfg.max_book_age
+
     def _momentum_signal(self, snaps: List[Dict]) -> Optional[Dict]:
         """
         Construye señal:
@@ -221,45 +322,88 @@ class MomentumMicroBot:
             return 0.0
         return self.cfg.stake_usd / price
 
-    def _place_order_paper(self, token_id: str, side: str, price: float, size: float) -> str:
+    def _place_order(self, token_id: str, side: str, price: float, size: float,
+                     signal_ts: Optional[float] = None) -> str:
         """
-        Simula orden.
+        Dispara orden LIMIT por el executor y devuelve el id de cliente sin esperar al ack.
         """
-        oid = f"paper_{int(time.time()*1000)}"
-        self._log(f"[PAPER] {side} token={token_id} price={price:.4f} size={size:.2f} oid={oid}")
+        oid = self.executor.fire(token_id, side, price, size, signal_ts=signal_ts,
+                                 callback=self._on_ack, tag="momentum")
+        mode = "LIVE" if self.cfg.live else "PAPER"
+        self._log(f"[{mode}] {side} token={token_id} price={price:.4f} size={size:.2f} oid={oid}")
         return oid
 
-    def _place_order_live(self, token_id: str, side: str, price: float, size: float) -> str:
+    def _on_ack(self, ack: OrderAck):
+        # Corre en el thread del gateway
+        if ack.ok:
+            self._log(f"ACK {ack.kind} oid={ack.client_id} exchange_id={ack.order_id} latency={ack.latency_ms:.1f}ms")
+        else:
+            self._log(f"REJECT {ack.kind} oid={ack.client_id} error={ack.error} latency={ack.latency_ms:.1f}ms")
+
+    def _drain_fills(self):
+        while self.fill_queue:
+            f = self.fill_queue.popleft()
+            self.fills += 1
+
+            if self.position and f.client_id == self.position["order_id"]:
+                self.position["filled"] += f.size
+                self.position["fill_cost"] += f.size * f.price
+                self._log(f"FILL entrada {f.size:.2f}@{f.price:.4f} quedan={f.remaining:.2f}")
+
+            elif f.client_id in self.exit_orders:
+                entry = self.exit_orders[f.client_id]
+                pnl = f.size * (f.price - entry)
+                self.realized_pnl += pnl
+                self._log(f"FILL salida {f.size:.2f}@{f.price:.4f} pnl={pnl:+.4f} total={self.realized_pnl:+.4f}")
+                leg = self.exit_legs.get(f.client_id)
+                if leg is not None:
+                    self.exit_legs[f.client_id] = (leg[0], leg[1], f.remaining)
+                if f.remaining <= 0:
+                    self.exit_orders.pop(f.client_id, None)
+                    self.exit_legs.pop(f.client_id, None)
+
+            elif f.client_id in self.closed_entries:
+                # Fill de una entrada ya cerrada (el cancel llegó tarde): aplanar
+                token_id = self.closed_entries[f.client_id]
+                if f.remaining <= 0:
+                    self.closed_entries.pop(f.client_id, None)
+                oid = self._place_order(token_id, "SELL", f.price, f.size)
+                self.exit_orders[oid] = f.price
+                self.exit_legs[oid] = (token_id, f.price, f.size)
+                self._track_token(token_id)
+                self._log(f"FILL tardío {f.size:.2f}@{f.price:.4f} -> venta oid={oid}")
+
+    def _track_token(self, token_id: str):
+        prev = self.order_tokens.get(token_id)
+        if prev is not None:
+            self.order_tokens[token_id] = (prev[0], prev[1], time.time())
+
+    def _feed_paper_books(self, now: float):
         """
-        LIVE: coloca orden LIMIT en CLOB.
+        Sin snapshot listeners: pasa al simulador el último book de cada token con órdenes abiertas.
         """
-        if not self.clob:
-            raise RuntimeError("CLOB client no inicializado.")
-
-        # Estructura típica en py-clob-client:
-        #
-        # from py_clob_client.clob_types import OrderArgs, OrderType, Side
-        #
-        # args = OrderArgs(
-        #   price=price,
-        #   size=size,
-        #   side=Side.BUY,
-        #   token_id=token_id,
-        #   order_type=OrderType.GTC
-        # )
-        # signed_order = self.clob.create_order(args)
-        # resp = self.clob.post_order(signed_order)
-        # return resp["orderID"]
-
-        raise RuntimeError("LIVE order placement no implementado: configura py-clob-client aquí.")
-
-    def _place_order(self, token_id: str, side: str, price: float, size: float) -> str:
-        if self.cfg.live:
-            return self._place_order_live(token_id, side, price, size)
-        return self._place_order_paper(token_id, side, price, size)
+        if not self._feed_paper:
+            return
+        for token_id, (market_id, side, ts) in list(self.order_tokens.items()):
+            if token_id not in self.paper.sim_by_token:
+                # Margen para que llegue el ack antes de olvidar el token
+                if now - ts > 5.0:
+                    del self.order_tokens[token_id]
+                continue
+            snaps = self._get_recent_snaps(market_id, now)
+            if not snaps:
+                continue
+            last = snaps[-1]
+            self.paper.on_book(
+                token_id,
+                last.get(f"bestBid_{side}"),
+                last.get(f"bestAsk_{side}"),
+                last.get(f"bidSize_{side}") or 0.0,
+                last.get(f"askSize_{side}") or 0.0,
+            )
 
     # ------------- POSITION MGMT -------------
-    def _open_position(self, market_id: str, direction: str, snap: Dict):
+    def _open_position(self, market_id: str, direction: str, snap: Dict, signal_ts: Optional[float] = None):
         """
         Abre una posición:
         - direction YES => buy YES token
@@ -296,7 +440,8 @@ class MomentumMicroBot:
         if size <= 0:
             return
 
-        oid = self._place_order(token_id, "BUY", entry_price, size)
+        oid = self._place_order(token_id, "BUY", entry_price, size, signal_ts)
+        self.order_tokens[token_id] = (market_id, direction.lower(), time.time())
 
         self.position = {
             "market_id": market_id,
@@ -307,6 +452,8 @@ class MomentumMicroBot:
             "entry_ts": time.time(),
             "order_id": oid,
             "status": "OPEN",
+            "filled": 0.0,
+            "fill_cost": 0.0,
         }
 
         self.last_trade_ts[market_id] = time.time()
@@ -323,9 +470,14 @@ class MomentumMicroBot:
             return None
 
         direction = self.position["direction"]
-        entry = self.position["entry_price"]
         age = time.time() - self.position["entry_ts"]
 
+        # Sin fills todavía o book viejo: solo cuenta el timeout
+        filled = self.position["filled"]
+        if filled <= 0 or self._stale(snap, time.time()):
+            return "TIME" if age >= self.cfg.max_hold_sec else None
+        entry = self.position["fill_cost"] / filled
+
         # Mark price: usamos mid del token que compramos
         if direction == "YES":
             mid = snap.get("mid_yes")
@@ -345,7 +497,7 @@ class MomentumMicroBot:
             return "TIME"
         return None
 
-    def _close_position(self, snap: Dict, reason: str):
+    def _close_position(self, snap: Dict, reason: str, signal_ts: Optional[float] = None):
         """
         Cierra posición vendiendo el token comprado.
         """
@@ -354,7 +506,7 @@ class MomentumMicroBot:
 
         direction = self.position["direction"]
         token_id = self.position["token_id"]
-        size = self.position["size"]
+        size = self.position["filled"]
 
         if direction == "YES":
             bid = snap.get("bestBid_yes")
@@ -363,16 +515,30 @@ class MomentumMicroBot:
             bid = snap.get("bestBid_no")
             ask = snap.get("bestAsk_no")
 
-        if bid is None or ask is None:
+        if size > 0 and (bid is None or ask is None):
+            return
+
+        # Lo que quede de la entrada se cancela
+        entry_oid = self.position["order_id"]
+        if size < self.position["size"]:
+            self.gateway.cancel(entry_oid)
+            self.closed_entries[entry_oid] = token_id
+
+        if size <= 0:
+            self._log(f"CANCEL {direction} reason={reason} entrada sin fills oid={entry_oid}")
+            self.position = None
             return
 
         # Salimos agresivo pero sin regalar demasiado:
         exit_price = bid  # vender al bid
         exit_price = clamp(exit_price, 0.01, 0.99)
 
-        oid = self._place_order(token_id, "SELL", exit_price, size)
+        oid = self._place_order(token_id, "SELL", exit_price, size, signal_ts)
 
-        entry = self.position["entry_price"]
+        entry = self.position["fill_cost"] / size
+        self.exit_orders[oid] = entry
+        self.exit_legs[oid] = (token_id, exit_price, size)
+        self._track_token(token_id)
         age = time.time() - self.position["entry_ts"]
 
         # Estimación pnl
@@ -401,6 +567,9 @@ class MomentumMicroBot:
 
             now = time.time()
 
+            self._drain_fills()
+            self._feed_paper_books(now)
+
             # Necesitamos mercados trackeados
             with self.scanner.lock:
                 market_ids = list(self.scanner.tracked_market_ids)
@@ -417,7 +586,7 @@ class MomentumMicroBot:
                 last = snaps[-1]
                 reason = self._should_exit(last)
                 if reason:
-                    self._close_position(last, reason)
+                    self._close_position(last, reason, now)
                 continue
 
             # Buscar señal entre markets
@@ -432,10 +601,17 @@ class MomentumMicroBot:
                     continue
 
                 last = snaps[-1]
+                if not self._attached:
+                    self.executor.prepare_snapshot(last)
                 liq = last.get("liquidity") or 0.0
                 if liq < self.cfg.min_liquidity:
                     continue
 
+                # Nada de señales con patas viejas
+                if self._stale(last, now):
+                    self.stale_skips += 1
+                    continue
+
                 sig = self._momentum_signal(snaps)
                 if not sig:
                     continue
@@ -447,11 +623,17 @@ class MomentumMicroBot:
                     f"SIGNAL market={market_id} dir={direction} move={move:.4f} spreadY={last.get('spread_yes'):.4f}"
                 )
 
-                self._open_position(market_id, direction, last)
+                self._open_position(market_id, direction, last, now)
 
                 # Solo 1 posición
                 break
 
+        st = self.executor.stats()
+        p50 = st["signal_to_ack_p50_ms"]
+        self._log(
+            f"Ejecución: {st['fired']} órdenes | plantillas {st['templates']} (hits {st['hits']} / misses {st['misses']}) "
+            f"| señal->ack p50 {p50:.1f} ms" if p50 is not None else f"Ejecución: {st['fired']} órdenes"
+        )
         self._log("Bot detenido.")
         
         
@@ -463,7 +645,8 @@ if __name__ == "__main__":
     import signal
     import threading
 
-    from scanner import EventScannerGamma
+    from checkpoint import Checkpointer
+    from scanner import EventScannerGamma, WARM_CACHE_PATH
 
     from config import (
         MOM_LOOKBACK_SEC,
@@ -481,7 +664,7 @@ if __name__ == "__main__":
         MOM_DEBUG,
     )
 
-    scanner = EventScannerGamma()
+    scanner = EventScannerGamma(warm_cache_path=WARM_CACHE_PATH)
 
     cfg = MomentumConfig(
         lookback_sec=MOM_LOOKBACK_SEC,
@@ -501,6 +684,11 @@ if __name__ == "__main__":
 
     bot = MomentumMicroBot(scanner, cfg)
 
+    # Historial / books del scanner + cooldowns y posición del bot
+    ckpt = Checkpointer().add("scanner", scanner).add("momentum", bot)
+    ckpt.restore()
+    ckpt.start()
+
     scan_thread = threading.Thread(target=scanner.live_scan, daemon=True)
     bot_thread = threading.Thread(target=bot.run, daemon=True)
 
@@ -511,6 +699,7 @@ if __name__ == "__main__":
         print("\n[MomentumBot] Deteniendo...")
         bot.stop()
         scanner.stop()
+        ckpt.stop()
         raise SystemExit(0)
 
     signal.signal(signal.SIGINT, signal_handler)
@@ -0,0 +1,341 @@
+# negrisk_arb.py
+# Detector de arbitraje de cesta en eventos multi-outcome (neg-risk).
+#
+# En un evento neg-risk exactamente un outcome resuelve YES, así que:
+#   - comprar YES de todos los outcomes cuesta sum(bestAsk) y paga 1
+#       => edge de compra = 1 - sum(bestAsk) - fees
+#   - vender YES de todos los outcomes cobra sum(bestBid) y debe 1
+#       (equivale a comprar NO de todos y convertir)
+#       => edge de venta = sum(bestBid) - 1 - fees
+# Cada lado se valora con los niveles crudos del book (sin la banda 0.01/0.99
+# del momentum: los long-shots sin bid >= 0.01 son habituales y la compra solo
+# necesita asks). El chequeo del mejor nivel se hace como operaciones de array
+# sobre la matriz eventos x outcomes (numpy si está instalado); solo las cestas
+# que pasan se recorren en profundidad, todas las patas a la vez, mientras la
+# cesta marginal siga teniendo edge => tamaño ejecutable y edge medio.
+#
+# Uso:
+#   python negrisk_arb.py
+
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy es opcional
+    np = None
+
+from scanner import BOOK_DEPTH_LEVELS, EventScannerGamma, MAX_BOOK_AGE_SEC, book_levels, clear_screen
+
+# =======================
+# CONFIG
+# =======================
+
+NEGRISK_MIN_OUTCOMES = 2
+NEGRISK_FEE_BPS = 0.0
+NEGRISK_MIN_EDGE = 0.0
+NEGRISK_LOOP_INTERVAL_SEC = 1.0
+NEGRISK_TOP_K = 15
+# Banda del tick del CLOB (no la del momentum)
+NEGRISK_BID_MIN = 0.001
+NEGRISK_ASK_MAX = 0.999
+
+Levels = Sequence[Tuple[float, float]]
+# token -> (bids, asks, llegada del book)
+LegBooks = Dict[str, Tuple[Levels, Levels, float]]
+
+
+class NegRiskBasketDetector:
+    """
+    Agrupa los markets de cada evento de Gamma, pide el book YES de cada
+    outcome y calcula edges de cesta para todos los eventos a la vez.
+    """
+
+    def __init__(
+        self,
+        scanner: EventScannerGamma,
+        min_outcomes: int = NEGRISK_MIN_OUTCOMES,
+        fee_bps: float = NEGRISK_FEE_BPS,
+        min_edge: float = NEGRISK_MIN_EDGE,
+        require_neg_risk: bool = True,
+        depth: int = BOOK_DEPTH_LEVELS,
+        max_book_age: Optional[float] = None,
+    ):
+        self.scanner = scanner
+        self.min_outcomes = int(min_outcomes)
+        self.fee_rate = float(fee_bps) / 10000.0
+        self.min_edge = float(min_edge)
+        self.require_neg_risk = bool(require_neg_risk)
+        self.depth = int(depth)
+        # Pata con book más viejo que esto => la cesta no se valora
+        self.max_book_age = float(max_book_age if max_book_age is not None
+                                  else getattr(scanner, "max_book_age", MAX_BOOK_AGE_SEC))
+        self.stale_legs = 0
+
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+
+        self.opportunities: List[Dict] = []
+        self.baskets_evaluated = 0
+        self.loops = 0
+        self.last_loop_ms = 0.0
+
+    # ------------- GROUPING -------------
+    def group_baskets(self, events: List[Dict]) -> List[Dict]:
+        """
+        [{event_id, title, legs: [(market_id, question, yes_token_id)]}]
+        Solo eventos cuyas patas tienen todas token id (si falta una, la
+        cesta no es exhaustiva y el edge sería falso).
+        """
+        baskets = []
+        for e in events:
+            markets = [
+                m for m in (e.get("markets") or [])
+                if m.get("active", True) and not m.get("closed", False)
+            ]
+            if len(markets) < self.min_outcomes:
+                continue
+            if self.require_neg_risk and not (
+                e.get("negRisk") or e.get("enableNegRisk") or all(m.get("negRisk") for m in markets)
+            ):
+                continue
+
+            legs = []
+            for m in markets:
+                yes_tid, _ = self.scanner.get_yes_no_token_ids(m)
+                if not yes_tid:
+                    legs = []
+                    break
+                market_id = str(m.get("id") or m.get("conditionId") or "unknown")
+                label = m.get("groupItemTitle") or m.get("question", "")
+                legs.append((market_id, str(label)[:60], yes_tid))
+            if not legs:
+                continue
+
+            baskets.append({
+                "event_id": str(e.get("id")),
+                "title": str(e.get("title") or "")[:100],
+                "legs": legs,
+            })
+        return baskets
+
+    # ------------- BOOKS -------------
+    def fetch_levels(self, tokens: List[str]) -> LegBooks:
+        """
+        Niveles crudos (bids, asks) de cada token con la hora de llegada del book.
+        Tokens cuyo fetch falla no aparecen en el resultado.
+        """
+        out: LegBooks = {}
+        if not tokens:
+            return out
+        with ThreadPoolExecutor(max_workers=self.scanner.clob_workers) as ex:
+            futures = {ex.submit(self.scanner.fetch_orderbook, tid): tid for tid in tokens}
+            for fut in as_completed(futures):
+                try:
+                    book = fut.result()
+                except Exception:
+                    book = None
+                if book is None:
+                    continue
+                bids, asks = book_levels(book, self.depth, bid_min=NEGRISK_BID_MIN, ask_max=NEGRISK_ASK_MAX)
+                out[futures[fut]] = (bids, asks, time.time())
+        return out
+
+    # ------------- PRICING -------------
+    def _edge(self, price: float, buy: bool) -> float:
+        if buy:
+            return 1.0 - price - price * self.fee_rate
+        return price - 1.0 - price * self.fee_rate
+
+    def _walk_basket(self, legs: List[Levels], buy: bool) -> Tuple[float, float]:
+        """
+        Recorre la profundidad de todas las patas a la vez mientras la cesta
+        marginal (suma de los niveles actuales) tenga edge > min_edge.
+        Devuelve (cestas ejecutables, valor total pagado / cobrado).
+        """
+        idx = [0] * len(legs)
+        rem = [lv[0][1] for lv in legs]
+        size = 0.0
+        value = 0.0
+        while all(i < len(lv) for i, lv in zip(idx, legs)):
+            price = sum(lv[i][0] for i, lv in zip(idx, legs))
+            if self._edge(price, buy) <= self.min_edge:
+                break
+            q = min(rem)
+            if q > 0:
+                size += q
+                value += q * price
+            for k, lv in enumerate(legs):
+                rem[k] -= q
+                if rem[k] <= 1e-12:
+                    idx[k] += 1
+                    rem[k] = lv[idx[k]][1] if idx[k] < len(lv) else 0.0
+        return size, value
+
+    def _side(self, basket: Dict, books: LegBooks, buy: bool, now: float) -> Optional[Dict]:
+        legs = [books[tid][1] if buy else books[tid][0] for _, _, tid in basket["legs"]]
+        size, value = self._walk_basket(legs, buy)
+        if size <= 0:
+            return None
+        edge = self._edge(value / size, buy)
+        top = sum(lv[0][0] for lv in legs)
+        side = "BUY_ALL_YES" if buy else "SELL_ALL_YES"
+        return self._opportunity(basket, side, top, value / size, edge, size, edge * size, now)
+
+    def price_baskets(self, baskets: List[Dict], books: LegBooks, now: float) -> List[Dict]:
+        if not baskets:
+            return []
+        # Patas viejas cuentan como sin book: la cesta entera queda fuera
+        fresh = {tid: lv for tid, lv in books.items() if now - lv[2] <= self.max_book_age}
+        self.stale_legs += len(books) - len(fresh)
+        books = fresh
+        if np is not None:
+            candidates = self._candidates_numpy(baskets, books)
+        else:
+            candidates = self._candidates_python(baskets, books)
+        out = []
+        for i, buy in candidates:
+            opp = self._side(baskets[i], books, buy, now)
+            if opp is not None:
+                out.append(opp)
+        out.sort(key=lambda o: o["expected_edge"], reverse=True)
+        return out
+
+    def _candidates_numpy(self, baskets: List[Dict], books: LegBooks) -> List[Tuple[int, bool]]:
+        """
+        (cesta, lado) cuyo mejor nivel ya tiene edge; una pata sin niveles en ese
+        lado (o sin book) invalida solo ese lado.
+        """
+        n_ev = len(baskets)
+        width = max(len(b["legs"]) for b in baskets)
+
+        # Padding: precio 0 (neutro en la suma). Pata sin niveles => NaN.
+        ask = np.zeros((n_ev, width))
+        bid = np.zeros((n_ev, width))
+
+        for i, b in enumerate(baskets):
+            for j, (_, _, tid) in enumerate(b["legs"]):
+                lv = books.get(tid)
+                bid[i, j] = lv[0][0][0] if lv is not None and lv[0] else np.nan
+                ask[i, j] = lv[1][0][0] if lv is not None and lv[1] else np.nan
+
+        cost = ask.sum(axis=1)
+        proceeds = bid.sum(axis=1)
+        buy_edge = 1.0 - cost - cost * self.fee_rate
+        sell_edge = proceeds - 1.0 - proceeds * self.fee_rate
+
+        out = [(int(i), True) for i in np.nonzero(np.nan_to_num(buy_edge, nan=-np.inf) > self.min_edge)[0]]
+        out += [(int(i), False) for i in np.nonzero(np.nan_to_num(sell_edge, nan=-np.inf) > self.min_edge)[0]]
+        return out
+
+    def _candidates_python(self, baskets: List[Dict], books: LegBooks) -> List[Tuple[int, bool]]:
+        out = []
+        for i, b in enumerate(baskets):
+            legs = [books.get(tid) for _, _, tid in b["legs"]]
+            if any(lv is None for lv in legs):
+                continue
+            if all(lv[1] for lv in legs) and self._edge(sum(lv[1][0][0] for lv in legs), True) > self.min_edge:
+                out.append((i, True))
+            if all(lv[0] for lv in legs) and self._edge(sum(lv[0][0][0] for lv in legs), False) > self.min_edge:
+                out.append((i, False))
+        return out
+
+    def _opportunity(self, basket: Dict, side: str, total: float, avg: float, edge: float, size: float,
+                     expected: float, now: float) -> Dict:
+        return {
+            "ts": now,
+            "event_id": basket["event_id"],
+            "title": basket["title"],
+            "side": side,
+            "n_legs": len(basket["legs"]),
+            "basket_price": float(total),       # mejor nivel
+            "avg_basket_price": float(avg),     # medio sobre `size` cestas
+            "edge_per_share": float(edge),
+            "size": float(size),
+            "expected_edge": float(expected),
+            "legs": basket["legs"],
+        }
+
+    # ------------- LOOP -------------
+    def scan_once(self) -> List[Dict]:
+        start = time.time()
+        events = self.scanner.fetch_events()
+        if not events:
+            return []
+
+        baskets = self.group_baskets(events)
+        tokens = list(dict.fromkeys(tid for b in baskets for _, _, tid in b["legs"]))
+        books = self.fetch_levels(tokens)
+
+        opps = self.price_baskets(baskets, books, time.time())
+
+        with self.lock:
+            self.opportunities = opps
+            self.baskets_evaluated = len(baskets)
+            self.loops += 1
+            self.last_loop_ms = (time.time() - start) * 1000.0
+        return opps
+
+    def run(self, interval: float = NEGRISK_LOOP_INTERVAL_SEC):
+        while not self.stop_event.is_set():
+            t0 = time.time()
+            self.scan_once()
+            self.stop_event.wait(max(0.0, interval - (time.time() - t0)))
+
+    def stop(self):
+        self.stop_event.set()
+
+    # ------------- DASHBOARD -------------
+    def display_dashboard(self, top_k: int = NEGRISK_TOP_K):
+        while not self.stop_event.is_set():
+            self.stop_event.wait(1.0)
+            with self.lock:
+                opps = list(self.opportunities[:top_k])
+                n_baskets = self.baskets_evaluated
+                loops = self.loops
+                loop_ms = self.last_loop_ms
+
+            clear_screen()
+            print("=" * 95)
+            print("🧺 NEG-RISK BASKET ARBITRAGE")
+            print(f"🔁 Loops: {loops} | último loop: {loop_ms:.0f} ms | cestas evaluadas: {n_baskets}")
+            print(f"⚙️ Motor: {'numpy' if np is not None else 'python'} | patas descartadas por book viejo: {self.stale_legs}")
+            print("-" * 95)
+            if not opps:
+                print("Sin oportunidades por encima del edge mínimo.")
+            for o in opps:
+                print(
+                    f"{o['side']:<13} legs={o['n_legs']:<3} precio cesta={o['basket_price']:.4f} "
+                    f"edge={o['edge_per_share']:+.4f} size={o['size']:.1f} esperado={o['expected_edge']:.2f} | {o['title'][:40]}"
+                )
+            print("=" * 95)
+
+
+# ---------------- MAIN ----------------
+if __name__ == "__main__":
+    scanner = EventScannerGamma(min_liquidity=0, min_volume=0, categories=None, multi_outcome=True)
+    detector = NegRiskBasketDetector(scanner)
+
+    run_thread = threading.Thread(target=detector.run, daemon=True)
+    dash_thread = threading.Thread(target=detector.display_dashboard, daemon=True)
+    run_thread.start()
+    dash_thread.start()
+
+    def signal_handler(sig, frame):
+        print("\n[NegRisk] Deteniendo ejecución...")
+        detector.stop()
+        scanner.stop()
+        run_thread.join(timeout=2)
+        dash_thread.join(timeout=2)
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGINT, signal_handler)
+
+    try:
+        while True:
+            time.sleep(0.25)
+    except KeyboardInterrupt:
+        signal_handler(None, None)
@@ -0,0 +1,459 @@
+# order_gateway.py
+# Gateway de órdenes compartido por MarketMaker y MomentumMicroBot.
+#
+# Las estrategias encolan intents (place / cancel) sin bloquear: submit() devuelve
+# al instante un concurrent.futures.Future (y opcionalmente llama a un callback)
+# con el ack y su latencia desde el submit. Un event loop asyncio en su propio
+# thread agrupa los intents en lotes (ventana de pocos ms o tamaño máximo) y los
+# manda por el transporte con varios lotes en vuelo a la vez.
+#
+# Transportes:
+#   - MockExchange: exchange local en memoria con latencia simulada (tests / paper)
+#   - ClobOrderTransport: py-clob-client (síncrono) en un pool de threads
+
+import asyncio
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+# =======================
+# CONFIG
+# =======================
+
+GATEWAY_BATCH_WINDOW_MS = 5.0   # espera para juntar intents en un lote
+GATEWAY_MAX_BATCH = 15          # /orders del CLOB acepta hasta 15 órdenes por request
+GATEWAY_MAX_INFLIGHT = 4        # lotes en vuelo a la vez (conexiones en uso)
+GATEWAY_LATENCY_WINDOW = 2000   # acks recientes para percentiles
+
+MOCK_LATENCY_MS = 15.0
+MOCK_JITTER_MS = 5.0
+
+_client_seq = itertools.count(1)
+
+
+def new_client_id(prefix: str = "c") -> str:
+    return f"{prefix}{int(time.time() * 1000)}_{next(_client_seq)}"
+
+
+@dataclass
+class OrderIntent:
+    kind: str                   # "place" | "cancel"
+    client_id: str = field(default_factory=new_client_id)
+    token_id: str = ""
+    side: str = ""              # "BUY" | "SELL"
+    price: float = 0.0
+    size: float = 0.0
+    order_type: str = "GTC"
+    tag: str = ""               # estrategia / mercado (solo informativo)
+    submitted_ts: float = 0.0
+
+    @classmethod
+    def place(cls, token_id: str, side: str, price: float, size: float, **kw) -> "OrderIntent":
+        return cls(kind="place", token_id=str(token_id), side=side.upper(), price=float(price), size=float(size), **kw)
+
+    @classmethod
+    def cancel(cls, client_id: str, **kw) -> "OrderIntent":
+        """
+        Cancela la orden colocada con `client_id`.
+        """
+        return cls(kind="cancel", client_id=client_id, **kw)
+
+
+@dataclass
+class OrderAck:
+    client_id: str
+    kind: str
+    ok: bool
+    order_id: Optional[str]     # id del exchange
+    error: Optional[str]
+    latency_ms: float           # submit -> ack
+    ts: float
+    intent: OrderIntent
+
+
+@dataclass
+class FillEvent:
+    client_id: str
+    order_id: str               # id del exchange
+    token_id: str
+    side: str
+    price: float
+    size: float                 # tamaño de este fill
+    remaining: float            # lo que queda abierto de la orden
+    ts: float
+    tag: str = ""
+
+
+# ---------------- TRANSPORTS ----------------
+class MockExchange:
+    """
+    Exchange en memoria: asigna ids, guarda órdenes abiertas y simula latencia
+    por request (no por orden), como un endpoint batch real.
+    Con attach(scanner) ejecuta las órdenes que el top-of-book cruza y emite FillEvent.
+    """
+
+    def __init__(self, latency_ms: float = MOCK_LATENCY_MS, jitter_ms: float = MOCK_JITTER_MS,
+                 reject_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.reject_rate = float(reject_rate)
+        self.rnd = random.Random(seed)
+
+        self.orders: Dict[str, OrderIntent] = {}
+        # token_id -> order_ids abiertos (solo se miran los del book que cambió)
+        self.by_token: Dict[str, set] = {}
+        self.lock = threading.Lock()
+        self.fill_listeners: List[Callable[[FillEvent], None]] = []
+        self.requests = 0
+        self._seq = itertools.count(1)
+
+    async def _delay(self):
+        self.requests += 1
+        ms = max(0.0, self.latency_ms + self.rnd.uniform(-self.jitter_ms, self.jitter_ms))
+        await asyncio.sleep(ms / 1000.0)
+
+    async def post_orders(self, intents: List[OrderIntent]) -> List[Tuple[bool, Optional[str], Optional[str]]]:
+        await self._delay()
+        out = []
+        for it in intents:
+            if not (0.0 < it.price < 1.0) or it.size <= 0:
+                out.append((False, None, "precio/tamaño inválido"))
+                continue
+            if self.rnd.random() < self.reject_rate:
+                out.append((False, None, "rechazada (mock)"))
+                continue
+            order_id = f"mock-{next(self._seq)}"
+            with self.lock:
+                self.orders[order_id] = it
+                self.by_token.setdefault(it.token_id, set()).add(order_id)
+            out.append((True, order_id, None))
+        return out
+
+    async def cancel_orders(self, order_ids: List[str]) -> List[Tuple[bool, Optional[str]]]:
+        await self._delay()
+        out = []
+        with self.lock:
+            for oid in order_ids:
+                it = self.orders.pop(oid, None)
+                if it is None:
+                    out.append((False, "orden no abierta"))
+                else:
+                    self.by_token.get(it.token_id, set()).discard(oid)
+                    out.append((True, None))
+        return out
+
+    # ------------- FILLS -------------
+    def on_book(self, token_id: Optional[str], bid: Optional[float], ask: Optional[float]):
+        """
+        Ejecuta (completas, a su precio) las órdenes de token_id que el book cruza.
+        """
+        if not token_id or token_id not in self.by_token:
+            return
+        fills = []
+        now = time.time()
+        with self.lock:
+            ids = self.by_token.get(token_id) or set()
+            for oid in list(ids):
+                it = self.orders[oid]
+                crossed = (it.side == "BUY" and ask is not None and ask <= it.price) or \
+                          (it.side == "SELL" and bid is not None and bid >= it.price)
+                if not crossed:
+                    continue
+                ids.discard(oid)
+                del self.orders[oid]
+                fills.append(FillEvent(it.client_id, oid, token_id, it.side, it.price, it.size, 0.0, now, it.tag))
+            if not ids:
+                self.by_token.pop(token_id, None)
+        for f in fills:
+            for cb in self.fill_listeners:
+                cb(f)
+
+    def attach(self, scanner):
+        """
+        Alimenta on_book desde los snapshots del scanner (YES y NO).
+        """
+        def _on_snapshot(market_id: str, snap: Dict):
+            self.on_book(snap.get("yes_token_id"), snap.get("bestBid_yes"), snap.get("bestAsk_yes"))
+            self.on_book(snap.get("no_token_id"), snap.get("bestBid_no"), snap.get("bestAsk_no"))
+
+        scanner.snapshot_listeners.append(_on_snapshot)
+        return self
+
+
+class ClobOrderTransport:
+    """
+    py-clob-client es síncrono: firma y POST van en un pool de threads para no
+    bloquear el loop. Usa post_orders / cancel_orders (batch) si la versión los tiene.
+    """
+
+    def __init__(self, client, workers: int = GATEWAY_MAX_INFLIGHT):
+        self.client = client
+        self.pool = ThreadPoolExecutor(max_workers=int(workers), thread_name_prefix="clob-gw")
+
+    def _sign(self, it: OrderIntent):
+        from py_clob_client.clob_types import OrderArgs
+        from py_clob_client.order_builder.constants import BUY, SELL
+
+        return self.client.create_order(OrderArgs(
+            price=it.price,
+            size=it.size,
+            side=BUY if it.side == "BUY" else SELL,
+            token_id=it.token_id,
+        ))
+
+    def _post_sync(self, intents: List[OrderIntent]) -> List[Tuple[bool, Optional[str], Optional[str]]]:
+        from py_clob_client.clob_types import OrderType
+
+        signed = [self._sign(it) for it in intents]
+
+        if hasattr(self.client, "post_orders"):
+            from py_clob_client.clob_types import PostOrdersArgs
+
+            resp = self.client.post_orders([
+                PostOrdersArgs(order=s, orderType=getattr(OrderType, it.order_type))
+                for s, it in zip(signed, intents)
+            ])
+        else:
+            resp = [self.client.post_order(s, getattr(OrderType, it.order_type)) for s, it in zip(signed, intents)]
+
+        out = []
+        for r in resp or []:
+            r = r if isinstance(r, dict) else {}
+            order_id = r.get("orderID") or r.get("orderId")
+            ok = bool(r.get("success", True)) and bool(order_id)
+            out.append((ok, order_id, None if ok else (r.get("errorMsg") or "sin orderID")))
+        out.extend([(False, None, "sin respuesta")] * (len(intents) - len(out)))
+        return out
+
+    def _cancel_sync(self, order_ids: List[str]) -> List[Tuple[bool, Optional[str]]]:
+        resp = self.client.cancel_orders(order_ids) or {}
+        canceled = set(resp.get("canceled") or [])
+        not_canceled = resp.get("not_canceled") or {}
+        return [(oid in canceled, None if oid in canceled else str(not_canceled.get(oid, "no cancelada"))) for oid in order_ids]
+
+    async def post_orders(self, intents: List[OrderIntent]):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, self._post_sync, intents)
+
+    async def cancel_orders(self, order_ids: List[str]):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, self._cancel_sync, order_ids)
+
+
+# ---------------- GATEWAY ----------------
+class OrderGateway:
+    def __init__(
+        self,
+        transport=None,
+        batch_window_ms: float = GATEWAY_BATCH_WINDOW_MS,
+        max_batch: int = GATEWAY_MAX_BATCH,
+        max_inflight: int = GATEWAY_MAX_INFLIGHT,
+    ):
+        self.transport = transport if transport is not None else MockExchange()
+        self.batch_window = float(batch_window_ms) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.max_inflight = max(1, int(max_inflight))
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._tasks: set = set()
+
+        # client_id -> order_id del exchange (órdenes vivas)
+        self.order_ids: Dict[str, str] = {}
+        # Fills del transporte (si los emite), reenviados a las estrategias
+        self.fill_listeners: List[Callable[[FillEvent], None]] = []
+        self.fills = 0
+        if hasattr(self.transport, "fill_listeners"):
+            self.transport.fill_listeners.append(self._on_fill)
+        # places en vuelo y cancels que esperan a su ack
+        self._placing: set = set()
+        self._deferred_cancels: Dict[str, List[Tuple[OrderIntent, Future]]] = {}
+
+        # Stats
+        self.submitted = 0
+        self.acked = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batched_intents = 0
+        self.latencies: Deque[float] = deque(maxlen=GATEWAY_LATENCY_WINDOW)
+
+    # ------------- LIFECYCLE -------------
+    def start(self) -> "OrderGateway":
+        with self._start_lock:
+            if self.thread is not None:
+                return self
+            self.thread = threading.Thread(target=self._thread_main, name="order-gateway", daemon=True)
+            self.thread.start()
+        self._ready.wait()
+        return self
+
+    def _thread_main(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.queue = asyncio.Queue()
+        self._batcher_task = self.loop.create_task(self._batcher())
+        self._ready.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    def stop(self, timeout: float = 2.0):
+        if self.loop is None or not self.loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+
+    async def _shutdown(self):
+        self._batcher_task.cancel()
+        try:
+            await self._batcher_task
+        except asyncio.CancelledError:
+            pass
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=1.0)
+        while not self.queue.empty():
+            intent, fut = self.queue.get_nowait()
+            self._ack(intent, fut, False, None, "gateway detenido")
+
+    # ------------- SUBMIT (cualquier thread, no bloquea) -------------
+    def submit(self, intent: OrderIntent, callback: Optional[Callable[[OrderAck], None]] = None) -> Future:
+        if self.loop is None:
+            self.start()
+        fut: Future = Future()
+        if callback is not None:
+            fut.add_done_callback(lambda f: callback(f.result()))
+        intent.submitted_ts = time.time()
+        self.submitted += 1
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (intent, fut))
+        return fut
+
+    def place(self, token_id: str, side: str, price: float, size: float,
+              callback: Optional[Callable[[OrderAck], None]] = None, **kw) -> Tuple[str, Future]:
+        intent = OrderIntent.place(token_id, side, price, size, **kw)
+        return intent.client_id, self.submit(intent, callback)
+
+    def cancel(self, client_id: str, callback: Optional[Callable[[OrderAck], None]] = None) -> Future:
+        return self.submit(OrderIntent.cancel(client_id), callback)
+
+    # ------------- BATCHING (thread del loop) -------------
+    async def _batcher(self):
+        sem = asyncio.Semaphore(self.max_inflight)
+        while True:
+            batch = [await self.queue.get()]
+            if self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            await sem.acquire()
+            task = asyncio.get_running_loop().create_task(self._send(batch, sem))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[OrderIntent, Future]], sem: asyncio.Semaphore):
+        try:
+            self.batches += 1
+            self.batched_intents += len(batch)
+
+            places = [(it, f) for it, f in batch if it.kind == "place"]
+            # Antes de mirar los cancels: un cancel del mismo lote que su place se difiere
+            for it, _ in places:
+                self._placing.add(it.client_id)
+
+            cancels = []
+            for it, f in batch:
+                if it.kind != "cancel":
+                    continue
+                order_id = self.order_ids.get(it.client_id)
+                if order_id is not None:
+                    cancels.append((it, f, order_id))
+                elif it.client_id in self._placing:
+                    # El place aún no tiene ack: se cancela en cuanto llegue
+                    self._deferred_cancels.setdefault(it.client_id, []).append((it, f))
+                else:
+                    self._ack(it, f, False, None, "orden desconocida")
+
+            await asyncio.gather(self._send_places(places), self._send_cancels(cancels))
+        finally:
+            sem.release()
+
+    async def _send_places(self, places: List[Tuple[OrderIntent, Future]]):
+        if not places:
+            return
+        try:
+            results = await self.transport.post_orders([it for it, _ in places])
+        except Exception as e:
+            results = [(False, None, f"{type(e).__name__}: {e}")] * len(places)
+
+        for (it, f), (ok, order_id, error) in zip(places, results):
+            self._placing.discard(it.client_id)
+            if ok:
+                self.order_ids[it.client_id] = order_id
+            self._ack(it, f, ok, order_id, error)
+
+            for c_it, c_f in self._deferred_cancels.pop(it.client_id, []):
+                if ok:
+                    self.queue.put_nowait((c_it, c_f))
+                else:
+                    self._ack(c_it, c_f, False, None, "orden no colocada")
+
+    async def _send_cancels(self, cancels: List[Tuple[OrderIntent, Future, str]]):
+        if not cancels:
+            return
+        try:
+            results = await self.transport.cancel_orders([oid for _, _, oid in cancels])
+        except Exception as e:
+            results = [(False, f"{type(e).__name__}: {e}")] * len(cancels)
+
+        for (it, f, order_id), (ok, error) in zip(cancels, results):
+            if ok:
+                self.order_ids.pop(it.client_id, None)
+            self._ack(it, f, ok, order_id, error)
+
+    def _ack(self, intent: OrderIntent, fut: Future, ok: bool, order_id: Optional[str], error: Optional[str]):
+        now = time.time()
+        latency_ms = (now - intent.submitted_ts) * 1000.0
+        if ok:
+            self.acked += 1
+        else:
+            self.rejected += 1
+        self.latencies.append(latency_ms)
+        if not fut.done():
+            fut.set_result(OrderAck(intent.client_id, intent.kind, ok, order_id, error, latency_ms, now, intent))
+
+    def _on_fill(self, fill: FillEvent):
+        # Puede llegar desde cualquier thread (p.ej. el del scanner con MockExchange)
+        self.fills += 1
+        if fill.remaining <= 0:
+            self.order_ids.pop(fill.client_id, None)
+        for cb in self.fill_listeners:
+            cb(fill)
+
+    # ------------- STATS -------------
+    def latency_percentile(self, p: float) -> Optional[float]:
+        lat = sorted(self.latencies)
+        if not lat:
+            return None
+        return lat[min(len(lat) - 1, int(p / 100.0 * len(lat)))]
+
+    def stats(self) -> Dict:
+        return {
+            "submitted": self.submitted,
+            "acked": self.acked,
+            "rejected": self.rejected,
+            "pending": self.submitted - self.acked - self.rejected,
+            "batches": self.batches,
+            "avg_batch": (self.batched_intents / self.batches) if self.batches else 0.0,
+            "ack_p50_ms": self.latency_percentile(50),
+            "ack_p99_ms": self.latency_percentile(99),
+            "fills": self.fills,
+        }
@@ -0,0 +1,300 @@
+# paper_fills.py
+# Simulador de fills para paper trading con posición en cola.
+#
+# Transporte para OrderGateway (misma interfaz que MockExchange). Cada orden:
+#   - empieza a descansar en el book rest_latency_ms después de la decisión
+#     (intent.submitted_ts); antes de eso no puede ejecutarse
+#   - si al descansar cruza el book, ejecuta como taker contra los niveles
+#     opuestos hasta su precio (parcial si no hay tamaño suficiente)
+#   - si no, entra al final de la cola de su nivel: queue_ahead = tamaño visible
+#   - las bajadas de tamaño del nivel sin trades se reparten pro-rata (cancelaciones
+#     delante y detrás de nosotros); los trade prints consumen primero la cola
+#     y luego nos ejecutan (fills parciales)
+#   - si el lado opuesto llega a nuestro precio, el nivel fue barrido: fill completo
+#
+# Órdenes indexadas por token -> solo se recorren las del book que cambió.
+#
+# Uso:
+#   sim = PaperFillSimulator().attach(scanner)
+#   gateway = OrderGateway(sim)
+
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from order_gateway import FillEvent, MockExchange, OrderIntent
+
+# =======================
+# CONFIG
+# =======================
+
+PAPER_REST_LATENCY_MS = 120.0   # decisión -> orden descansando en el book
+PAPER_ACK_LATENCY_MS = 15.0     # latencia por request (ack)
+PAPER_ACK_JITTER_MS = 5.0
+
+Levels = Sequence[Tuple[float, float]]
+
+EPS = 1e-9
+
+
+class SimOrder:
+    __slots__ = ("intent", "order_id", "token_id", "side", "price", "remaining",
+                 "queue_ahead", "level_size", "rest_ts", "resting", "filled", "notional")
+
+    def __init__(self, intent: OrderIntent, order_id: str, rest_ts: float):
+        self.intent = intent
+        self.order_id = order_id
+        self.token_id = intent.token_id
+        self.side = intent.side
+        self.price = intent.price
+        self.remaining = intent.size
+        self.queue_ahead = 0.0
+        self.level_size = 0.0
+        self.rest_ts = rest_ts
+        self.resting = False
+        self.filled = 0.0
+        self.notional = 0.0
+
+
+def _size_at(levels: Levels, price: float) -> Optional[float]:
+    """
+    Tamaño visible en `price`; 0 si el precio está dentro del rango conocido pero
+    sin nivel; None si cae más allá de la profundidad conocida.
+    """
+    for px, sz in levels:
+        if abs(px - price) < EPS:
+            return sz
+    if levels and abs(levels[-1][0] - levels[0][0]) + EPS < abs(price - levels[0][0]):
+        return None
+    return 0.0
+
+
+class PaperFillSimulator(MockExchange):
+    def __init__(
+        self,
+        rest_latency_ms: float = PAPER_REST_LATENCY_MS,
+        latency_ms: float = PAPER_ACK_LATENCY_MS,
+        jitter_ms: float = PAPER_ACK_JITTER_MS,
+        reject_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        super().__init__(latency_ms=latency_ms, jitter_ms=jitter_ms, reject_rate=reject_rate, seed=seed)
+        self.rest_latency = float(rest_latency_ms) / 1000.0
+
+        # order_id -> SimOrder ; token_id -> {order_id: SimOrder}
+        self.sim: Dict[str, SimOrder] = {}
+        self.sim_by_token: Dict[str, Dict[str, SimOrder]] = {}
+
+        # Stats
+        self.book_updates = 0
+        self.orders_touched = 0
+        self.fill_events = 0
+        self.partial_fills = 0
+        self.taker_fills = 0
+
+    # ------------- ORDER API (gateway) -------------
+    async def post_orders(self, intents: List[OrderIntent]) -> List[Tuple[bool, Optional[str], Optional[str]]]:
+        await self._delay()
+        out = []
+        for it in intents:
+            if not (0.0 < it.price < 1.0) or it.size <= 0:
+                out.append((False, None, "precio/tamaño inválido"))
+                continue
+            if self.rnd.random() < self.reject_rate:
+                out.append((False, None, "rechazada (paper)"))
+                continue
+            order_id = f"paper-{next(self._seq)}"
+            o = SimOrder(it, order_id, (it.submitted_ts or time.time()) + self.rest_latency)
+            with self.lock:
+                self.sim[order_id] = o
+                self.sim_by_token.setdefault(o.token_id, {})[order_id] = o
+            out.append((True, order_id, None))
+        return out
+
+    async def cancel_orders(self, order_ids: List[str]) -> List[Tuple[bool, Optional[str]]]:
+        await self._delay()
+        out = []
+        with self.lock:
+            for oid in order_ids:
+                o = self.sim.pop(oid, None)
+                if o is None:
+                    out.append((False, "orden no abierta"))
+                    continue
+                self._unindex(o)
+                out.append((True, None))
+        return out
+
+    def _unindex(self, o: SimOrder):
+        orders = self.sim_by_token.get(o.token_id)
+        if orders is not None:
+            orders.pop(o.order_id, None)
+            if not orders:
+                del self.sim_by_token[o.token_id]
+
+    # ------------- MATCHING -------------
+    def _fill(self, o: SimOrder, size: float, price: float, now: float, fills: List[FillEvent]):
+        size = min(size, o.remaining)
+        if size <= EPS:
+            return
+        o.remaining -= size
+        o.filled += size
+        o.notional += size * price
+        if o.remaining <= EPS:
+            o.remaining = 0.0
+            self.sim.pop(o.order_id, None)
+            self._unindex(o)
+        else:
+            self.partial_fills += 1
+        self.fill_events += 1
+        fills.append(FillEvent(o.intent.client_id, o.order_id, o.token_id, o.side, price, size,
+                               o.remaining, now, o.intent.tag))
+
+    def _start_resting(self, o: SimOrder, bids: Levels, asks: Levels, now: float, fills: List[FillEvent]):
+        o.resting = True
+        # Marketable al llegar: ejecuta como taker contra los niveles opuestos
+        opposite = asks if o.side == "BUY" else bids
+        for px, sz in opposite:
+            if o.remaining <= EPS:
+                break
+            if (o.side == "BUY" and px > o.price + EPS) or (o.side == "SELL" and px < o.price - EPS):
+                break
+            if sz > EPS:
+                self.taker_fills += 1
+                self._fill(o, sz, px, now, fills)
+        if o.remaining <= EPS:
+            return
+
+        # Resto: al final de la cola de su nivel
+        own = bids if o.side == "BUY" else asks
+        visible = _size_at(own, o.price)
+        o.level_size = visible or 0.0
+        o.queue_ahead = o.level_size
+
+    def _update_resting(self, o: SimOrder, bids: Levels, asks: Levels, now: float, fills: List[FillEvent]):
+        # Lado opuesto en (o a través de) nuestro precio => nivel barrido
+        if o.side == "BUY":
+            if asks and asks[0][0] <= o.price + EPS:
+                self._fill(o, o.remaining, o.price, now, fills)
+                return
+            own = bids
+            better = not bids or o.price > bids[0][0] + EPS
+        else:
+            if bids and bids[0][0] >= o.price - EPS:
+                self._fill(o, o.remaining, o.price, now, fills)
+                return
+            own = asks
+            better = not asks or o.price < asks[0][0] - EPS
+
+        if better:
+            # Somos el mejor precio: nadie delante
+            o.queue_ahead = 0.0
+            o.level_size = 0.0
+            return
+
+        cur = _size_at(own, o.price)
+        if cur is None:
+            return
+        drop = o.level_size - cur
+        if drop > 0 and o.level_size > 0:
+            # Cancelaciones repartidas pro-rata entre delante y detrás
+            o.queue_ahead -= drop * (o.queue_ahead / o.level_size)
+        o.level_size = cur
+        o.queue_ahead = max(0.0, min(o.queue_ahead, cur))
+
+    def on_book_levels(self, token_id: Optional[str], bids: Levels, asks: Levels, now: Optional[float] = None):
+        """
+        Book nuevo de token_id: ((precio, tamaño), ...) de mejor a peor.
+        """
+        if not token_id or token_id not in self.sim_by_token:
+            return
+        now = time.time() if now is None else now
+        fills: List[FillEvent] = []
+        with self.lock:
+            self.book_updates += 1
+            for o in list(self.sim_by_token.get(token_id, {}).values()):
+                self.orders_touched += 1
+                if not o.resting:
+                    if now < o.rest_ts:
+                        continue
+                    self._start_resting(o, bids, asks, now, fills)
+                else:
+                    self._update_resting(o, bids, asks, now, fills)
+        self._emit(fills)
+
+    def on_book(self, token_id: Optional[str], bid: Optional[float], ask: Optional[float],
+                bid_size: float = 0.0, ask_size: float = 0.0):
+        bids = ((bid, bid_size or 0.0),) if bid is not None else ()
+        asks = ((ask, ask_size or 0.0),) if ask is not None else ()
+        self.on_book_levels(token_id, bids, asks)
+
+    def on_trade(self, token_id: str, price: float, size: float, now: Optional[float] = None):
+        """
+        Trade print: a nuestro precio consume primero la cola; a través de él nos ejecuta.
+        """
+        if token_id not in self.sim_by_token:
+            return
+        now = time.time() if now is None else now
+        fills: List[FillEvent] = []
+        with self.lock:
+            for o in sorted(self.sim_by_token.get(token_id, {}).values(), key=lambda x: x.rest_ts):
+                if not o.resting or size <= EPS:
+                    continue
+                through = price < o.price - EPS if o.side == "BUY" else price > o.price + EPS
+                at = abs(price - o.price) < EPS
+                if through:
+                    take = min(size, o.remaining)
+                elif at:
+                    eaten = min(size, o.queue_ahead)
+                    o.queue_ahead -= eaten
+                    o.level_size = max(0.0, o.level_size - eaten)
+                    take = min(size - eaten, o.remaining)
+                else:
+                    continue
+                self._fill(o, take, o.price, now, fills)
+                size -= take
+        self._emit(fills)
+
+    def _emit(self, fills: List[FillEvent]):
+        for f in fills:
+            for cb in self.fill_listeners:
+                cb(f)
+
+    # ------------- FEED -------------
+    def attach(self, scanner):
+        """
+        Alimenta el simulador con los books (con profundidad) de cada snapshot del scanner.
+        """
+        def _on_snapshot(market_id: str, snap):
+            now = snap.get("ts")
+            for side in ("yes", "no"):
+                tid = snap.get(f"{side}_token_id")
+                if tid not in self.sim_by_token:
+                    continue
+                # Books del mismo lote que el snapshot (book_tops puede ir un lote por delante)
+                top = scanner.batch_tops.get(tid) if hasattr(scanner, "batch_tops") else None
+                if top is not None:
+                    self.on_book_levels(tid, top.bids, top.asks, now)
+                else:
+                    self.on_book_levels(
+                        tid,
+                        ((snap[f"bestBid_{side}"], snap.get(f"bidSize_{side}") or 0.0),),
+                        ((snap[f"bestAsk_{side}"], snap.get(f"askSize_{side}") or 0.0),),
+                        now,
+                    )
+
+        scanner.snapshot_listeners.append(_on_snapshot)
+        return self
+
+    def stats(self) -> Dict:
+        with self.lock:
+            resting = sum(1 for o in self.sim.values() if o.resting)
+            queued = sum(o.queue_ahead for o in self.sim.values() if o.resting)
+        return {
+            "open": len(self.sim),
+            "resting": resting,
+            "queue_ahead": queued,
+            "book_updates": self.book_updates,
+            "orders_touched": self.orders_touched,
+            "fills": self.fill_events,
+            "partial_fills": self.partial_fills,
+            "taker_fills": self.taker_fills,
+        }
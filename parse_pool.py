@@ -0,0 +1,119 @@
+# parse_pool.py
+# Pool de procesos para sacar del GIL del scanner el json.loads de los books
+# y del payload de Gamma, más el cálculo de mid / imbalance / microprice.
+#
+# Los threads del scanner siguen haciendo la I/O y pasan bytes crudos;
+# los workers devuelven registros compactos (BookTop como tupla) listos
+# para construir snapshots, o (score, market compacto) para Gamma.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+from typing import Dict, List, Optional, Tuple
+
+from scanner import BookTop, EventScannerGamma, decode_events_payload, decode_json, parse_events_page, summarize_book
+
+# Trozos por worker al repartir books (equilibrio entre overhead IPC y balanceo)
+PARSE_CHUNKS_PER_WORKER = 2
+
+# Claves de Gamma que el resto del pipeline necesita de cada market
+COMPACT_MARKET_KEYS = (
+    "id",
+    "conditionId",
+    "question",
+    "outcomes",
+    "outcomePrices",
+    "clobTokenIds",
+    "liquidityNum",
+    "liquidity",
+    "volumeNum",
+    "volume",
+)
+
+_WORKER_SCANNER: Optional[EventScannerGamma] = None
+
+
+# ---------------- WORKER ----------------
+def _init_worker(scanner_kwargs: Dict):
+    global _WORKER_SCANNER
+    _WORKER_SCANNER = EventScannerGamma(**scanner_kwargs)
+
+
+def decode_books_chunk(items: List[Tuple[str, bytes]]) -> List[Tuple[str, Optional[tuple]]]:
+    out = []
+    for tid, raw in items:
+        book = decode_json(raw)
+        if not isinstance(book, dict):
+            continue
+        top = summarize_book(book)
+        out.append((tid, tuple(top) if top is not None else None))
+    return out
+
+
+def compact_market(m: Dict) -> Dict:
+    return {k: m[k] for k in COMPACT_MARKET_KEYS if k in m}
+
+
+def score_events(events: List[Dict]) -> List[Tuple[float, Dict]]:
+    sc = _WORKER_SCANNER
+    out = []
+    for m in sc.filter_markets(events):
+        s = sc.market_score(m)
+        if s > 0.0:
+            out.append((s, compact_market(m)))
+    return out
+
+
+def decode_events_page(raw: bytes) -> List[Tuple[float, Dict]]:
+    return score_events(decode_events_payload(raw))
+
+
+def decode_gamma_page(raw: Optional[bytes]) -> Optional[Tuple[int, List[Tuple[float, Dict]]]]:
+    """
+    (nº de eventos, [(score, market)]) de una página; None si no decodifica.
+    """
+    events = parse_events_page(raw)
+    if events is None:
+        return None
+    return len(events), score_events(events)
+
+
+# ---------------- POOL ----------------
+class ParsePool:
+    def __init__(self, workers: Optional[int] = None, scanner_kwargs: Optional[Dict] = None):
+        self.workers = int(workers or os.cpu_count() or 1)
+        self.ex = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(scanner_kwargs or {},),
+        )
+
+    def decode_books(self, raws: Dict[str, bytes]) -> Dict[str, Optional[BookTop]]:
+        items = list(raws.items())
+        n_chunks = max(1, min(len(items), self.workers * PARSE_CHUNKS_PER_WORKER))
+        chunks = [items[i::n_chunks] for i in range(n_chunks)]
+        out: Dict[str, Optional[BookTop]] = {}
+        for fut in [self.ex.submit(decode_books_chunk, c) for c in chunks]:
+            for tid, rec in fut.result():
+                out[tid] = BookTop._make(rec) if rec is not None else None
+        return out
+
+    def decode_events(self, raw: bytes) -> List[Tuple[float, Dict]]:
+        return self.ex.submit(decode_events_page, raw).result()
+
+    def decode_gamma_pages(self, raws: List[Optional[bytes]]) -> List[Optional[Tuple[int, List[Tuple[float, Dict]]]]]:
+        """
+        Misma forma que EventScannerGamma.decode_gamma_pages (lo usa fetch_events_pages).
+        """
+        futs = [self.ex.submit(decode_gamma_page, r) if r else None for r in raws]
+        return [f.result() if f is not None else None for f in futs]
+
+    def decode_events_pages(self, raws: List[bytes]) -> List[Tuple[float, Dict]]:
+        out: List[Tuple[float, Dict]] = []
+        for fut in [self.ex.submit(decode_events_page, r) for r in raws]:
+            out.extend(fut.result())
+        return out
+
+    def shutdown(self):
+        self.ex.shutdown(wait=False, cancel_futures=True)
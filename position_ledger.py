@@ -0,0 +1,87 @@
+# position_ledger.py
+# Ledger de posición / cash por (market, outcome) con PnL realizado (coste medio)
+# y no realizado contra el último mid, ambos mantenidos de forma incremental:
+# cada fill o cada mark solo toca su clave y ajusta los totales.
+
+from typing import Dict, Hashable, List, Optional
+
+EPS = 1e-9
+
+
+class Position:
+    __slots__ = ("qty", "avg_price", "cash", "realized", "mark", "unrealized", "fills")
+
+    def __init__(self):
+        self.qty = 0.0          # shares (+ largo, - corto)
+        self.avg_price = 0.0    # coste medio de la posición abierta
+        self.cash = 0.0
+        self.realized = 0.0
+        self.mark: Optional[float] = None
+        self.unrealized = 0.0
+        self.fills = 0
+
+
+class PositionLedger:
+    def __init__(self):
+        self.positions: Dict[Hashable, Position] = {}
+        self.open: set = set()
+        self.realized_total = 0.0
+        self.unrealized_total = 0.0
+        self.cash_total = 0.0
+        self.fills = 0
+
+    @property
+    def pnl(self) -> float:
+        return self.realized_total + self.unrealized_total
+
+    def _set_unrealized(self, pos: Position):
+        new = pos.qty * (pos.mark - pos.avg_price) if pos.mark is not None and abs(pos.qty) > EPS else 0.0
+        self.unrealized_total += new - pos.unrealized
+        pos.unrealized = new
+
+    def apply_fill(self, key: Hashable, side: str, price: float, size: float) -> Position:
+        pos = self.positions.get(key)
+        if pos is None:
+            pos = self.positions[key] = Position()
+
+        q = float(size) if side.upper() == "BUY" else -float(size)
+        price = float(price)
+
+        pos.cash -= q * price
+        self.cash_total -= q * price
+
+        if abs(pos.qty) <= EPS or (pos.qty > 0) == (q > 0):
+            total = abs(pos.qty) + abs(q)
+            pos.avg_price = (pos.avg_price * abs(pos.qty) + price * abs(q)) / total
+            pos.qty += q
+        else:
+            closed = min(abs(q), abs(pos.qty))
+            pnl = closed * (price - pos.avg_price) * (1.0 if pos.qty > 0 else -1.0)
+            pos.realized += pnl
+            self.realized_total += pnl
+            pos.qty += q
+            if abs(pos.qty) <= EPS:
+                pos.qty = 0.0
+                pos.avg_price = 0.0
+            elif abs(q) > closed:
+                # Cruzó de largo a corto (o al revés): el resto abre a este precio
+                pos.avg_price = price
+
+        pos.fills += 1
+        self.fills += 1
+        if abs(pos.qty) > EPS:
+            self.open.add(key)
+        else:
+            self.open.discard(key)
+        self._set_unrealized(pos)
+        return pos
+
+    def mark(self, key: Hashable, mid: Optional[float]):
+        pos = self.positions.get(key)
+        if pos is None or mid is None:
+            return
+        pos.mark = float(mid)
+        self._set_unrealized(pos)
+
+    def open_keys(self) -> List[Hashable]:
+        return list(self.open)
@@ -0,0 +1,177 @@
+# ranking_index.py
+# Índice incremental del ranking de mercados (top-N para pedir orderbooks).
+#
+# En cada refresh de Gamma solo se re-puntúan los mercados cuya liquidez,
+# volumen, precios o token ids cambiaron desde el fetch anterior. Los scores
+# se mantienen en una lista ordenada (bisect), así que el top-N es un slice.
+# Se registra el churn (entradas / salidas del top-N) de cada refresh.
+# El índice tiene su propio lock: el refresh corre en el thread de Gamma, fuera
+# del lock del scanner, y export_state tiene que ver entries / markets / order
+# del mismo refresh.
+
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Campos crudos de Gamma de los que depende market_score
+RANK_FINGERPRINT_KEYS = (
+    "liquidityNum",
+    "liquidity",
+    "volumeNum",
+    "volume",
+    "outcomePrices",
+    "clobTokenIds",
+)
+
+
+def market_key(m: Dict) -> str:
+    return str(m.get("id") or m.get("conditionId") or "unknown")
+
+
+def market_fingerprint(m: Dict) -> Tuple:
+    return tuple(m.get(k) for k in RANK_FINGERPRINT_KEYS)
+
+
+class RankingIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # market_id -> (fingerprint, score)
+        self.entries: Dict[str, Tuple[Tuple, float]] = {}
+        # market_id -> último dict de Gamma visto
+        self.markets: Dict[str, Dict] = {}
+        # (-score, market_id) ordenado; solo scores > 0
+        self.order: List[Tuple[float, str]] = []
+
+        self.last_top: List[str] = []
+        self.last_top_set: set = set()
+
+        # Stats del último refresh
+        self.rescored = 0
+        self.reused = 0
+        self.removed = 0
+        self.entered = 0
+        self.exited = 0
+        self.last_update_ms = 0.0
+
+        # Acumulados
+        self.refreshes = 0
+        self.total_rescored = 0
+        self.total_reused = 0
+        self.total_entered = 0
+        self.total_exited = 0
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    # ------------- ORDERED SET -------------
+    def _set_score(self, market_id: str, fp: Tuple, score: float):
+        prev = self.entries.get(market_id)
+        if prev is not None and prev[1] > 0.0:
+            i = bisect_left(self.order, (-prev[1], market_id))
+            if i < len(self.order) and self.order[i][1] == market_id:
+                del self.order[i]
+        self.entries[market_id] = (fp, score)
+        if score > 0.0:
+            insort(self.order, (-score, market_id))
+
+    def _drop(self, market_id: str):
+        prev = self.entries.pop(market_id, None)
+        self.markets.pop(market_id, None)
+        if prev is not None and prev[1] > 0.0:
+            i = bisect_left(self.order, (-prev[1], market_id))
+            if i < len(self.order) and self.order[i][1] == market_id:
+                del self.order[i]
+
+    # ------------- REFRESH -------------
+    def update(self, markets: Iterable[Dict], score_fn: Callable[[Dict], float]):
+        """
+        Refresh con los mercados filtrados de un fetch de Gamma.
+        Los que no aparecen salen del índice.
+        """
+        with self.lock:
+            self._update(((None, m) for m in markets), score_fn)
+
+    def update_scored(self, scored: Iterable[Tuple[float, Dict]]):
+        """
+        Refresh con pares (score, market) ya puntuados (p.ej. en el pool de procesos).
+        Solo se toca el orden de los mercados cuyo fingerprint cambió.
+        """
+        with self.lock:
+            self._update(scored, None)
+
+    def _update(self, scored: Iterable[Tuple[Optional[float], Dict]], score_fn: Optional[Callable[[Dict], float]]):
+        start = time.time()
+        seen = set()
+        rescored = reused = 0
+
+        for score, m in scored:
+            market_id = market_key(m)
+            seen.add(market_id)
+            fp = market_fingerprint(m)
+            self.markets[market_id] = m
+
+            prev = self.entries.get(market_id)
+            if prev is not None and prev[0] == fp:
+                reused += 1
+                continue
+            self._set_score(market_id, fp, score_fn(m) if score_fn is not None else score)
+            rescored += 1
+
+        self._finish(seen, rescored, reused, start)
+
+    def _finish(self, seen: set, rescored: int, reused: int, start: float):
+        gone = [k for k in self.entries if k not in seen]
+        for market_id in gone:
+            self._drop(market_id)
+
+        self.rescored = rescored
+        self.reused = reused
+        self.removed = len(gone)
+        self.refreshes += 1
+        self.total_rescored += rescored
+        self.total_reused += reused
+        self.last_update_ms = (time.time() - start) * 1000.0
+
+    # ------------- TOP-N -------------
+    def top(self, n: int) -> List[Dict]:
+        """
+        Top-N actual (mejor primero) y churn respecto a la llamada anterior.
+        """
+        with self.lock:
+            ids = [market_id for _, market_id in self.order[:n]]
+            ids_set = set(ids)
+
+            self.entered = len(ids_set - self.last_top_set)
+            self.exited = len(self.last_top_set - ids_set)
+            self.total_entered += self.entered
+            self.total_exited += self.exited
+            self.last_top = ids
+            self.last_top_set = ids_set
+
+            return [self.markets[market_id] for market_id in ids]
+
+    # ------------- CHECKPOINT -------------
+    def export_state(self) -> Dict:
+        """
+        Copia consistente del índice (entries / markets / order del mismo refresh).
+        """
+        with self.lock:
+            return {
+                "entries": dict(self.entries),
+                "markets": dict(self.markets),
+                "order": list(self.order),
+                "last_top": list(self.last_top),
+            }
+
+    def load_state(self, state: Dict):
+        with self.lock:
+            self.entries = state["entries"]
+            self.markets = state["markets"]
+            self.order = state["order"]
+            self.last_top = state["last_top"]
+            self.last_top_set = set(self.last_top)
+
+    def score(self, market_id: str) -> Optional[float]:
+        entry = self.entries.get(market_id)
+        return entry[1] if entry is not None else None
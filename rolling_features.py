@@ -0,0 +1,149 @@
+# rolling_features.py
+# Features de microestructura por mercado, actualizadas en O(1) por tick.
+#
+# El scanner mantiene un RollingFeatures por mercado y lo actualiza con cada
+# snapshot nuevo, escribiendo los valores en el propio snapshot; las estrategias
+# los leen en vez de recorrer el historial.
+#
+# Todas las medias son EWMA con decaimiento por tiempo real (ticks irregulares):
+#   alpha = 1 - exp(-dt * ln2 / half_life)
+#
+# Por token (yes / no):
+#   mid_ema_<hl>s_<side>   EWMA del mid a varias vidas medias
+#   rv_<side>              volatilidad realizada: sqrt(EWMA(dmid² / dt)), precio / sqrt(seg)
+#   ofi_<side>             order-flow imbalance del top of book (Cont-Kukanov-Stoikov),
+#                          suma con decaimiento (shares; > 0 = presión compradora)
+#   spread_ema_<side>      EWMA del spread
+# Por mercado:
+#   midsum_dev             mid_yes + mid_no - 1 (instantáneo)
+#   midsum_dev_ema         su EWMA: deriva persistente de la suma YES/NO
+
+import math
+from typing import Dict, Optional, Tuple
+
+# =======================
+# CONFIG
+# =======================
+
+FEATURE_MID_HALF_LIVES_SEC: Tuple[float, ...] = (1.0, 5.0, 30.0)
+FEATURE_VOL_HALF_LIFE_SEC = 30.0
+FEATURE_OFI_HALF_LIFE_SEC = 5.0
+FEATURE_SPREAD_HALF_LIFE_SEC = 10.0
+FEATURE_DRIFT_HALF_LIFE_SEC = 30.0
+
+_SIDES = ("yes", "no")
+_LN2 = math.log(2.0)
+_MIN_DT = 1e-3
+
+
+def _mid_field(hl: float, side: str) -> str:
+    return f"mid_ema_{hl:g}s_{side}"
+
+
+FEATURE_FIELDS: Tuple[str, ...] = tuple(
+    [_mid_field(hl, side) for side in _SIDES for hl in FEATURE_MID_HALF_LIVES_SEC]
+    + [f"{name}_{side}" for side in _SIDES for name in ("rv", "ofi", "spread_ema")]
+    + ["midsum_dev", "midsum_dev_ema"]
+)
+
+
+def _alpha(dt: float, half_life: float) -> float:
+    return 1.0 - math.exp(-dt * _LN2 / half_life)
+
+
+class _SideState:
+    __slots__ = ("emas", "var", "ofi", "spread_ema", "bid", "ask", "bid_size", "ask_size", "mid")
+
+    def __init__(self):
+        self.emas = None
+        self.var = 0.0
+        self.ofi = 0.0
+        self.spread_ema = None
+        self.bid = None
+        self.ask = None
+        self.bid_size = 0.0
+        self.ask_size = 0.0
+        self.mid = None
+
+
+class RollingFeatures:
+    __slots__ = ("ts", "yes", "no", "midsum_ema")
+
+    def __init__(self):
+        self.ts: Optional[float] = None
+        self.yes = _SideState()
+        self.no = _SideState()
+        self.midsum_ema: Optional[float] = None
+
+    def update(self, snap: Dict) -> Dict:
+        """
+        Incorpora el snapshot y escribe FEATURE_FIELDS en él. Devuelve el snapshot.
+        """
+        ts = snap["ts"]
+        dt = max(ts - self.ts, _MIN_DT) if self.ts is not None else None
+
+        self._update_side(self.yes, snap, "yes", dt)
+        self._update_side(self.no, snap, "no", dt)
+
+        mid_yes = snap.get("mid_yes")
+        mid_no = snap.get("mid_no")
+        dev = (mid_yes + mid_no - 1.0) if (mid_yes is not None and mid_no is not None) else None
+        if dev is not None:
+            if self.midsum_ema is None or dt is None:
+                self.midsum_ema = dev
+            else:
+                self.midsum_ema += _alpha(dt, FEATURE_DRIFT_HALF_LIFE_SEC) * (dev - self.midsum_ema)
+        snap["midsum_dev"] = dev
+        snap["midsum_dev_ema"] = self.midsum_ema
+
+        self.ts = ts
+        return snap
+
+    def _update_side(self, st: _SideState, snap: Dict, side: str, dt: Optional[float]):
+        bid = snap.get(f"bestBid_{side}")
+        ask = snap.get(f"bestAsk_{side}")
+        bid_size = snap.get(f"bidSize_{side}") or 0.0
+        ask_size = snap.get(f"askSize_{side}") or 0.0
+        mid = snap.get(f"mid_{side}")
+        spread = snap.get(f"spread_{side}")
+
+        if mid is not None:
+            if st.emas is None or dt is None:
+                st.emas = [mid] * len(FEATURE_MID_HALF_LIVES_SEC)
+            else:
+                for i, hl in enumerate(FEATURE_MID_HALF_LIVES_SEC):
+                    st.emas[i] += _alpha(dt, hl) * (mid - st.emas[i])
+                if st.mid is not None:
+                    d = mid - st.mid
+                    st.var += _alpha(dt, FEATURE_VOL_HALF_LIFE_SEC) * (d * d / dt - st.var)
+
+        if spread is not None:
+            if st.spread_ema is None or dt is None:
+                st.spread_ema = spread
+            else:
+                st.spread_ema += _alpha(dt, FEATURE_SPREAD_HALF_LIFE_SEC) * (spread - st.spread_ema)
+
+        # OFI: cambios sucesivos del mejor bid / ask
+        if bid is not None and ask is not None and st.bid is not None and st.ask is not None:
+            e = 0.0
+            if bid >= st.bid:
+                e += bid_size
+            if bid <= st.bid:
+                e -= st.bid_size
+            if ask <= st.ask:
+                e -= ask_size
+            if ask >= st.ask:
+                e += st.ask_size
+            decay = math.exp(-dt * _LN2 / FEATURE_OFI_HALF_LIFE_SEC) if dt is not None else 1.0
+            st.ofi = st.ofi * decay + e
+
+        if bid is not None and ask is not None:
+            st.bid, st.ask, st.bid_size, st.ask_size = bid, ask, bid_size, ask_size
+        if mid is not None:
+            st.mid = mid
+
+        for i, hl in enumerate(FEATURE_MID_HALF_LIVES_SEC):
+            snap[_mid_field(hl, side)] = st.emas[i] if st.emas is not None else None
+        snap[f"rv_{side}"] = math.sqrt(st.var) if st.emas is not None else None
+        snap[f"ofi_{side}"] = st.ofi
+        snap[f"spread_ema_{side}"] = st.spread_ema
@@ -1,6 +1,6 @@
 # run.py
 
-from scanner import EventScannerGamma
+from scanner import EventScannerGamma, WARM_CACHE_PATH
 import config
 
 if __name__ == "__main__":
@@ -9,10 +9,12 @@ if __name__ == "__main__":
         min_volume=config.MIN_VOLUME,
         categories=config.CATEGORIES,
         multi_outcome=config.MULTI_OUTCOME,
-        display_delay=config.DISPLAY_DELAY,
-        fetch_delay=config.FETCH_DELAY,
-        max_snapshots=config.MAX_SNAPSHOTS
+        max_snapshots=config.MAX_SNAPSHOTS,
+        warm_cache_path=WARM_CACHE_PATH,
     )
 
     print("Escaneando mercados activos desde Gamma /events...")
-    scanner.live_scan()
\ No newline at end of file
+    try:
+        scanner.live_scan()
+    except KeyboardInterrupt:
+        scanner.stop()
@@ -0,0 +1,158 @@
+# scan_profiles.py
+# Perfiles de filtrado sobre un único pipeline de fetch del scanner.
+#
+# Antes scanner.py (momentum) y scanner_lee_bien.py (arbitraje) eran dos copias
+# casi idénticas que pedían Gamma y todos los books por separado. Ahora el
+# scanner hace un solo fetch y cada snapshot que guarda se ofrece a los perfiles
+# registrados; cada perfil aplica su banda de precios, sus extremos y su gate y
+# mantiene su propia vista de historial.
+#
+# El historial base del scanner (scanner.history) es la vista "momentum":
+# banda 0.01/0.99, extremos 0.005/0.995, sin gate. Un perfil solo puede ser
+# igual o más estricto que la base (se evalúa sobre el snapshot ya construido):
+#   - banda: el mejor bid / ask del snapshot es el mismo que con la banda
+#     estrecha si cae dentro; si cae fuera, con la banda estrecha no habría
+#     nivel (los niveles vienen ordenados) => la pata falta y se descarta
+#   - extremos: p_yes de Gamma fuera de [p_min, p_max] => fuera del perfil
+#   - gate: spreads de ambas patas <= max_spread (None = sin gate)
+#
+# Uso:
+#   arb = arbitrage_profile()
+#   scanner = EventScannerGamma(profiles=[arb])
+#   scanner.profile_history("arbitrage")    # == arb.history
+#   scanner.profile_history("momentum")     # == scanner.history
+
+from typing import Callable, Dict, Iterable, List, Optional
+
+from config import MAX_SPREAD_FILTER
+
+# =======================
+# CONFIG
+# =======================
+
+BASE_PROFILE_NAME = "momentum"
+
+# Arbitraje (lo que hacía scanner_lee_bien.py)
+ARB_PROFILE_BID_MIN = 0.05
+ARB_PROFILE_ASK_MAX = 0.95
+ARB_PROFILE_P_MIN = 0.01
+ARB_PROFILE_P_MAX = 0.99
+
+
+class ScanProfile:
+    def __init__(
+        self,
+        name: str,
+        bid_min: float = 0.01,
+        ask_max: float = 0.99,
+        p_min: float = 0.005,
+        p_max: float = 0.995,
+        max_spread: Optional[float] = None,
+        max_snapshots: Optional[int] = None,
+        gate: Optional[Callable[[Dict], bool]] = None,
+    ):
+        self.name = name
+        self.bid_min = float(bid_min)
+        self.ask_max = float(ask_max)
+        self.p_min = float(p_min)
+        self.p_max = float(p_max)
+        self.max_spread = float(max_spread) if max_spread is not None else None
+        # None = el max_snapshots del scanner (se fija al registrar el perfil)
+        self.max_snapshots = int(max_snapshots) if max_snapshots is not None else None
+        # Filtro extra opcional sobre el snapshot (True = entra)
+        self.gate = gate
+
+        # Vista de historial por market_id (se escribe bajo el lock del scanner)
+        self.history: Dict[str, List[Dict]] = {}
+
+        # Stats
+        self.accepted = 0
+        self.rejected = 0
+
+    # ------------- FILTRO -------------
+    def accepts(self, snap: Dict) -> bool:
+        p_yes = snap.get("p_yes")
+        if p_yes is None or p_yes < self.p_min or p_yes > self.p_max:
+            return False
+
+        for side in ("yes", "no"):
+            bid = snap.get(f"bestBid_{side}")
+            ask = snap.get(f"bestAsk_{side}")
+            if bid is None or ask is None:
+                return False
+            if bid < self.bid_min or ask > self.ask_max:
+                return False
+            if self.max_spread is not None and (ask - bid) > self.max_spread:
+                return False
+
+        if self.gate is not None and not self.gate(snap):
+            return False
+        return True
+
+    # ------------- HISTORIAL -------------
+    def offer(self, market_id: str, snap: Dict) -> bool:
+        """
+        Añade el snapshot a la vista si pasa el filtro. Devuelve si entró.
+        """
+        if not self.accepts(snap):
+            self.rejected += 1
+            return False
+        self.accepted += 1
+        hist = self.history.get(market_id)
+        if hist is None:
+            hist = self.history[market_id] = []
+        hist.append(snap)
+        if self.max_snapshots is not None and len(hist) > self.max_snapshots:
+            self.history[market_id] = hist[-self.max_snapshots:]
+        return True
+
+    def prune(self, tracked: Iterable[str]):
+        """
+        Quita los mercados que ya no están en el top (la vista es del universo actual).
+        """
+        tracked = set(tracked)
+        for mid in [k for k in self.history if k not in tracked]:
+            del self.history[mid]
+
+    def rebuild(self, history: Dict[str, List[Dict]]):
+        """
+        Reconstruye la vista desde el historial base (warm cache / checkpoint):
+        el filtro solo mira el snapshot, así que el resultado es el mismo.
+        """
+        self.history = {}
+        for market_id, snaps in history.items():
+            for snap in snaps:
+                if self.accepts(snap):
+                    self.history.setdefault(market_id, []).append(snap)
+            if self.max_snapshots is not None and market_id in self.history:
+                self.history[market_id] = self.history[market_id][-self.max_snapshots:]
+
+    def stats(self) -> Dict:
+        return {
+            "name": self.name,
+            "markets": len(self.history),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+        }
+
+
+# ---------------- PERFILES PREDEFINIDOS ----------------
+def arbitrage_profile(max_spread: float = MAX_SPREAD_FILTER, max_snapshots: Optional[int] = None) -> ScanProfile:
+    """
+    Vista de scanner_lee_bien.py: banda 0.05/0.95, extremos 0.01/0.99 y solo
+    snapshots con ambos spreads <= max_spread.
+    """
+    return ScanProfile(
+        "arbitrage",
+        bid_min=ARB_PROFILE_BID_MIN,
+        ask_max=ARB_PROFILE_ASK_MAX,
+        p_min=ARB_PROFILE_P_MIN,
+        p_max=ARB_PROFILE_P_MAX,
+        max_spread=max_spread,
+        max_snapshots=max_snapshots,
+    )
+
+
+PROFILE_FACTORIES: Dict[str, Callable[[], ScanProfile]] = {
+    "arbitrage": arbitrage_profile,
+}
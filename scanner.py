@@ -1,16 +1,25 @@
 # scanner.py (ARBITRAGE OPTIMIZED - MOMENTUM READY)
 
-import requests
 import json
+import os
 import time
 import threading
 import random
 import signal
 import sys
 import math
-from typing import List, Dict, Optional, Tuple
+import queue
+from collections import deque, namedtuple
+from urllib.parse import urlencode
+from typing import Any, Callable, List, Dict, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from arb_engine import ARB_FEE_BPS, ARB_MIN_EDGE, ComplementArbEngine
+from http_pool import HttpPool, base_url
+from ranking_index import RankingIndex, market_key
+from rolling_features import RollingFeatures
+from scan_profiles import BASE_PROFILE_NAME, ScanProfile
+from warm_cache import load_warm_cache, save_warm_cache
 from config import MIN_LIQUIDITY, MIN_VOLUME, CATEGORIES, MULTI_OUTCOME, MAX_SPREAD_FILTER
 
 # =======================
@@ -25,16 +34,55 @@ CLOB_TIMEOUT = 2.5
 GAMMA_TIMEOUT = 3.5
 
 CLOB_MAX_WORKERS = 16
+# Books multiplexados por HTTP/2 (requiere httpx[http2]; si falta, HTTP/1.1 con requests)
+CLOB_HTTP2 = False
+# Abrir las conexiones de los pools (CLOB = clob_workers, Gamma = páginas en paralelo) antes del primer loop
+HTTP_PREWARM = True
+
+# Arranque en caliente (universo + snapshots recientes); None = desactivado
+WARM_CACHE_PATH = os.environ.get("SCANNER_WARM_CACHE", "scanner_warm_cache.json")
+WARM_CACHE_SAVE_SEC = 30.0
 MIN_LOOP_INTERVAL_SEC = 0.15
+LOOP_TIMING_WINDOW = 200        # loops recientes para la latencia p99
 
-CLOB_BOOK_URL = "https://clob.polymarket.com/book"
+# live_scan en pipeline: Gamma, books y build en threads distintos, solapados
+PIPELINE_LIVE_SCAN = True
+PIPELINE_QUEUE_DEPTH = 2        # lotes de books esperando build (backpressure)
+PIPELINE_STAGES = ("gamma", "books", "build")
+
+# Pool de procesos para decodificar JSON + features (0 = desactivado, -1 = un worker por core)
+PARSE_WORKERS = 0
+
+# Niveles de profundidad que se guardan por book (arb de complementarios)
+BOOK_DEPTH_LEVELS = 10
+
+# Edad máxima de cada pata (desde que llegó su book) para señales / arbitraje
+MAX_BOOK_AGE_SEC = 1.0
+
+# Hosts sobreescribibles (p.ej. para apuntar al simulador local)
+GAMMA_HOST = os.environ.get("POLYMARKET_GAMMA_HOST", "https://gamma-api.polymarket.com").rstrip("/")
+CLOB_HOST = os.environ.get("POLYMARKET_CLOB_HOST", "https://clob.polymarket.com").rstrip("/")
+
+CLOB_BOOK_URL = f"{CLOB_HOST}/book"
 CLOB_HEADERS = {"accept": "application/json", "user-agent": "Mozilla/5.0"}
 
 GAMMA_URL = (
-    "https://gamma-api.polymarket.com/events?"
-    "active=true&closed=false&order=volume24hr&ascending=false&limit=500"
+    f"{GAMMA_HOST}/events?"
+    "active=true&closed=false&order=volume24hr&ascending=false"
 )
 
+# Paginación de Gamma: páginas de GAMMA_PAGE_LIMIT eventos, GAMMA_PARALLEL_PAGES en vuelo,
+# hasta que una página venga incompleta o se llegue a GAMMA_MAX_PAGES (por tag)
+GAMMA_PAGE_LIMIT = 500
+GAMMA_PARALLEL_PAGES = 4
+GAMMA_MAX_PAGES = 40
+# Página fallida (timeout / 429): se reintenta; si sigue fallando, el refresh se aborta
+# entero y se mantiene el universo anterior (una lista parcial desalojaría mercados)
+GAMMA_PAGE_RETRIES = 2
+GAMMA_RETRY_BACKOFF_SEC = 0.25
+# Empujar liquidez / volumen mínimos y categorías (tag_slug) a la query de Gamma
+GAMMA_SERVER_FILTERS = True
+
 # ---------------- UTIL ----------------
 def clear_screen():
     import os, platform
@@ -53,6 +101,118 @@ def clamp(x: float, lo: float, hi: float) -> float:
         return hi
     return x
 
+def decode_json(raw: Optional[bytes]):
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+def parse_events_page(raw: Optional[bytes]) -> Optional[List[Dict]]:
+    """
+    Eventos de una página de Gamma; None si no decodifica o no es una lista
+    (página truncada / corrupta, que no es lo mismo que una página vacía).
+    """
+    data = decode_json(raw)
+    if isinstance(data, dict):
+        data = data.get("data")
+    return data if isinstance(data, list) else None
+
+def decode_events_payload(raw: Optional[bytes]) -> List[Dict]:
+    return parse_events_page(raw) or []
+
+# ---------------- BOOK / FEATURES (funciones puras, usables desde workers) ----------------
+# Registro compacto del top-of-book de un token + features momentum
+BookTop = namedtuple(
+    "BookTop",
+    ["bid", "bid_size", "ask", "ask_size", "mid", "imbalance", "microprice", "bids", "asks", "exch_ts"],
+)
+
+def book_levels(book: Dict, depth: int = BOOK_DEPTH_LEVELS, bid_min: float = 0.01,
+                ask_max: float = 0.99) -> Tuple[Tuple[Tuple[float, float], ...], Tuple[Tuple[float, float], ...]]:
+    """
+    ((precio, tamaño), ...) de bids y asks, de mejor a peor, hasta `depth` niveles.
+    El CLOB no garantiza el orden (hoy devuelve el mejor nivel al final), así que se ordena por precio.
+    bid_min / ask_max: banda de precios (por defecto la del momentum).
+    """
+    # OJO:
+    # - Para momentum micro NO quieres matar extremos 0.02 / 0.98.
+    # - Pero tampoco quieres basura 0.00 / 1.00.
+    bids = []
+    for b in (book.get("bids") or []):
+        px = safe_float(b.get("price"))
+        if px >= bid_min:
+            bids.append((px, safe_float(b.get("size"))))
+    asks = []
+    for a in (book.get("asks") or []):
+        px = safe_float(a.get("price"))
+        if px <= ask_max:
+            asks.append((px, safe_float(a.get("size"))))
+
+    bids.sort(key=lambda lv: lv[0], reverse=True)
+    asks.sort(key=lambda lv: lv[0])
+    return tuple(bids[:depth]), tuple(asks[:depth])
+
+def top_of_book(book: Dict) -> Tuple[Optional[float], Optional[float], Optional[float], Optional[float]]:
+    bids, asks = book_levels(book, depth=1)
+    if not bids or not asks:
+        return None, None, None, None
+    return bids[0][0], bids[0][1], asks[0][0], asks[0][1]
+
+def mid_price(bid: Optional[float], ask: Optional[float]) -> Optional[float]:
+    if bid is None or ask is None:
+        return None
+    if ask <= 0 or bid <= 0:
+        return None
+    if ask < bid:
+        return None
+    return 0.5 * (bid + ask)
+
+def top_imbalance(bid_size: Optional[float], ask_size: Optional[float]) -> Optional[float]:
+    if bid_size is None or ask_size is None:
+        return None
+    denom = bid_size + ask_size
+    if denom <= 0:
+        return None
+    return bid_size / denom
+
+def microprice(bid: Optional[float], ask: Optional[float],
+               bid_size: Optional[float], ask_size: Optional[float]) -> Optional[float]:
+    # microprice ~ (ask * bidSize + bid * askSize) / (bidSize + askSize)
+    # Intuición: si el bid es grande, precio "tiende" a subir, etc.
+    if bid is None or ask is None or bid_size is None or ask_size is None:
+        return None
+    denom = bid_size + ask_size
+    if denom <= 0:
+        return None
+    return (ask * bid_size + bid * ask_size) / denom
+
+def book_exchange_ts(book: Dict) -> Optional[float]:
+    """
+    Timestamp del book según el CLOB ("timestamp" en ms) en segundos; None si no viene.
+    """
+    ts = safe_float(book.get("timestamp"), 0.0)
+    return ts / 1000.0 if ts > 0 else None
+
+def summarize_book(book: Dict, depth: int = BOOK_DEPTH_LEVELS) -> Optional[BookTop]:
+    bids, asks = book_levels(book, depth)
+    if not bids or not asks:
+        return None
+    (bid, bid_size), (ask, ask_size) = bids[0], asks[0]
+    return BookTop(
+        bid,
+        bid_size,
+        ask,
+        ask_size,
+        mid_price(bid, ask),
+        top_imbalance(bid_size, ask_size),
+        microprice(bid, ask, bid_size, ask_size),
+        bids,
+        asks,
+        book_exchange_ts(book),
+    )
+
 # ---------------- SCANNER ----------------
 class EventScannerGamma:
     def __init__(
@@ -66,6 +226,25 @@ class EventScannerGamma:
         max_snapshots: int = MAX_SNAPSHOTS_PER_MARKET,
         clob_workers: int = CLOB_MAX_WORKERS,
         max_spread: float = MAX_SPREAD_FILTER,
+        max_book_age: float = MAX_BOOK_AGE_SEC,
+        gamma_url: str = GAMMA_URL,
+        clob_book_url: str = CLOB_BOOK_URL,
+        parse_workers: int = PARSE_WORKERS,
+        gamma_page_limit: int = GAMMA_PAGE_LIMIT,
+        gamma_parallel_pages: int = GAMMA_PARALLEL_PAGES,
+        gamma_max_pages: int = GAMMA_MAX_PAGES,
+        gamma_server_filters: bool = GAMMA_SERVER_FILTERS,
+        arb_fee_bps: float = ARB_FEE_BPS,
+        arb_min_edge: float = ARB_MIN_EDGE,
+        clob_http2: bool = CLOB_HTTP2,
+        clob_pool_size: Optional[int] = None,
+        http_prewarm: bool = HTTP_PREWARM,
+        warm_cache_path: Optional[str] = None,
+        warm_cache_save_sec: float = WARM_CACHE_SAVE_SEC,
+        profiles: Optional[List[ScanProfile]] = None,
+        min_loop_interval: float = MIN_LOOP_INTERVAL_SEC,
+        pipelined: bool = PIPELINE_LIVE_SCAN,
+        pipeline_queue_depth: int = PIPELINE_QUEUE_DEPTH,
     ):
         self.min_liquidity = float(min_liquidity)
         self.min_volume = float(min_volume)
@@ -77,32 +256,96 @@ class EventScannerGamma:
         self.max_snapshots = int(max_snapshots)
         self.clob_workers = int(clob_workers)
 
-        # Métrica arbitraje (NO afecta al histórico)
+        # Arbitraje YES/NO ejecutable (NO afecta al histórico)
+        self.max_book_age = float(max_book_age)
+        self.arb_engine = ComplementArbEngine(fee_bps=arb_fee_bps, min_edge=arb_min_edge, max_book_age=self.max_book_age)
         self.arb_opportunities_count = 0
+        # Snapshots con alguna pata más vieja que max_book_age
+        self.stale_snapshots_count = 0
 
-        # Mejor "casi-arb" visto
+        # Mercados con ambos spreads <= max_spread (antes se contaban como "arb")
+        self.tight_markets_count = 0
+
+        # Mejor "casi-arb" visto: gap = min(askYes + askNo - 1, 1 - (bidYes + bidNo)); < 0 => arb
         self.closest_arb = {
-            "spread": float("inf"),
+            "gap": float("inf"),
             "market": None,
             "snapshot": None
         }
         self.max_spread = float(max_spread)
 
+        # Endpoints (por defecto producción; sobreescribibles para el simulador)
+        self.gamma_url = gamma_url
+        self.clob_book_url = clob_book_url
+
+        # Discovery paginado de Gamma
+        self.gamma_page_limit = int(gamma_page_limit)
+        self.gamma_parallel_pages = max(1, int(gamma_parallel_pages))
+        self.gamma_max_pages = max(1, int(gamma_max_pages))
+        self.gamma_server_filters = bool(gamma_server_filters)
+        self.gamma_pages_hint: Dict[Optional[str], int] = {}
+        # Stats del último refresh: páginas, bytes, ms, eventos únicos (ok=False si se abortó)
+        self.gamma_refresh = {"pages": 0, "bytes": 0, "ms": 0.0, "events": 0, "markets": 0, "ok": True}
+
         # Historial por market_id
         self.history: Dict[str, List[Dict]] = {}
+        # Features rolling O(1) por market_id (se escriben en cada snapshot)
+        self.features: Dict[str, RollingFeatures] = {}
+        # Vistas filtradas del mismo historial (un fetch, varias estrategias)
+        self.profiles: Dict[str, ScanProfile] = {}
 
-        # Cache orderbooks
+        # Cache orderbooks (last_fetch = cuándo llegó el book de cada token)
         self.orderbook_cache: Dict[str, Dict] = {}
         self.orderbook_last_fetch: Dict[str, float] = {}
+        # Top-of-book + features por token (None = book sin bid/ask válidos)
+        self.book_tops: Dict[str, Optional[BookTop]] = {}
+        # Tops del lote que build_snapshots está procesando (lo que ven los snapshot_listeners)
+        self.batch_tops: Dict[str, Optional[BookTop]] = {}
+
+        # Ranking incremental de mercados (solo se re-puntúa lo que cambió en Gamma)
+        self.ranking = RankingIndex()
+
+        # Decodificación en pool de procesos (ver parse_pool.py)
+        self.parse_workers = int(parse_workers)
+        self.parse_pool = None
 
         self.stop_event = threading.Event()
         self.lock = threading.Lock()
 
-        self.gamma_session = requests.Session()
-        self.clob_session = requests.Session()
+        # Pools HTTP del tamaño de la concurrencia de cada fan-out (sin conexiones descartadas).
+        # clob_pool_size: tope si los workers van a subir (load_controller), fijado antes del prewarm
+        self.gamma_http = HttpPool(self.gamma_parallel_pages, name="gamma")
+        self.clob_http = HttpPool(max(self.clob_workers, int(clob_pool_size or 0)), http2=clob_http2, name="clob")
+        self.http_prewarm = bool(http_prewarm)
+
+        # Cache de arranque en caliente
+        self.warm_cache_path = warm_cache_path
+        self.warm_cache_save_sec = float(warm_cache_save_sec)
+        self.warm_cache_last_save = 0.0
+        self._warm_pending = False
+
+        # Pipeline: último universo de Gamma (swap de referencia) + cola acotada books -> build
+        self.pipelined = bool(pipelined)
+        self.pipeline_queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max(1, int(pipeline_queue_depth)))
+        self._universe: List[Dict] = []
+        self._universe_ready = threading.Event()
+        # Books pide un refresh al tomar el universo: Gamma va un loop por delante, no más
+        self._universe_wanted = threading.Event()
+        # Segundos ocupados por etapa (acumulado) y bloqueados por cola llena
+        self.stage_busy: Dict[str, float] = {k: 0.0 for k in PIPELINE_STAGES}
+        self.stage_blocked = 0.0
+        self._stage_seen: Dict[str, float] = {k: 0.0 for k in PIPELINE_STAGES + ("blocked",)}
+        self._stage_seen_ts = time.time()
+
+        # Parámetros de carga (ajustables en caliente por load_controller.py)
+        self.min_loop_interval = float(min_loop_interval)
+        self.load_controller = None
+        # (fin del loop, ms desde el inicio del fetch de books hasta snapshots construidos)
+        self.loop_ms: deque = deque(maxlen=LOOP_TIMING_WINDOW)
 
         self.start_time = time.time()
         self.loops = 0
+        self.snapshots_total = 0
 
         self.gamma_requests_this_second = 0
         self.gamma_requests_per_second = 0
@@ -124,27 +367,181 @@ class EventScannerGamma:
 
         self.tracked_market_ids = set()
 
+        # Callbacks (market_id, snap) por cada snapshot guardado (bajo self.lock)
+        self.snapshot_listeners: List[Callable[[str, Dict], None]] = []
+
+        for p in (profiles or []):
+            self.add_profile(p)
+
+    # ---------------- PROFILES ----------------
+    def add_profile(self, profile: ScanProfile) -> ScanProfile:
+        if profile.name == BASE_PROFILE_NAME or profile.name in self.profiles:
+            raise ValueError(f"Perfil duplicado: {profile.name}")
+        if profile.max_snapshots is None:
+            profile.max_snapshots = self.max_snapshots
+        with self.lock:
+            profile.rebuild(self.history)
+            self.profiles[profile.name] = profile
+        return profile
+
+    def profile_history(self, name: str) -> Dict[str, List[Dict]]:
+        """
+        Historial de un perfil; BASE_PROFILE_NAME es el historial base del scanner.
+        """
+        if name == BASE_PROFILE_NAME:
+            return self.history
+        return self.profiles[name].history
+
+    def _rebuild_profiles(self):
+        for p in self.profiles.values():
+            p.rebuild(self.history)
+            if self.tracked_market_ids:
+                p.prune(self.tracked_market_ids)
+
     # ---------------- FETCH GAMMA ----------------
-    def fetch_events(self) -> List[Dict]:
+    def gamma_page_url(self, offset: int, tag_slug: Optional[str] = None) -> str:
+        params = {"limit": self.gamma_page_limit, "offset": offset}
+        if self.gamma_server_filters:
+            # Filtros a nivel evento: la liquidez / volumen del evento suman los de sus
+            # markets, así que nunca descartan un market que pasaría filter_markets
+            if self.min_liquidity > 0:
+                params["liquidity_min"] = self.min_liquidity
+            if self.min_volume > 0:
+                params["volume_min"] = self.min_volume
+            if tag_slug:
+                params["tag_slug"] = tag_slug
+        sep = "&" if "?" in self.gamma_url else "?"
+        return f"{self.gamma_url}{sep}{urlencode(params)}"
+
+    def fetch_gamma_page(self, url: str) -> Optional[bytes]:
         start = time.time()
         try:
             with self.lock:
                 self.gamma_requests_this_second += 1
 
-            r = self.gamma_session.get(GAMMA_URL, timeout=GAMMA_TIMEOUT)
-            r.raise_for_status()
-            data = r.json()
-            if isinstance(data, dict) and "data" in data:
-                return data["data"]
-            if isinstance(data, list):
-                return data
-            return []
-        except requests.RequestException:
-            return []
+            return self.gamma_http.get(url, timeout=GAMMA_TIMEOUT)
         finally:
             with self.lock:
                 self.gamma_response_ms = (time.time() - start) * 1000.0
 
+    def fetch_events_raw(self) -> Optional[bytes]:
+        """
+        Solo la primera página (sin paginar).
+        """
+        return self.fetch_gamma_page(self.gamma_page_url(0))
+
+    def decode_gamma_pages(self, raws: List[Optional[bytes]]) -> List[Optional[Tuple[int, List[Dict]]]]:
+        """
+        (nº de eventos, eventos) por página; None = sin respuesta o JSON inválido.
+        Con pool, ParsePool.decode_gamma_pages hace lo mismo devolviendo (score, market).
+        """
+        out = []
+        for raw in raws:
+            events = parse_events_page(raw)
+            out.append((len(events), events) if events is not None else None)
+        return out
+
+    def _fetch_gamma_wave(self, ex: ThreadPoolExecutor, urls: List[str],
+                          decode_pages: Callable) -> Tuple[List[Optional[Tuple[int, Any]]], List[int]]:
+        """
+        Una oleada de páginas, todas decodificadas; las que fallan (sin respuesta o
+        JSON inválido) se reintentan con backoff. Devuelve (páginas, bytes por página).
+        """
+        raws = list(ex.map(self.fetch_gamma_page, urls))
+        pages = decode_pages(raws)
+        sizes = [len(raw) if raw else 0 for raw in raws]
+        for attempt in range(1, GAMMA_PAGE_RETRIES + 1):
+            failed = [i for i, pg in enumerate(pages) if pg is None]
+            if not failed or self.stop_event.wait(GAMMA_RETRY_BACKOFF_SEC * attempt):
+                break
+            retry = list(ex.map(self.fetch_gamma_page, [urls[i] for i in failed]))
+            for i, raw, pg in zip(failed, retry, decode_pages(retry)):
+                pages[i] = pg
+                sizes[i] = len(raw) if raw else 0
+        return pages, sizes
+
+    def fetch_events_pages(self, decode_pages: Optional[Callable] = None) -> List[Any]:
+        """
+        Universo activo completo: una secuencia de páginas por tag (o una sola sin
+        categorías), pedidas en oleadas de gamma_parallel_pages. Devuelve el
+        contenido decodificado de cada página (por defecto la lista de eventos).
+        Solo una página corta o vacía termina la paginación; si una página falla
+        (sin respuesta o JSON inválido) tras los reintentos se devuelve [] (refresh
+        abortado, gamma_refresh["ok"] = False) y no se tocan las pistas de páginas.
+        """
+        decode_pages = decode_pages or self.decode_gamma_pages
+        start = time.time()
+        tags = self.categories if (self.gamma_server_filters and self.categories) else [None]
+        pages: List[Any] = []
+        n_bytes = 0
+        hints: Dict[Optional[str], int] = {}
+        ok = True
+
+        with ThreadPoolExecutor(max_workers=self.gamma_parallel_pages) as ex:
+            for tag in tags:
+                page = 0
+                # Primera oleada dimensionada con las páginas del refresh anterior (+1 por si creció)
+                wave_size = min(self.gamma_parallel_pages, self.gamma_pages_hint.get(tag, self.gamma_parallel_pages - 1) + 1)
+                last = False
+                while not last and page < self.gamma_max_pages and not self.stop_event.is_set():
+                    wave = range(page, min(page + wave_size, self.gamma_max_pages))
+                    urls = [self.gamma_page_url(p * self.gamma_page_limit, tag) for p in wave]
+                    decoded, sizes = self._fetch_gamma_wave(ex, urls, decode_pages)
+                    page += len(urls)
+                    wave_size = self.gamma_parallel_pages
+
+                    # Hasta la primera página corta o vacía; un fallo antes de ella aborta el refresh
+                    for pg, size in zip(decoded, sizes):
+                        if pg is None:
+                            ok = False
+                            break
+                        n_events, payload = pg
+                        if n_events == 0:
+                            last = True
+                            break
+                        pages.append(payload)
+                        n_bytes += size
+                        if n_events < self.gamma_page_limit:
+                            last = True
+                            break
+                    if not ok:
+                        break
+                if not ok:
+                    break
+                hints[tag] = page
+
+        if ok:
+            self.gamma_pages_hint.update(hints)
+        else:
+            print(f"⚠️ Gamma: página fallida tras {GAMMA_PAGE_RETRIES} reintentos, se mantiene el universo anterior")
+            pages = []
+            n_bytes = 0
+
+        with self.lock:
+            self.gamma_refresh = {
+                "pages": len(pages),
+                "bytes": n_bytes,
+                "ms": (time.time() - start) * 1000.0,
+                "events": self.gamma_refresh.get("events", 0),
+                "markets": self.gamma_refresh.get("markets", 0),
+                "ok": ok,
+            }
+        return pages
+
+    def fetch_events(self) -> List[Dict]:
+        """
+        Todas las páginas, deduplicando eventos por id (un evento puede salir en
+        varios tags, o repetirse si el orden por volumen cambia entre páginas).
+        """
+        events: Dict[str, Dict] = {}
+        for page in self.fetch_events_pages():
+            for e in page:
+                key = str(e.get("id") or e.get("slug") or id(e))
+                events.setdefault(key, e)
+        with self.lock:
+            self.gamma_refresh["events"] = len(events)
+        return list(events.values())
+
     # ---------------- PARSE ----------------
     def parse_outcomes(self, market: Dict) -> List[Dict]:
         outcomes = market.get("outcomes", [])
@@ -220,89 +617,69 @@ class EventScannerGamma:
         return None, None
 
     # ---------------- CLOB ORDERBOOK ----------------
-    def fetch_orderbook(self, token_id: str) -> Optional[Dict]:
+    def fetch_orderbook_raw(self, token_id: str) -> Optional[bytes]:
         start = time.time()
         try:
             if self.stop_event.is_set():
                 return None
 
-            r = self.clob_session.get(
-                CLOB_BOOK_URL,
+            return self.clob_http.get(
+                self.clob_book_url,
                 params={"token_id": token_id},
                 headers=CLOB_HEADERS,
                 timeout=CLOB_TIMEOUT,
             )
-            r.raise_for_status()
-            data = r.json()
-            if not isinstance(data, dict):
-                return None
-            return data
-        except requests.RequestException:
-            return None
         finally:
             with self.lock:
                 self.clob_response_ms = (time.time() - start) * 1000.0
 
+    def fetch_orderbook(self, token_id: str) -> Optional[Dict]:
+        data = decode_json(self.fetch_orderbook_raw(token_id))
+        if not isinstance(data, dict):
+            return None
+        return data
+
     # ---------------- BEST BID/ASK (RELAXED) ----------------
     def best_bid_ask(self, book: Dict) -> Tuple[Optional[float], Optional[float], Optional[float], Optional[float]]:
-        # OJO:
-        # - Para momentum micro NO quieres matar extremos 0.02 / 0.98.
-        # - Pero tampoco quieres basura 0.00 / 1.00.
-        bids = [b for b in (book.get("bids") or []) if safe_float(b.get("price")) >= 0.01]
-        asks = [a for a in (book.get("asks") or []) if safe_float(a.get("price")) <= 0.99]
-
-        if not bids or not asks:
-            return None, None, None, None
-
-        b0 = bids[0]
-        a0 = asks[0]
-
-        return (
-            safe_float(b0.get("price")),
-            safe_float(b0.get("size")),
-            safe_float(a0.get("price")),
-            safe_float(a0.get("size")),
-        )
+        return top_of_book(book)
 
     # ---------------- FEATURES (MOMENTUM) ----------------
     def compute_mid(self, bid: Optional[float], ask: Optional[float]) -> Optional[float]:
-        if bid is None or ask is None:
-            return None
-        if ask <= 0 or bid <= 0:
-            return None
-        if ask < bid:
-            return None
-        return 0.5 * (bid + ask)
+        return mid_price(bid, ask)
 
     def compute_imbalance(self, bid_size: Optional[float], ask_size: Optional[float]) -> Optional[float]:
-        if bid_size is None or ask_size is None:
-            return None
-        denom = bid_size + ask_size
-        if denom <= 0:
-            return None
-        return bid_size / denom
+        return top_imbalance(bid_size, ask_size)
 
     def compute_microprice(self, bid: Optional[float], ask: Optional[float],
                            bid_size: Optional[float], ask_size: Optional[float]) -> Optional[float]:
-        # microprice ~ (ask * bidSize + bid * askSize) / (bidSize + askSize)
-        # Intuición: si el bid es grande, precio "tiende" a subir, etc.
-        if bid is None or ask is None or bid_size is None or ask_size is None:
-            return None
-        denom = bid_size + ask_size
-        if denom <= 0:
-            return None
-        return (ask * bid_size + bid * ask_size) / denom
+        return microprice(bid, ask, bid_size, ask_size)
 
     # ---------------- FILTER ----------------
+    def event_categories(self, event: Dict) -> set:
+        # Gamma devuelve tags como dicts {id, label, slug}; se aceptan también strings
+        out = set()
+        for t in (event.get("tags") or []):
+            if isinstance(t, dict):
+                out.update(str(t[k]).lower() for k in ("slug", "label") if t.get(k))
+            else:
+                out.add(str(t).lower())
+        return out or {"n/a"}
+
     def filter_markets(self, events: List[Dict]) -> List[Dict]:
         filtered = []
+        seen = set()
         for event in events:
-            tags = event.get("tags", ["N/A"])
-            category = str(tags[0]).lower() if tags else "n/a"
-            if self.categories and category not in self.categories:
+            # Mismo criterio que tag_slug en Gamma: basta con que el evento tenga el tag
+            if self.categories and not (self.event_categories(event) & set(self.categories)):
                 continue
 
             for m in (event.get("markets") or []):
+                key = m.get("id") or m.get("conditionId")
+                if key:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+
                 liq = safe_float(m.get("liquidityNum") or m.get("liquidity") or 0)
                 vol = safe_float(m.get("volumeNum") or m.get("volume") or 0)
 
@@ -347,6 +724,16 @@ class EventScannerGamma:
 
     # ---------------- UPDATE TOP (MOMENTUM READY) ----------------
     def update_top_with_books(self, top_markets: List[Dict]):
+        self.build_snapshots(self.fetch_top_books(top_markets))
+
+    def fetch_top_books(self, top_markets: List[Dict]) -> Dict:
+        """
+        Etapa de red: books del top-N (cache si está dentro del cooldown).
+        Devuelve el lote que consume build_snapshots; cada lote trae su propio
+        mapa token -> BookTop y token -> hora de llegada del book (el pipeline
+        construye un lote mientras descarga el siguiente, que reescribe
+        book_tops / orderbook_last_fetch).
+        """
         now = time.time()
         market_map = {}
         tokens = []
@@ -361,65 +748,83 @@ class EventScannerGamma:
             tokens.append(no_tid)
 
         tokens = list(dict.fromkeys(tokens))
-        token_books: Dict[str, Dict] = {}
+        token_tops: Dict[str, Optional[BookTop]] = {}
+        token_fetch_ts: Dict[str, float] = {}
         tokens_to_fetch = []
         cache_hits = 0
 
         for tid in tokens:
             last = self.orderbook_last_fetch.get(tid, 0.0)
-            if (now - last) < self.orderbook_cooldown:
-                cached = self.orderbook_cache.get(tid)
-                if cached:
-                    token_books[tid] = cached
-                    cache_hits += 1
-                    continue
+            if (now - last) < self.orderbook_cooldown and tid in self.book_tops:
+                token_tops[tid] = self.book_tops[tid]
+                token_fetch_ts[tid] = last
+                cache_hits += 1
+                continue
             tokens_to_fetch.append(tid)
 
         orderbooks_requested = len(tokens_to_fetch)
         orderbooks_fetched = 0
 
         if tokens_to_fetch and not self.stop_event.is_set():
-            with ThreadPoolExecutor(max_workers=self.clob_workers) as ex:
-                futures = {ex.submit(self.fetch_orderbook, tid): tid for tid in tokens_to_fetch}
-                for fut in as_completed(futures):
-                    if self.stop_event.is_set():
-                        break
-                    tid = futures[fut]
-                    try:
-                        book = fut.result()
-                    except Exception:
-                        book = None
-                    if book:
-                        token_books[tid] = book
-                        self.orderbook_cache[tid] = book
-                        self.orderbook_last_fetch[tid] = now
-                        orderbooks_fetched += 1
+            for tid, top in self.fetch_book_tops(tokens_to_fetch).items():
+                token_tops[tid] = top
+                token_fetch_ts[tid] = self.orderbook_last_fetch.get(tid, now)
+                self.book_tops[tid] = top
+                orderbooks_fetched += 1
+
+        return {
+            "now": now,
+            "market_map": market_map,
+            "token_tops": token_tops,
+            "token_fetch_ts": token_fetch_ts,
+            "cache_hits": cache_hits,
+            "requested": orderbooks_requested,
+            "fetched": orderbooks_fetched,
+        }
+
+    def build_snapshots(self, batch: Dict):
+        """
+        Etapa de CPU: snapshots + features + arb del lote, bajo self.lock.
+        """
+        now = batch["now"]
+        market_map = batch["market_map"]
+        token_tops = batch["token_tops"]
+        token_fetch_ts = batch["token_fetch_ts"]
+
+        # Edad de cada pata al construir el snapshot (no al empezar el loop)
+        built = time.time()
 
         with self.lock:
-            self.cache_hits_this_second += cache_hits
-            self.orderbooks_fetched_this_second += orderbooks_fetched
+            self.cache_hits_this_second += batch["cache_hits"]
+            self.orderbooks_fetched_this_second += batch["fetched"]
             self.last_loop_topN = len(market_map)
-            self.last_loop_orderbooks_requested = orderbooks_requested
-            self.last_loop_orderbooks_fetched = orderbooks_fetched
+            self.last_loop_orderbooks_requested = batch["requested"]
+            self.last_loop_orderbooks_fetched = batch["fetched"]
             self.tracked_market_ids = set(market_map.keys())
+            # Books del lote en construcción para los listeners (book_tops ya puede ser del siguiente)
+            self.batch_tops = token_tops
 
             for market_id, (m, yes_tid, no_tid) in market_map.items():
                 p_yes, p_no = self.parse_outcome_prices(m)
                 if p_yes is None or p_no is None:
                     continue
 
-                book_yes = token_books.get(yes_tid)
-                book_no = token_books.get(no_tid)
+                # Necesitamos bid/ask en ambos lados para features momentum
+                top_yes = token_tops.get(yes_tid)
+                top_no = token_tops.get(no_tid)
 
-                if not book_yes or not book_no:
+                if top_yes is None or top_no is None:
                     continue
 
-                by, sy, ay, say = self.best_bid_ask(book_yes)
-                bn, sn, an, san = self.best_bid_ask(book_no)
+                by, sy, ay, say, mid_yes, imb_yes, micro_yes = top_yes[:7]
+                bn, sn, an, san, mid_no, imb_no, micro_no = top_no[:7]
 
-                # Necesitamos bid/ask en ambos lados para features momentum
-                if any(x is None for x in [by, ay, bn, an]):
-                    continue
+                fetch_yes = token_fetch_ts.get(yes_tid, now)
+                fetch_no = token_fetch_ts.get(no_tid, now)
+                age_yes = built - fetch_yes
+                age_no = built - fetch_no
+                max_age = max(age_yes, age_no)
+                stale = max_age > self.max_book_age
 
                 spread_yes = ay - by
                 spread_no = an - bn
@@ -428,16 +833,6 @@ class EventScannerGamma:
                 liq = safe_float(m.get("liquidityNum") or m.get("liquidity") or 0)
                 vol = safe_float(m.get("volumeNum") or m.get("volume") or 0)
 
-                # Momentum features
-                mid_yes = self.compute_mid(by, ay)
-                mid_no = self.compute_mid(bn, an)
-
-                imb_yes = self.compute_imbalance(sy, say)
-                imb_no = self.compute_imbalance(sn, san)
-
-                micro_yes = self.compute_microprice(by, ay, sy, say)
-                micro_no = self.compute_microprice(bn, an, sn, san)
-
                 snap = {
                     "ts": now,
                     "question": m.get("question", "")[:120],
@@ -480,8 +875,23 @@ class EventScannerGamma:
                     "imbalance_no": imb_no,
                     "microprice_yes": micro_yes,
                     "microprice_no": micro_no,
+
+                    # frescura de cada pata: llegada del book, timestamp del exchange, edad (s)
+                    "fetch_ts_yes": fetch_yes,
+                    "fetch_ts_no": fetch_no,
+                    "exch_ts_yes": top_yes.exch_ts,
+                    "exch_ts_no": top_no.exch_ts,
+                    "age_yes": age_yes,
+                    "age_no": age_no,
+                    "max_book_age": max_age,
                 }
 
+                # ---- ROLLING FEATURES (EWMA mids, vol, OFI, spread, deriva YES+NO) ----
+                feat = self.features.get(market_id)
+                if feat is None:
+                    feat = self.features[market_id] = RollingFeatures()
+                feat.update(snap)
+
                 # ---- SAVE HISTORY ALWAYS ----
                 if market_id not in self.history:
                     self.history[market_id] = []
@@ -490,16 +900,32 @@ class EventScannerGamma:
                     self.history[market_id] = self.history[market_id][-self.max_snapshots:]
 
                 self.snapshots_this_second += 1
+                self.snapshots_total += 1
+
+                for p in self.profiles.values():
+                    p.offer(market_id, snap)
 
-                # ---- METRICS: ARB ONLY ----
-                # Contamos "oportunidad" solo como estadística
+                for cb in self.snapshot_listeners:
+                    cb(market_id, snap)
+
+                # ---- METRICS: SPREADS ----
                 if spread_yes <= self.max_spread and spread_no <= self.max_spread:
-                    self.arb_opportunities_count += 1
+                    self.tight_markets_count += 1
+
+                # ---- ARB YES/NO (ejecutable, con profundidad) ----
+                # book_ts = la pata más vieja: el engine descarta si supera max_book_age
+                opps = self.arb_engine.evaluate(market_id, top_yes, top_no, min(fetch_yes, fetch_no), snap["question"])
+                self.arb_opportunities_count += len(opps)
+
+                if stale:
+                    # Patas de momentos distintos: el gap sería un spread fantasma
+                    self.stale_snapshots_count += 1
+                    continue
 
                 # ---- CLOSEST ARB ----
-                min_spread = min(spread_yes, spread_no)
-                if min_spread < self.closest_arb["spread"]:
-                    self.closest_arb["spread"] = min_spread
+                gap = min(ay + an - 1.0, 1.0 - (by + bn))
+                if gap < self.closest_arb["gap"]:
+                    self.closest_arb["gap"] = gap
                     self.closest_arb["market"] = m
                     self.closest_arb["snapshot"] = {
                         "ts": now,
@@ -511,13 +937,208 @@ class EventScannerGamma:
                         "p_no": p_no
                     }
 
+            for p in self.profiles.values():
+                p.prune(self.tracked_market_ids)
+
+            done = time.time()
+            self.loop_ms.append((done, (done - now) * 1000.0))
+
+    # ---------------- BOOK FAN-OUT ----------------
+    def _fetch_tops(self, tokens_to_fetch: List[str]) -> Dict[str, Optional[BookTop]]:
+        """
+        Descarga books en threads y calcula top/features en este proceso.
+        """
+        out: Dict[str, Optional[BookTop]] = {}
+        with ThreadPoolExecutor(max_workers=self.clob_workers) as ex:
+            futures = {ex.submit(self.fetch_orderbook, tid): tid for tid in tokens_to_fetch}
+            for fut in as_completed(futures):
+                if self.stop_event.is_set():
+                    break
+                tid = futures[fut]
+                try:
+                    book = fut.result()
+                except Exception:
+                    book = None
+                if book:
+                    self.orderbook_last_fetch[tid] = time.time()
+                    self.orderbook_cache[tid] = book
+                    out[tid] = summarize_book(book)
+        return out
+
+    def _fetch_tops_pooled(self, tokens_to_fetch: List[str]) -> Dict[str, Optional[BookTop]]:
+        """
+        Descarga bytes crudos en threads; JSON + features en el pool de procesos.
+        """
+        raws: Dict[str, bytes] = {}
+        received: Dict[str, float] = {}
+        with ThreadPoolExecutor(max_workers=self.clob_workers) as ex:
+            futures = {ex.submit(self.fetch_orderbook_raw, tid): tid for tid in tokens_to_fetch}
+            for fut in as_completed(futures):
+                if self.stop_event.is_set():
+                    break
+                try:
+                    raw = fut.result()
+                except Exception:
+                    raw = None
+                if raw:
+                    raws[futures[fut]] = raw
+                    received[futures[fut]] = time.time()
+        if not raws or self.stop_event.is_set():
+            return {}
+        tops = self.parse_pool.decode_books(raws)
+        # Solo cuenta como fetch lo que decodificó (payloads no-dict se descartan),
+        # con la hora de llegada de los bytes
+        for tid in tops:
+            self.orderbook_last_fetch[tid] = received[tid]
+        return tops
+
+    def fetch_book_tops(self, tokens: List[str]) -> Dict[str, Optional[BookTop]]:
+        """
+        Top-of-book + features de cada token (None si el book no tiene bid/ask válidos).
+        Tokens cuyo fetch falla no aparecen en el resultado.
+        """
+        if self.parse_pool is not None:
+            return self._fetch_tops_pooled(tokens)
+        return self._fetch_tops(tokens)
+
+    def start_parse_pool(self):
+        if self.parse_workers == 0 or self.parse_pool is not None:
+            return
+        from parse_pool import ParsePool
+        workers = None if self.parse_workers < 0 else self.parse_workers
+        self.parse_pool = ParsePool(workers=workers, scanner_kwargs={
+            "min_liquidity": self.min_liquidity,
+            "min_volume": self.min_volume,
+            "categories": self.categories,
+            "multi_outcome": self.multi_outcome,
+        })
+
+    def ranked_markets(self) -> List[Dict]:
+        """
+        Gamma fetch + filter + score incremental (RankingIndex) + top-N.
+        Con pool, JSON/filtro/score van en un worker y el índice solo reordena lo que cambió.
+        Tras un arranque en caliente, el primer loop usa el universo de la cache sin esperar a Gamma.
+        """
+        if self._warm_pending:
+            self._warm_pending = False
+            top = self.ranking.top(self.top_n_orderbook)
+            if top:
+                return top
+
+        if self.parse_pool is not None:
+            pages = self.fetch_events_pages(self.parse_pool.decode_gamma_pages)
+            if self.stop_event.is_set() or not pages:
+                return []
+            # Merge + dedupe por market id entre páginas / tags
+            scored = {market_key(m): (sc, m) for page in pages for sc, m in page}
+            with self.lock:
+                self.gamma_refresh["markets"] = len(scored)
+            self.ranking.update_scored(scored.values())
+        else:
+            events = self.fetch_events()
+            if self.stop_event.is_set() or not events:
+                return []
+
+            filtered = self.filter_markets(events)
+            with self.lock:
+                self.gamma_refresh["markets"] = len(filtered)
+            if not filtered:
+                return []
+
+            self.ranking.update(filtered, self.market_score)
+
+        return self.ranking.top(self.top_n_orderbook)
+
     # ---------------- LIVE SCAN ----------------
+    def prewarm_http(self):
+        """
+        Abre las conexiones de ambos pools en paralelo (handshakes fuera del loop).
+        """
+        if not self.http_prewarm:
+            return
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            ex.submit(self.gamma_http.prewarm, base_url(self.gamma_url))
+            ex.submit(self.clob_http.prewarm, base_url(self.clob_book_url))
+        print(
+            f"🔌 Conexiones pre-abiertas: Gamma {self.gamma_http.prewarmed} ({self.gamma_http.prewarm_ms:.0f} ms) | "
+            f"CLOB {self.clob_http.prewarmed} ({self.clob_http.prewarm_ms:.0f} ms)"
+        )
+
+    # ---------------- CHECKPOINT ----------------
+    def checkpoint_state(self) -> Dict:
+        """
+        Estado completo para checkpoint.py (copias tomadas bajo el lock).
+        """
+        with self.lock:
+            return {
+                "history": {k: list(v) for k, v in self.history.items()},
+                "features": dict(self.features),
+                "orderbook_last_fetch": dict(self.orderbook_last_fetch),
+                "book_tops": dict(self.book_tops),
+                "closest_arb": dict(self.closest_arb),
+                "tracked_market_ids": set(self.tracked_market_ids),
+                "ranking": self.ranking.export_state(),
+                "arb_opportunities_count": self.arb_opportunities_count,
+                "tight_markets_count": self.tight_markets_count,
+            }
+
+    def restore_checkpoint(self, state: Dict):
+        with self.lock:
+            self.history = {k: v[-self.max_snapshots:] for k, v in state["history"].items()}
+            self.features = state.get("features", {})
+            self.orderbook_last_fetch = state["orderbook_last_fetch"]
+            self.book_tops = state["book_tops"]
+            self.closest_arb = state["closest_arb"]
+            self.tracked_market_ids = state["tracked_market_ids"]
+            self.arb_opportunities_count = state["arb_opportunities_count"]
+            self.tight_markets_count = state["tight_markets_count"]
+            self._rebuild_profiles()
+        self.ranking.load_state(state["ranking"])
+        # Primer loop con el universo restaurado, sin esperar a Gamma
+        self._warm_pending = bool(self.ranking.last_top)
+
+    def load_warm_cache(self) -> bool:
+        if not self.warm_cache_path or self._warm_pending:
+            # Sin cache o ya restaurado desde un checkpoint
+            return self._warm_pending
+        self._warm_pending = load_warm_cache(self, self.warm_cache_path)
+        if self._warm_pending:
+            with self.lock:
+                self._rebuild_profiles()
+        return self._warm_pending
+
+    def save_warm_cache(self):
+        if not self.warm_cache_path:
+            return
+        try:
+            save_warm_cache(self, self.warm_cache_path)
+            self.warm_cache_last_save = time.time()
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la cache de arranque: {e}")
+
     def live_scan(self):
+        self.load_warm_cache()
+        self.start_parse_pool()
+        self.prewarm_http()
+        if self.pipelined:
+            self._live_scan_pipelined()
+        else:
+            self._live_scan_sequential()
+
+    def _maybe_save_warm_cache(self):
+        if self.warm_cache_path and (time.time() - self.warm_cache_last_save) >= self.warm_cache_save_sec:
+            self.save_warm_cache()
+
+    def _stage_done(self, stage: str, start: float):
+        with self.lock:
+            self.stage_busy[stage] += time.time() - start
+
+    def _live_scan_sequential(self):
         last_loop = 0.0
         while not self.stop_event.is_set():
             now = time.time()
-            if (now - last_loop) < MIN_LOOP_INTERVAL_SEC:
-                self.stop_event.wait(MIN_LOOP_INTERVAL_SEC - (now - last_loop))
+            if (now - last_loop) < self.min_loop_interval:
+                self.stop_event.wait(self.min_loop_interval - (now - last_loop))
                 continue
             last_loop = time.time()
 
@@ -525,25 +1146,110 @@ class EventScannerGamma:
                 self.loops += 1
                 self.loops_this_second += 1
 
-            events = self.fetch_events()
-            if self.stop_event.is_set() or not events:
-                continue
+            top_markets = self.ranked_markets()
+            self._stage_done("gamma", last_loop)
 
-            filtered = self.filter_markets(events)
-            if not filtered:
+            if top_markets:
+                start = time.time()
+                batch = self.fetch_top_books(top_markets)
+                self._stage_done("books", start)
+                start = time.time()
+                self.build_snapshots(batch)
+                self._stage_done("build", start)
+
+            self._maybe_save_warm_cache()
+
+    # ---------------- PIPELINE ----------------
+    def _live_scan_pipelined(self):
+        """
+        Gamma (universo) y books corren en sus threads; este thread construye.
+        Mientras se construyen los snapshots del lote N, los books del N+1 ya están
+        en vuelo (cada lote lleva su propio mapa de books: doble buffer), y Gamma
+        refresca el universo del N+2 a la vez (un refresh por loop, como en secuencial).
+        """
+        stages = [
+            threading.Thread(target=self._gamma_stage, name="scan-gamma", daemon=True),
+            threading.Thread(target=self._books_stage, name="scan-books", daemon=True),
+        ]
+        for t in stages:
+            t.start()
+
+        while not self.stop_event.is_set():
+            try:
+                batch = self.pipeline_queue.get(timeout=0.25)
+            except queue.Empty:
                 continue
 
-            scored = []
-            for m in filtered:
-                s = self.market_score(m)
-                if s > 0.0:
-                    scored.append((s, m))
+            start = time.time()
+            with self.lock:
+                self.loops += 1
+                self.loops_this_second += 1
+            self.build_snapshots(batch)
+            self._stage_done("build", start)
+
+            self._maybe_save_warm_cache()
 
-            scored.sort(key=lambda x: x[0], reverse=True)
-            top_markets = [m for _, m in scored[: self.top_n_orderbook]]
+        for t in stages:
+            t.join(timeout=2)
 
+    def _gamma_stage(self):
+        last = 0.0
+        self._universe_wanted.set()
+        while not self.stop_event.is_set():
+            if not self._universe_wanted.wait(0.25):
+                continue
+            now = time.time()
+            if (now - last) < self.min_loop_interval:
+                self.stop_event.wait(self.min_loop_interval - (now - last))
+                continue
+            last = time.time()
+            self._universe_wanted.clear()
+            top_markets = self.ranked_markets()
+            self._stage_done("gamma", last)
             if top_markets:
-                self.update_top_with_books(top_markets)
+                # Swap atómico de referencia: books siempre lee un universo completo
+                self._universe = top_markets
+                self._universe_ready.set()
+
+    def _books_stage(self):
+        last = 0.0
+        while not self.stop_event.is_set():
+            if not self._universe_ready.wait(0.25):
+                continue
+            now = time.time()
+            if (now - last) < self.min_loop_interval:
+                self.stop_event.wait(self.min_loop_interval - (now - last))
+                continue
+            last = time.time()
+            universe = self._universe
+            self._universe_wanted.set()
+            batch = self.fetch_top_books(universe)
+            self._stage_done("books", last)
+
+            # Cola llena => build va por detrás: books espera (no se acumulan lotes viejos)
+            blocked = time.time()
+            while not self.stop_event.is_set():
+                try:
+                    self.pipeline_queue.put(batch, timeout=0.25)
+                    break
+                except queue.Full:
+                    continue
+            with self.lock:
+                self.stage_blocked += time.time() - blocked
+
+    def stage_utilization(self) -> Dict[str, float]:
+        """
+        % del tiempo de pared que cada etapa estuvo ocupada desde la llamada anterior.
+        "blocked" = books esperando hueco en la cola (build es el cuello de botella).
+        """
+        now = time.time()
+        with self.lock:
+            current = dict(self.stage_busy, blocked=self.stage_blocked)
+        elapsed = max(now - self._stage_seen_ts, 1e-9)
+        out = {k: 100.0 * (v - self._stage_seen[k]) / elapsed for k, v in current.items()}
+        self._stage_seen = current
+        self._stage_seen_ts = now
+        return out
 
     # ---------------- DASHBOARD ----------------
     def display_dashboard(self):
@@ -576,11 +1282,13 @@ class EventScannerGamma:
                     example = self.history[k][-1]
 
                 gamma_latency = self.gamma_response_ms
+                gamma_refresh = dict(self.gamma_refresh)
                 clob_latency = self.clob_response_ms
 
                 last_topN = self.last_loop_topN
                 last_req = self.last_loop_orderbooks_requested
                 last_fetched = self.last_loop_orderbooks_fetched
+                profile_stats = [p.stats() for p in self.profiles.values()]
 
             uptime = int(time.time() - self.start_time)
 
@@ -597,18 +1305,72 @@ class EventScannerGamma:
             print(f"🧊 Cache hits/sec: {self.cache_hits_per_second}")
             print(f"🧾 Snapshots/sec: {self.snapshots_per_second}")
             print(f"🎯 Top-N orderbook por loop: {last_topN}")
+            print(
+                f"🏁 Ranking: {len(self.ranking)} mercados | re-puntuados {self.ranking.rescored} | "
+                f"reusados {self.ranking.reused} | churn +{self.ranking.entered}/-{self.ranking.exited} | "
+                f"{self.ranking.last_update_ms:.1f} ms"
+            )
             print(f"📌 Orderbooks solicitados (último loop): {last_req} | fetched: {last_fetched}")
             print("-" * 95)
             print(f"⚡ Ticks/market/sec (REAL): {ticks_per_market:.4f}")
             print(f"⏱️ Gamma latency: {gamma_latency:.1f} ms | CLOB latency: {clob_latency:.1f} ms")
+            print(
+                f"🗂️ Gamma refresh: {gamma_refresh['pages']} páginas | {gamma_refresh['bytes'] / 1024:.0f} KiB | "
+                f"{gamma_refresh['ms']:.0f} ms | {gamma_refresh['markets']} markets"
+            )
+            util = self.stage_utilization()
+            print(
+                f"🧵 Loop {'pipeline' if self.pipelined else 'secuencial'}: gamma {util['gamma']:.0f}% | "
+                f"books {util['books']:.0f}% | build {util['build']:.0f}% | "
+                f"cola {self.pipeline_queue.qsize()}/{self.pipeline_queue.maxsize} | "
+                f"books bloqueado {util['blocked']:.0f}%"
+            )
+            if self.load_controller is not None:
+                lc = self.load_controller.stats()
+                last = lc["last"]
+                print(
+                    f"🎛️ Carga ({lc['state']}): top-N {lc['top_n_orderbook']} | workers {lc['clob_workers']} | "
+                    f"cooldown {lc['orderbook_cooldown']:.2f}s | intervalo {lc['min_loop_interval']:.2f}s | "
+                    f"ajustes {lc['adjustments']}"
+                    + (f" | último: {last['knob']} {last['old']} -> {last['new']}" if last else "")
+                )
+            clob_http = self.clob_http.stats()
+            print(
+                f"🔌 CLOB HTTP{'/2' if clob_http['http2'] else '/1.1'}: pool {clob_http['pool_size']} | "
+                f"conexiones {clob_http['connections']} (handshakes {clob_http['handshakes']}) | "
+                f"reuso {clob_http['reuse_pct']:.1f}% | errores {clob_http['errors']}"
+            )
             print("=" * 95)
-            print(f"⚡ Oportunidades de arbitraje (validas): {self.arb_opportunities_count}")
+            print(f"⚡ Oportunidades de arbitraje YES/NO (ejecutables): {self.arb_opportunities_count}")
+            print(f"🧮 Mercados con spread <= {self.max_spread:.4f}: {self.tight_markets_count}")
+            print(
+                f"⌛ Snapshots con patas > {self.max_book_age:.2f}s: {self.stale_snapshots_count} "
+                f"| arb descartados por books viejos: {self.arb_engine.stale_skipped}"
+            )
+            for ps in profile_stats:
+                print(
+                    f"🧭 Perfil {ps['name']}: {ps['markets']} mercados | "
+                    f"snapshots {ps['accepted']} | descartados {ps['rejected']}"
+                )
+
+            best = self.arb_engine.best
+            if best is not None:
+                print(
+                    f"💰 Mejor arb: {best.side} size={best.size:.1f} par={best.avg_pair_price:.4f} "
+                    f"edge={best.edge_per_pair:+.4f} total={best.edge_total:.2f} | {best.question[:50]}"
+                )
+            if self.arb_engine.recent:
+                last = self.arb_engine.recent[-1]
+                print(
+                    f"🕒 Última arb: {last.side} size={last.size:.1f} edge={last.edge_per_pair:+.4f} "
+                    f"niveles={last.levels_yes}/{last.levels_no} hace {time.time() - last.detected_ts:.1f}s"
+                )
 
             if self.closest_arb["market"]:
                 m = self.closest_arb["market"]
                 s = self.closest_arb["snapshot"]
                 print(f"📌 Mejor 'casi oportunidad': {m.get('question','')[:80]}")
-                print(f"   Spread mínimo observado: {self.closest_arb['spread']:.4f}")
+                print(f"   Gap mínimo observado (<0 = arb): {self.closest_arb['gap']:+.4f}")
                 print(f"   Mid YES: {s['p_yes']:.4f} | NO: {s['p_no']:.4f}")
                 print(f"   Bid/Ask YES: {s['bestBid_yes']:.4f}/{s['bestAsk_yes']:.4f}")
                 print(f"   Bid/Ask NO: {s['bestBid_no']:.4f}/{s['bestAsk_no']:.4f}")
@@ -636,11 +1398,29 @@ class EventScannerGamma:
 
     def stop(self):
         self.stop_event.set()
+        self.save_warm_cache()
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown()
+            self.parse_pool = None
 
 
 # ---------------- MAIN ----------------
 if __name__ == "__main__":
-    scanner = EventScannerGamma()
+    from checkpoint import Checkpointer
+    from load_controller import LOAD_WORKERS_BOUNDS, LoadController
+    from scan_profiles import arbitrage_profile
+
+    # Un solo fetch: historial base (momentum) + vista de arbitraje.
+    # Pool CLOB ya al máximo de workers del load_controller (sin resize tras el prewarm)
+    scanner = EventScannerGamma(profiles=[arbitrage_profile()], clob_pool_size=LOAD_WORKERS_BOUNDS[1])
+
+    # Estado completo del scanner: se restaura al arrancar y se guarda al parar
+    ckpt = Checkpointer().add("scanner", scanner)
+    ckpt.restore()
+    ckpt.start()
+
+    # top-N / workers / cooldown / intervalo se ajustan a ticks/market/sec y p99 objetivo
+    ctrl = LoadController(scanner).start()
 
     scan_thread = threading.Thread(target=scanner.live_scan, daemon=True)
     dash_thread = threading.Thread(target=scanner.display_dashboard, daemon=True)
@@ -650,9 +1430,11 @@ if __name__ == "__main__":
 
     def signal_handler(sig, frame):
         print("\n[Scanner] Deteniendo ejecución...")
+        ctrl.stop()
         scanner.stop()
         scan_thread.join(timeout=2)
         dash_thread.join(timeout=2)
+        ckpt.stop()
         print("[Scanner] Cerrado correctamente.")
         raise SystemExit(0)
 
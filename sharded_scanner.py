@@ -0,0 +1,418 @@
+# sharded_scanner.py
+# Scanner multi-proceso: N workers, cada uno dueño de un hash-slice de los
+# token ids trackeados, descargan y parsean sus books y escriben snapshots
+# en un TickRing de memoria compartida. El proceso padre agrega y expone
+# el mismo interfaz `history` / `tracked_market_ids` que EventScannerGamma.
+#
+# Uso:
+#   python sharded_scanner.py --shards 8 --top-n 1000
+
+import argparse
+import math
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from http_pool import base_url
+from scanner import EventScannerGamma, MIN_LOOP_INTERVAL_SEC
+from shm_ring import SNAPSHOT_FIELDS, TickRing
+
+# =======================
+# SHARD CONFIG
+# =======================
+
+SHARD_RING_DEPTH = 64
+SHARD_MAX_MARKETS = 2048
+SHARD_COLLECT_INTERVAL_SEC = 0.02
+SHARD_GAMMA_REFRESH_SEC = 1.0
+SHARD_WORKER_SNAPSHOTS = 2
+# Cada shard tiene su propio rango de slots (TickRing admite un solo escritor por
+# slot); margen sobre max_markets / n_shards porque el hash no reparte exacto
+SHARD_SLOT_HEADROOM = 1.25
+
+# Primer campo del registro: generación del slot (descarta escrituras de un
+# mercado que ya no ocupa ese slot)
+RING_FIELDS: Tuple[str, ...] = ("_gen",) + SNAPSHOT_FIELDS
+
+# Stats por worker en mp.Array: loops, orderbooks fetched, cache hits, clob ms
+_STATS_PER_SHARD = 4
+
+
+def shard_for_token(token_id: str, n_shards: int) -> int:
+    return zlib.crc32(str(token_id).encode("utf-8")) % n_shards
+
+
+# ---------------- WORKER ----------------
+def _shard_worker(shard_idx: int, ring_name: str, tasks, stop_event, stats, scanner_kwargs: Dict):
+    """
+    Proceso worker: recibe asignaciones (slot, gen, market) y escribe snapshots.
+    Reutiliza EventScannerGamma para fetch/parse (una instancia por proceso).
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    ring = TickRing.attach(ring_name)
+    sc = EventScannerGamma(max_snapshots=SHARD_WORKER_SNAPSHOTS, **scanner_kwargs)
+    if sc.http_prewarm:
+        sc.clob_http.prewarm(base_url(sc.clob_book_url))
+
+    assigned: List[Tuple[int, int, Dict]] = []
+    last_written: Dict[str, float] = {}
+    base = shard_idx * _STATS_PER_SHARD
+    last_loop = 0.0
+
+    try:
+        while not stop_event.is_set():
+            # Nuevas asignaciones (nos quedamos con la última)
+            try:
+                while True:
+                    msg = tasks.get_nowait()
+                    if msg is None:
+                        return
+                    assigned = msg
+                    live = {str(m.get("id") or m.get("conditionId") or "unknown") for _, _, m in assigned}
+                    last_written = {k: v for k, v in last_written.items() if k in live}
+                    sc.history = {k: v for k, v in sc.history.items() if k in live}
+                    sc.features = {k: v for k, v in sc.features.items() if k in live}
+            except queue.Empty:
+                pass
+
+            if not assigned:
+                stop_event.wait(0.05)
+                continue
+
+            now = time.time()
+            if (now - last_loop) < MIN_LOOP_INTERVAL_SEC:
+                stop_event.wait(MIN_LOOP_INTERVAL_SEC - (now - last_loop))
+                continue
+            last_loop = time.time()
+
+            sc.update_top_with_books([m for _, _, m in assigned])
+
+            for slot, gen, m in assigned:
+                market_id = str(m.get("id") or m.get("conditionId") or "unknown")
+                hist = sc.history.get(market_id)
+                if not hist:
+                    continue
+                snap = hist[-1]
+                if snap["ts"] <= last_written.get(market_id, 0.0):
+                    continue
+                last_written[market_id] = snap["ts"]
+                ring.write(slot, [gen] + [snap.get(k) for k in SNAPSHOT_FIELDS])
+
+            with stats.get_lock():
+                stats[base + 0] += 1
+                stats[base + 1] += sc.last_loop_orderbooks_fetched
+                stats[base + 2] += sc.cache_hits_this_second
+                stats[base + 3] = sc.clob_response_ms
+            sc.cache_hits_this_second = 0
+    finally:
+        ring.close()
+
+
+# ---------------- PARENT ----------------
+class ShardedScanner(EventScannerGamma):
+    """
+    Mismo interfaz que EventScannerGamma (history, tracked_market_ids, lock,
+    display_dashboard, stop), pero los books se descargan y parsean en
+    n_shards procesos.
+    """
+
+    def __init__(
+        self,
+        n_shards: Optional[int] = None,
+        max_markets: int = SHARD_MAX_MARKETS,
+        ring_depth: int = SHARD_RING_DEPTH,
+        gamma_refresh_sec: float = SHARD_GAMMA_REFRESH_SEC,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.n_shards = int(n_shards or max(1, (os.cpu_count() or 2) - 1))
+        self.max_markets = int(max_markets)
+        self.ring_depth = int(ring_depth)
+        self.gamma_refresh_sec = float(gamma_refresh_sec)
+
+        # Kwargs que replican la config en cada worker
+        self._worker_kwargs = {
+            "min_liquidity": self.min_liquidity,
+            "min_volume": self.min_volume,
+            "categories": self.categories,
+            "multi_outcome": self.multi_outcome,
+            "top_n_orderbook": self.max_markets,
+            "orderbook_cooldown": self.orderbook_cooldown,
+            "clob_workers": self.clob_workers,
+            "max_spread": self.max_spread,
+            "gamma_url": self.gamma_url,
+            "clob_book_url": self.clob_book_url,
+        }
+
+        self.ring: Optional[TickRing] = None
+        self.workers: List[mp.Process] = []
+        self.worker_queues = []
+        self._ctx = mp.get_context("spawn")
+        self._mp_stop = self._ctx.Event()
+        self._stats = self._ctx.Array("d", self.n_shards * _STATS_PER_SHARD)
+        self._stats_seen = [0.0] * (self.n_shards * _STATS_PER_SHARD)
+
+        # market_id -> (slot, gen); slot -> market_id
+        self.slot_of: Dict[str, Tuple[int, int]] = {}
+        self.market_of_slot: Dict[int, str] = {}
+        # Slots [i * slots_per_shard, (i + 1) * slots_per_shard) solo los escribe el shard i:
+        # un slot liberado solo se reasigna a un mercado del mismo shard, que recibe la
+        # nueva asignación en orden y deja de escribir el mercado anterior
+        self.slots_per_shard = max(1, math.ceil(self.max_markets * SHARD_SLOT_HEADROOM / self.n_shards))
+        self.n_slots = self.slots_per_shard * self.n_shards
+        self.free_slots: List[List[int]] = [
+            list(range((i + 1) * self.slots_per_shard - 1, i * self.slots_per_shard - 1, -1))
+            for i in range(self.n_shards)
+        ]
+        self.slot_gen = [0] * self.n_slots
+        self.slot_seen = [0] * self.n_slots
+        self.market_meta: Dict[str, Dict] = {}
+        # Mercados sin slot libre en su shard
+        self.shard_full_skips = 0
+        self.collector: Optional[threading.Thread] = None
+
+    # ------------- PROCESSES -------------
+    def start_workers(self):
+        if self.workers:
+            return
+        self.ring = TickRing.create(self.n_slots, self.ring_depth, RING_FIELDS)
+        for i in range(self.n_shards):
+            q = self._ctx.Queue()
+            p = self._ctx.Process(
+                target=_shard_worker,
+                args=(i, self.ring.name, q, self._mp_stop, self._stats, self._worker_kwargs),
+                daemon=True,
+                name=f"scanner-shard-{i}",
+            )
+            p.start()
+            self.worker_queues.append(q)
+            self.workers.append(p)
+
+    def stop(self):
+        super().stop()
+        # El collector lee el ring: se para antes de cerrarlo
+        if self.collector is not None:
+            self.collector.join(timeout=2)
+            self.collector = None
+        self._mp_stop.set()
+        for q in self.worker_queues:
+            try:
+                q.put_nowait(None)
+            except Exception:
+                pass
+            # No bloquear la salida si un worker ya no va a leer asignaciones pendientes
+            q.cancel_join_thread()
+        for p in self.workers:
+            p.join(timeout=3)
+            if p.is_alive():
+                p.terminate()
+        self.workers = []
+        self.worker_queues = []
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+
+    # ------------- ASSIGNMENT -------------
+    def _assign(self, top_markets: List[Dict]):
+        wanted: Dict[str, Tuple[Dict, str, str]] = {}
+        for m in top_markets:
+            market_id = str(m.get("id") or m.get("conditionId") or "unknown")
+            yes_tid, no_tid = self.get_yes_no_token_ids(m)
+            if not (yes_tid and no_tid):
+                continue
+            wanted[market_id] = (m, yes_tid, no_tid)
+            if len(wanted) >= self.max_markets:
+                break
+
+        with self.lock:
+            # Liberar slots de mercados que salen
+            for market_id in list(self.slot_of.keys()):
+                if market_id not in wanted:
+                    slot, _ = self.slot_of.pop(market_id)
+                    self.market_of_slot.pop(slot, None)
+                    self.market_meta.pop(market_id, None)
+                    self.free_slots[slot // self.slots_per_shard].append(slot)
+
+            per_shard: List[List] = [[] for _ in range(self.n_shards)]
+            for market_id, (m, yes_tid, no_tid) in wanted.items():
+                shard = shard_for_token(yes_tid, self.n_shards)
+                if market_id not in self.slot_of:
+                    if not self.free_slots[shard]:
+                        self.shard_full_skips += 1
+                        continue
+                    slot = self.free_slots[shard].pop()
+                    self.slot_gen[slot] += 1
+                    self.slot_seen[slot] = self.ring.count(slot)
+                    self.slot_of[market_id] = (slot, self.slot_gen[slot])
+                    self.market_of_slot[slot] = market_id
+                slot, gen = self.slot_of[market_id]
+                self.market_meta[market_id] = {
+                    "question": m.get("question", "")[:120],
+                    "market_id": market_id,
+                    "yes_token_id": yes_tid,
+                    "no_token_id": no_tid,
+                }
+                per_shard[shard].append((slot, gen, m))
+
+            self.tracked_market_ids = set(self.slot_of.keys())
+            self.last_loop_topN = len(self.slot_of)
+            for p in self.profiles.values():
+                p.prune(self.tracked_market_ids)
+
+        for i, assignment in enumerate(per_shard):
+            self.worker_queues[i].put(assignment)
+
+    # ------------- COLLECT -------------
+    def collect_loop(self):
+        """
+        Lee los rings y materializa snapshots en self.history.
+        """
+        n_fields = len(RING_FIELDS)
+        while not self.stop_event.is_set():
+            self.stop_event.wait(SHARD_COLLECT_INTERVAL_SEC)
+            if self.ring is None:
+                continue
+
+            # (slot, market_id, gen, seen) consistentes con _assign, que reasigna bajo el lock
+            with self.lock:
+                slots = [
+                    (slot, market_id, self.slot_gen[slot], self.slot_seen[slot])
+                    for slot, market_id in self.market_of_slot.items()
+                ]
+
+            reads: List[Tuple[int, str, int, int, List[Dict]]] = []
+            for slot, market_id, gen, seen in slots:
+                if self.ring.count(slot) <= seen:
+                    continue
+                count, recs = self.ring.read_since(slot, seen)
+                snaps = []
+                for rec in recs:
+                    if int(rec[0]) != gen:
+                        continue
+                    snap = {
+                        RING_FIELDS[i]: (None if math.isnan(rec[i]) else rec[i])
+                        for i in range(1, n_fields)
+                    }
+                    snaps.append(snap)
+                reads.append((slot, market_id, gen, count, snaps))
+
+            if not reads:
+                self._collect_stats()
+                continue
+
+            with self.lock:
+                for slot, market_id, gen, count, snaps in reads:
+                    # Slot reasignado mientras se leía: _assign ya fijó su slot_seen
+                    if self.market_of_slot.get(slot) != market_id or self.slot_gen[slot] != gen:
+                        continue
+                    self.slot_seen[slot] = count
+                    meta = self.market_meta.get(market_id)
+                    if meta is None or not snaps:
+                        continue
+                    hist = self.history.setdefault(market_id, [])
+                    for snap in snaps:
+                        snap.update(meta)
+                        hist.append(snap)
+                        for p in self.profiles.values():
+                            p.offer(market_id, snap)
+                        for cb in self.snapshot_listeners:
+                            cb(market_id, snap)
+                    if len(hist) > self.max_snapshots:
+                        self.history[market_id] = hist[-self.max_snapshots:]
+                    self.snapshots_this_second += len(snaps)
+                    self.snapshots_total += len(snaps)
+
+            self._collect_stats()
+
+    def _collect_stats(self):
+        with self._stats.get_lock():
+            vals = list(self._stats)
+        fetched = 0.0
+        hits = 0.0
+        clob_ms = []
+        for i in range(self.n_shards):
+            base = i * _STATS_PER_SHARD
+            fetched += vals[base + 1] - self._stats_seen[base + 1]
+            hits += vals[base + 2] - self._stats_seen[base + 2]
+            if vals[base + 3] > 0:
+                clob_ms.append(vals[base + 3])
+        self._stats_seen = vals
+        with self.lock:
+            self.orderbooks_fetched_this_second += int(fetched)
+            self.cache_hits_this_second += int(hits)
+            if clob_ms:
+                self.clob_response_ms = sum(clob_ms) / len(clob_ms)
+
+    # ------------- LIVE SCAN -------------
+    def live_scan(self):
+        """
+        El padre solo hace Gamma + ranking y reparte mercados a los shards.
+        """
+        self.start_workers()
+        self.start_parse_pool()
+        if self.http_prewarm:
+            self.gamma_http.prewarm(base_url(self.gamma_url))
+        self.collector = threading.Thread(target=self.collect_loop, daemon=True)
+        self.collector.start()
+
+        last_refresh = 0.0
+        while not self.stop_event.is_set():
+            now = time.time()
+            if (now - last_refresh) < self.gamma_refresh_sec:
+                self.stop_event.wait(self.gamma_refresh_sec - (now - last_refresh))
+                continue
+            last_refresh = time.time()
+
+            with self.lock:
+                self.loops += 1
+                self.loops_this_second += 1
+
+            top_markets = self.ranked_markets()
+
+            if top_markets:
+                self._assign(top_markets)
+
+        if self.collector is not None:
+            self.collector.join(timeout=2)
+
+
+# ---------------- MAIN ----------------
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Scanner multi-proceso")
+    ap.add_argument("--shards", type=int, default=None)
+    ap.add_argument("--top-n", type=int, default=1000)
+    args = ap.parse_args()
+
+    scanner = ShardedScanner(
+        n_shards=args.shards,
+        max_markets=max(SHARD_MAX_MARKETS, args.top_n),
+        top_n_orderbook=args.top_n,
+    )
+
+    scan_thread = threading.Thread(target=scanner.live_scan, daemon=True)
+    dash_thread = threading.Thread(target=scanner.display_dashboard, daemon=True)
+
+    scan_thread.start()
+    dash_thread.start()
+
+    def signal_handler(sig, frame):
+        print("\n[ShardedScanner] Deteniendo ejecución...")
+        scanner.stop()
+        scan_thread.join(timeout=2)
+        dash_thread.join(timeout=2)
+        print("[ShardedScanner] Cerrado correctamente.")
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGINT, signal_handler)
+
+    try:
+        while True:
+            time.sleep(0.25)
+    except KeyboardInterrupt:
+        signal_handler(None, None)
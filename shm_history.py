@@ -0,0 +1,266 @@
+# shm_history.py
+# Export de scanner.history a memoria compartida (TickRing con seqlock) y
+# cliente para otros procesos con la misma vista `history` / `tracked_market_ids`.
+#
+# Así MarketMaker / MomentumMicroBot pueden correr en su propio proceso (y core)
+# sin competir por el GIL del scanner. El cliente no copia el histórico: cada
+# snapshot se lee del segmento solo cuando se accede a él.
+#
+# Uso:
+#   python shm_history.py                 # scanner + export
+#   python shm_history.py --attach        # MomentumMicroBot (paper) leyendo del segmento
+
+import argparse
+import signal
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from multiprocessing import resource_tracker
+from typing import Dict, Iterator, Optional, Tuple
+
+from shm_ring import SNAPSHOT_FIELDS, TickRing, record_to_snapshot
+
+# =======================
+# CONFIG
+# =======================
+
+SHARED_HISTORY_NAME = "polymarket_history"
+SHARED_HISTORY_SLOTS = 2048
+SHARED_HISTORY_META_SIZE = 512
+
+
+# ---------------- EXPORTER ----------------
+class SharedHistoryExporter:
+    """
+    Se engancha a scanner.snapshot_listeners y replica cada snapshot en el segmento.
+    Un slot por mercado trackeado; los mercados que salen liberan su slot.
+    """
+
+    def __init__(self, scanner, name: str = SHARED_HISTORY_NAME,
+                 n_slots: int = SHARED_HISTORY_SLOTS, depth: Optional[int] = None):
+        self.scanner = scanner
+        self.fields = SNAPSHOT_FIELDS
+        depth = int(depth or scanner.max_snapshots)
+
+        try:
+            self.ring = TickRing.create(n_slots, depth, self.fields, SHARED_HISTORY_META_SIZE, name=name)
+        except FileExistsError:
+            # Segmento huérfano de una ejecución anterior
+            stale = TickRing.attach(name)
+            stale.owner = True
+            stale.close()
+            self.ring = TickRing.create(n_slots, depth, self.fields, SHARED_HISTORY_META_SIZE, name=name)
+
+        self.slot_of: Dict[str, int] = {}
+        self.free_slots = list(range(n_slots - 1, -1, -1))
+        self._tracked_ref = None
+        self.dropped = 0
+
+        with scanner.lock:
+            for market_id, hist in scanner.history.items():
+                for snap in hist:
+                    self.on_snapshot(market_id, snap)
+            scanner.snapshot_listeners.append(self.on_snapshot)
+
+    @property
+    def name(self) -> str:
+        return self.ring.name
+
+    def _sync_directory(self, tracked):
+        self._tracked_ref = tracked
+        for market_id in [k for k in self.slot_of if k not in tracked]:
+            slot = self.slot_of.pop(market_id)
+            self.ring.set_meta(slot, None)
+            self.free_slots.append(slot)
+
+    def on_snapshot(self, market_id: str, snap: Dict):
+        tracked = self.scanner.tracked_market_ids
+        if tracked is not self._tracked_ref:
+            self._sync_directory(tracked)
+
+        slot = self.slot_of.get(market_id)
+        if slot is None:
+            if not self.free_slots:
+                self.dropped += 1
+                return
+            slot = self.free_slots.pop()
+            self.ring.set_meta(slot, {
+                "market_id": market_id,
+                "question": (snap.get("question") or "")[:120],
+                "yes_token_id": snap.get("yes_token_id"),
+                "no_token_id": snap.get("no_token_id"),
+            })
+            self.slot_of[market_id] = slot
+
+        self.ring.write(slot, [snap.get(k) for k in self.fields])
+
+    def close(self):
+        with self.scanner.lock:
+            if self.on_snapshot in self.scanner.snapshot_listeners:
+                self.scanner.snapshot_listeners.remove(self.on_snapshot)
+        self.ring.close()
+
+
+# ---------------- CLIENT ----------------
+class SharedSlotHistory(Sequence):
+    """
+    Vista (sin copia) del histórico de un mercado. Los índices se resuelven
+    contra el ring en cada acceso; si un registro ya fue sobreescrito (o el slot
+    se reasignó), IndexError y reversed()/iter() simplemente terminan ahí.
+    """
+
+    def __init__(self, client: "SharedHistoryClient", slot: int, meta: Dict):
+        self.client = client
+        self.slot = slot
+        self.meta = meta
+        self.gen, self.start, self.count = client.ring.bounds(slot)
+
+    def __len__(self) -> int:
+        return max(0, self.count - self.start)
+
+    def __getitem__(self, i):
+        n = len(self)
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(n))]
+        if i < 0:
+            i += n
+        if i < 0 or i >= n:
+            raise IndexError(i)
+        rec = self.client.ring.read_at(self.slot, self.start + i, self.gen)
+        if rec is None:
+            raise IndexError(i)
+        snap = record_to_snapshot(self.client.fields, rec)
+        snap.update(self.meta)
+        return snap
+
+    def __reversed__(self) -> Iterator[Dict]:
+        # Sequence.__reversed__ no captura IndexError (iter() sí)
+        for i in range(len(self) - 1, -1, -1):
+            try:
+                yield self[i]
+            except IndexError:
+                return
+
+
+class SharedHistoryMapping(Mapping):
+    def __init__(self, client: "SharedHistoryClient"):
+        self.client = client
+
+    def __getitem__(self, market_id: str) -> SharedSlotHistory:
+        entry = self.client.directory().get(market_id)
+        if entry is None:
+            raise KeyError(market_id)
+        slot, meta = entry
+        return SharedSlotHistory(self.client, slot, meta)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.client.directory().keys()))
+
+    def __len__(self) -> int:
+        return len(self.client.directory())
+
+
+class SharedHistoryClient:
+    """
+    Sustituto de `scanner` para estrategias en otro proceso:
+    expone history, tracked_market_ids y lock.
+    """
+
+    def __init__(self, name: str = SHARED_HISTORY_NAME):
+        self.ring = TickRing.attach(name)
+        # El segmento es del exportador: que el resource_tracker de este
+        # proceso no lo borre al salir
+        try:
+            resource_tracker.unregister(self.ring.shm._name, "shared_memory")
+        except Exception:
+            pass
+        self.fields = self.ring.fields
+        self.lock = threading.Lock()
+        self._dir_version = -1
+        self._directory: Dict[str, Tuple[int, Dict]] = {}
+
+    def directory(self) -> Dict[str, Tuple[int, Dict]]:
+        version = self.ring.dir_version
+        if version != self._dir_version:
+            directory = {}
+            for slot in range(self.ring.n_slots):
+                _, meta = self.ring.read_meta(slot)
+                if meta and meta.get("market_id"):
+                    directory[meta["market_id"]] = (slot, meta)
+            self._directory = directory
+            self._dir_version = version
+        return self._directory
+
+    @property
+    def history(self) -> SharedHistoryMapping:
+        return SharedHistoryMapping(self)
+
+    @property
+    def tracked_market_ids(self) -> set:
+        return set(self.directory().keys())
+
+    def last_snapshot(self, market_id: str) -> Optional[Dict]:
+        hist = self.history.get(market_id)
+        if not hist:
+            return None
+        try:
+            return hist[-1]
+        except IndexError:
+            return None
+
+    def close(self):
+        self.ring.close()
+
+
+# ---------------- MAIN ----------------
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export / cliente de history en memoria compartida")
+    ap.add_argument("--attach", action="store_true", help="Correr MomentumMicroBot leyendo del segmento")
+    ap.add_argument("--name", default=SHARED_HISTORY_NAME)
+    args = ap.parse_args()
+
+    if args.attach:
+        from momentum_bot import MomentumConfig, MomentumMicroBot
+
+        client = SharedHistoryClient(args.name)
+        bot = MomentumMicroBot(client, MomentumConfig())
+        bot_thread = threading.Thread(target=bot.run, daemon=True)
+        bot_thread.start()
+
+        def signal_handler(sig, frame):
+            print("\n[SharedHistory] Deteniendo bot...")
+            bot.stop()
+            bot_thread.join(timeout=2)
+            client.close()
+            raise SystemExit(0)
+
+        signal.signal(signal.SIGINT, signal_handler)
+        while True:
+            time.sleep(1)
+
+    from scanner import EventScannerGamma
+
+    scanner = EventScannerGamma()
+    exporter = SharedHistoryExporter(scanner, name=args.name)
+    print(f"[SharedHistory] Exportando history en shm '{exporter.name}'")
+
+    scan_thread = threading.Thread(target=scanner.live_scan, daemon=True)
+    dash_thread = threading.Thread(target=scanner.display_dashboard, daemon=True)
+    scan_thread.start()
+    dash_thread.start()
+
+    def signal_handler(sig, frame):
+        print("\n[SharedHistory] Deteniendo ejecución...")
+        scanner.stop()
+        scan_thread.join(timeout=2)
+        dash_thread.join(timeout=2)
+        exporter.close()
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGINT, signal_handler)
+
+    try:
+        while True:
+            time.sleep(0.25)
+    except KeyboardInterrupt:
+        signal_handler(None, None)
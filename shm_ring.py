@@ -0,0 +1,268 @@
+# shm_ring.py
+# Ring buffers de snapshots numéricos en memoria compartida (un ring por slot/mercado).
+#
+# Un único escritor por slot; lectores en cualquier proceso.
+# Cada slot usa un seqlock: el escritor pone seq impar, escribe, y deja seq par.
+# El lector reintenta si ve seq impar o si seq cambió durante la copia.
+#
+# Layout:
+#   [header 4096B: magic, n_slots, depth, n_fields, meta_size, dir_version, nombres de campos]
+#   n_slots x [seq u64, count u64, gen u64, gen_start u64, meta_len u32, meta bytes, depth x registro]
+
+import json
+import math
+import struct
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from rolling_features import FEATURE_FIELDS
+
+# Campos numéricos del snapshot del scanner (mismo nombre que en history), features rolling incluidas
+SNAPSHOT_FIELDS: Tuple[str, ...] = (
+    "ts",
+    "liquidity",
+    "volume",
+    "p_yes",
+    "p_no",
+    "bestBid_yes",
+    "bestAsk_yes",
+    "bidSize_yes",
+    "askSize_yes",
+    "bestBid_no",
+    "bestAsk_no",
+    "bidSize_no",
+    "askSize_no",
+    "spread_yes",
+    "spread_no",
+    "mid_yes",
+    "mid_no",
+    "imbalance_yes",
+    "imbalance_no",
+    "microprice_yes",
+    "microprice_no",
+    "fetch_ts_yes",
+    "fetch_ts_no",
+    "exch_ts_yes",
+    "exch_ts_no",
+    "age_yes",
+    "age_no",
+    "max_book_age",
+) + FEATURE_FIELDS
+
+MAGIC = b"PMRING02"
+# magic, n_slots, depth, n_fields, meta_size, dir_version
+_HEADER = struct.Struct("<8sIIIIQ")
+_HEADER_SIZE = 4096
+_DIR_VERSION_OFF = 24
+# seq, count, gen, gen_start, meta_len
+_SLOT_HEADER = struct.Struct("<QQQQI4x")
+_U64 = struct.Struct("<Q")
+
+MAX_READ_RETRIES = 64
+
+NAN = float("nan")
+
+
+def _to_float(x) -> float:
+    if x is None:
+        return NAN
+    try:
+        return float(x)
+    except Exception:
+        return NAN
+
+
+def _from_float(x: float) -> Optional[float]:
+    return None if math.isnan(x) else x
+
+
+class TickRing:
+    """
+    n_slots rings de `depth` registros de len(fields) float64,
+    con metadatos opcionales (JSON, hasta meta_size bytes) por slot.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.buf = shm.buf
+
+        magic, n_slots, depth, n_fields, meta_size, _ = _HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Segmento {shm.name} no es un TickRing")
+
+        names = bytes(self.buf[_HEADER.size:_HEADER_SIZE]).rstrip(b"\x00").decode("utf-8")
+        self.fields: Tuple[str, ...] = tuple(names.split(",")) if names else ()
+        self.n_slots = n_slots
+        self.depth = depth
+        self.n_fields = n_fields
+        self.meta_size = meta_size
+        self.record = struct.Struct(f"<{n_fields}d")
+        self.slot_size = _SLOT_HEADER.size + meta_size + depth * self.record.size
+
+    # ------------- CREATE / ATTACH -------------
+    @staticmethod
+    def size_for(n_slots: int, depth: int, n_fields: int, meta_size: int = 0) -> int:
+        return _HEADER_SIZE + n_slots * (_SLOT_HEADER.size + meta_size + depth * n_fields * 8)
+
+    @classmethod
+    def create(cls, n_slots: int, depth: int, fields: Sequence[str], meta_size: int = 0,
+               name: Optional[str] = None) -> "TickRing":
+        names = ",".join(fields).encode("utf-8")
+        if _HEADER.size + len(names) > _HEADER_SIZE:
+            raise ValueError("Demasiados campos para la cabecera del TickRing")
+        size = cls.size_for(n_slots, depth, len(fields), meta_size)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        _HEADER.pack_into(shm.buf, 0, MAGIC, n_slots, depth, len(fields), meta_size, 0)
+        shm.buf[_HEADER.size:_HEADER.size + len(names)] = names
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "TickRing":
+        return cls(shared_memory.SharedMemory(name=name, create=False), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self):
+        self.buf = None
+        try:
+            self.shm.close()
+        except Exception:
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except Exception:
+                pass
+
+    # ------------- DIRECTORY -------------
+    @property
+    def dir_version(self) -> int:
+        return _U64.unpack_from(self.buf, _DIR_VERSION_OFF)[0]
+
+    def _bump_dir_version(self):
+        _U64.pack_into(self.buf, _DIR_VERSION_OFF, self.dir_version + 1)
+
+    # ------------- SLOT IO -------------
+    def _slot_off(self, slot: int) -> int:
+        return _HEADER_SIZE + slot * self.slot_size
+
+    def _rec_off(self, slot: int, i: int) -> int:
+        return self._slot_off(slot) + _SLOT_HEADER.size + self.meta_size + (i % self.depth) * self.record.size
+
+    def count(self, slot: int) -> int:
+        return _SLOT_HEADER.unpack_from(self.buf, self._slot_off(slot))[1]
+
+    def gen(self, slot: int) -> int:
+        return _SLOT_HEADER.unpack_from(self.buf, self._slot_off(slot))[2]
+
+    def write(self, slot: int, values: Sequence):
+        """
+        Escritor único por slot.
+        """
+        off = self._slot_off(slot)
+        seq, count, gen, gen_start, meta_len = _SLOT_HEADER.unpack_from(self.buf, off)
+        _SLOT_HEADER.pack_into(self.buf, off, seq + 1, count, gen, gen_start, meta_len)
+        self.record.pack_into(self.buf, self._rec_off(slot, count), *[_to_float(v) for v in values])
+        _SLOT_HEADER.pack_into(self.buf, off, seq + 2, count + 1, gen, gen_start, meta_len)
+
+    def set_meta(self, slot: int, meta: Optional[Dict]):
+        """
+        Asigna (o libera con meta=None) el slot. Abre una nueva generación:
+        los registros anteriores dejan de ser visibles para los lectores.
+        """
+        data = b"" if meta is None else json.dumps(meta, separators=(",", ":")).encode("utf-8")
+        if len(data) > self.meta_size:
+            raise ValueError(f"Metadatos de {len(data)}B exceden meta_size={self.meta_size}")
+        off = self._slot_off(slot)
+        seq, count, gen, _, _ = _SLOT_HEADER.unpack_from(self.buf, off)
+        _SLOT_HEADER.pack_into(self.buf, off, seq + 1, count, gen, count, 0)
+        moff = off + _SLOT_HEADER.size
+        self.buf[moff:moff + len(data)] = data
+        _SLOT_HEADER.pack_into(self.buf, off, seq + 2, count, gen + 1, count, len(data))
+        self._bump_dir_version()
+
+    def read_meta(self, slot: int) -> Tuple[int, Optional[Dict]]:
+        """
+        Devuelve (gen, meta) consistentes. meta=None si el slot está libre.
+        """
+        off = self._slot_off(slot)
+        for _ in range(MAX_READ_RETRIES):
+            seq0, _, gen, _, meta_len = _SLOT_HEADER.unpack_from(self.buf, off)
+            if seq0 & 1:
+                continue
+            raw = bytes(self.buf[off + _SLOT_HEADER.size: off + _SLOT_HEADER.size + meta_len])
+            if _SLOT_HEADER.unpack_from(self.buf, off)[0] == seq0:
+                if not raw:
+                    return gen, None
+                try:
+                    return gen, json.loads(raw.decode("utf-8"))
+                except Exception:
+                    return gen, None
+        return 0, None
+
+    def bounds(self, slot: int) -> Tuple[int, int, int]:
+        """
+        (gen, primer índice legible, count) del slot, consistentes.
+        """
+        off = self._slot_off(slot)
+        for _ in range(MAX_READ_RETRIES):
+            seq0, count, gen, gen_start, _ = _SLOT_HEADER.unpack_from(self.buf, off)
+            if seq0 & 1:
+                continue
+            if _SLOT_HEADER.unpack_from(self.buf, off)[0] == seq0:
+                return gen, max(gen_start, count - self.depth), count
+        return 0, 0, 0
+
+    def read_at(self, slot: int, i: int, gen: Optional[int] = None) -> Optional[Tuple[float, ...]]:
+        """
+        Lee el registro absoluto i, o None si ya fue sobreescrito (o cambió la generación).
+        """
+        off = self._slot_off(slot)
+        rec_off = self._rec_off(slot, i)
+        for _ in range(MAX_READ_RETRIES):
+            seq0, count, g, gen_start, _ = _SLOT_HEADER.unpack_from(self.buf, off)
+            if seq0 & 1:
+                continue
+            if (gen is not None and g != gen) or i >= count or i < max(gen_start, count - self.depth):
+                return None
+            rec = self.record.unpack_from(self.buf, rec_off)
+            seq1, count1, g1 = _SLOT_HEADER.unpack_from(self.buf, off)[:3]
+            if seq1 == seq0:
+                return rec
+            # Hubo escrituras, pero ninguna (ni la que esté en curso) cae sobre el índice i
+            if g1 == g and i > count1 - self.depth:
+                return rec
+        return None
+
+    def read_since(self, slot: int, last_count: int) -> Tuple[int, List[Tuple[float, ...]]]:
+        """
+        Devuelve (count, registros nuevos desde last_count), consistentes.
+        Si el lector se quedó más de `depth` registros atrás, devuelve los últimos `depth`.
+        """
+        off = self._slot_off(slot)
+        rsize = self.record.size
+        rec_base = off + _SLOT_HEADER.size + self.meta_size
+        for _ in range(MAX_READ_RETRIES):
+            seq0, count, _, gen_start, _ = _SLOT_HEADER.unpack_from(self.buf, off)
+            if seq0 & 1:
+                continue
+            start = max(last_count, gen_start, count - self.depth)
+            out = [
+                self.record.unpack_from(self.buf, rec_base + (i % self.depth) * rsize)
+                for i in range(start, count)
+            ]
+            if _SLOT_HEADER.unpack_from(self.buf, off)[0] == seq0:
+                return count, out
+        return last_count, []
+
+    def read_last(self, slot: int) -> Optional[Tuple[float, ...]]:
+        _, recs = self.read_since(slot, max(0, self.count(slot) - 1))
+        return recs[-1] if recs else None
+
+
+def record_to_snapshot(fields: Sequence[str], rec: Sequence[float]) -> Dict:
+    return {k: _from_float(v) for k, v in zip(fields, rec)}
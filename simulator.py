@@ -0,0 +1,548 @@
+# simulator.py
+# Simulador local de Polymarket (Gamma /events, CLOB /book y WS market channel)
+# para hacer load-test del scanner, market maker y momentum bot sin tocar producción.
+#
+# Uso:
+#   python simulator.py --port 8765 --events 2000
+#   POLYMARKET_GAMMA_HOST=http://127.0.0.1:8765 POLYMARKET_CLOB_HOST=http://127.0.0.1:8765 python scanner.py
+#
+# Inyección de fallos: latencia (fixed/uniform/lognormal), 429, timeouts y JSON corrupto.
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+import select
+import socket
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC11B85"
+
+TAGS = [
+    ("Politics", "politics"),
+    ("Sports", "sports"),
+    ("Crypto", "crypto"),
+    ("Business", "business"),
+    ("Pop Culture", "pop-culture"),
+    ("Science", "science"),
+]
+
+
+def clamp(x: float, lo: float, hi: float) -> float:
+    return max(lo, min(hi, x))
+
+
+# =========================
+# CONFIG
+# =========================
+
+@dataclass
+class SimConfig:
+    host: str = "127.0.0.1"
+    port: int = 8765
+
+    # Universo
+    n_events: int = 500
+    max_markets_per_event: int = 4
+    seed: int = 7
+
+    # Random walk del precio YES (por segundo)
+    walk_sigma: float = 0.004
+    walk_step_sec: float = 0.1
+    # Probabilidad de que un mercado se quede quieto en un paso (mercados muertos)
+    walk_idle_prob: float = 0.6
+
+    # Libro
+    book_levels: int = 8
+    tick: float = 0.001
+    min_spread_ticks: int = 1
+    max_spread_ticks: int = 20
+
+    # Latencia inyectada por request HTTP
+    latency_dist: str = "lognormal"  # "fixed" | "uniform" | "lognormal"
+    latency_ms: float = 40.0         # fixed / media lognormal / máximo uniform
+    latency_sigma: float = 0.5       # sigma lognormal
+
+    # Fallos
+    p_429: float = 0.0
+    p_timeout: float = 0.0
+    timeout_sec: float = 5.0
+    p_malformed: float = 0.0
+
+    # WS
+    ws_interval_sec: float = 0.25
+
+
+# =========================
+# MERCADOS
+# =========================
+
+class SimMarket:
+    """
+    Mercado binario con random walk sobre p_yes.
+    El precio se avanza perezosamente en cada lectura.
+    """
+
+    def __init__(self, market_id: str, question: str, condition_id: str,
+                 yes_tid: str, no_tid: str, p_yes: float, liquidity: float, volume: float,
+                 rnd: random.Random, cfg: SimConfig):
+        self.market_id = market_id
+        self.question = question
+        self.condition_id = condition_id
+        self.yes_tid = yes_tid
+        self.no_tid = no_tid
+        self.p_yes = p_yes
+        self.liquidity = liquidity
+        self.volume = volume
+        self.spread_ticks = rnd.randint(cfg.min_spread_ticks, cfg.max_spread_ticks)
+        self.rnd = random.Random(rnd.getrandbits(32))
+        self.cfg = cfg
+        self.last_step = time.time()
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def advance(self, now: float):
+        with self.lock:
+            steps = int((now - self.last_step) / self.cfg.walk_step_sec)
+            if steps <= 0:
+                return
+            self.last_step += steps * self.cfg.walk_step_sec
+            moving = sum(1 for _ in range(min(steps, 50)) if self.rnd.random() > self.cfg.walk_idle_prob)
+            if moving == 0:
+                return
+            sigma = self.cfg.walk_sigma * math.sqrt(self.cfg.walk_step_sec * moving)
+            self.p_yes = clamp(self.p_yes + self.rnd.gauss(0.0, sigma), 0.02, 0.98)
+            self.volume += self.rnd.uniform(0, 50) * moving
+            self.version += 1
+
+    def _levels(self, mid: float, n: int) -> Tuple[List[Dict], List[Dict]]:
+        tick = self.cfg.tick
+        half = self.spread_ticks * tick / 2.0
+        best_bid = math.floor((mid - half) / tick) * tick
+        best_ask = best_bid + self.spread_ticks * tick
+        bids = []
+        asks = []
+        for i in range(n):
+            bp = round(best_bid - i * tick * 10, 3)
+            ap = round(best_ask + i * tick * 10, 3)
+            if bp >= tick:
+                bids.append({"price": f"{bp:g}", "size": f"{self.rnd.uniform(5, 3000):.2f}"})
+            if ap <= 1.0 - tick:
+                asks.append({"price": f"{ap:g}", "size": f"{self.rnd.uniform(5, 3000):.2f}"})
+        # Mismo orden que CLOB /book: bids ascendentes, asks descendentes
+        bids.reverse()
+        asks.reverse()
+        return bids, asks
+
+    def book(self, token_id: str, now: float) -> Dict:
+        self.advance(now)
+        p = self.p_yes if token_id == self.yes_tid else 1.0 - self.p_yes
+        bids, asks = self._levels(p, self.cfg.book_levels)
+        return {
+            "market": self.condition_id,
+            "asset_id": token_id,
+            "timestamp": str(int(now * 1000)),
+            "hash": "%040x" % self.rnd.getrandbits(160),
+            "min_order_size": "5",
+            "tick_size": f"{self.cfg.tick:g}",
+            "neg_risk": False,
+            "bids": bids,
+            "asks": asks,
+        }
+
+    def gamma(self, now: float) -> Dict:
+        self.advance(now)
+        p = round(self.p_yes, 4)
+        return {
+            "id": self.market_id,
+            "question": self.question,
+            "conditionId": self.condition_id,
+            "outcomes": "[\"Yes\", \"No\"]",
+            "outcomePrices": json.dumps([f"{p:.4f}", f"{1.0 - p:.4f}"]),
+            "clobTokenIds": json.dumps([self.yes_tid, self.no_tid]),
+            "liquidity": f"{self.liquidity:.4f}",
+            "volume": f"{self.volume:.4f}",
+            "liquidityNum": round(self.liquidity, 4),
+            "volumeNum": round(self.volume, 4),
+            "active": True,
+            "closed": False,
+        }
+
+
+class SimUniverse:
+    def __init__(self, cfg: SimConfig):
+        self.cfg = cfg
+        rnd = random.Random(cfg.seed)
+        self.events: List[Dict] = []
+        self.markets: Dict[str, SimMarket] = {}
+        self.by_token: Dict[str, SimMarket] = {}
+
+        market_seq = 600000
+        for e in range(cfg.n_events):
+            label, slug = rnd.choice(TAGS)
+            n = 1 if rnd.random() < 0.6 else rnd.randint(2, max(2, cfg.max_markets_per_event))
+            ms = []
+            for k in range(n):
+                market_seq += rnd.randint(1, 9)
+                yes_tid = str(rnd.randrange(10 ** 75, 10 ** 77))
+                no_tid = str(rnd.randrange(10 ** 75, 10 ** 77))
+                liq = rnd.lognormvariate(9.0, 1.5)
+                m = SimMarket(
+                    market_id=str(market_seq),
+                    question=f"Sim event {e} outcome {k + 1}?",
+                    condition_id="0x%064x" % rnd.getrandbits(256),
+                    yes_tid=yes_tid,
+                    no_tid=no_tid,
+                    p_yes=rnd.uniform(0.03, 0.97),
+                    liquidity=liq,
+                    volume=liq * rnd.uniform(1.0, 40.0),
+                    rnd=rnd,
+                    cfg=cfg,
+                )
+                ms.append(m)
+                self.markets[m.market_id] = m
+                self.by_token[yes_tid] = m
+                self.by_token[no_tid] = m
+            self.events.append({
+                "id": str(30000 + e),
+                "slug": f"sim-event-{e}",
+                "title": f"Sim event {e}",
+                "tags": [{"id": str(100 + TAGS.index((label, slug))), "label": label, "slug": slug}],
+                "markets": ms,
+            })
+
+    def events_payload(self, now: float, offset: int, limit: int, liquidity_min: float = 0.0,
+                       volume_min: float = 0.0, tag_slug: Optional[str] = None) -> List[Dict]:
+        out = []
+        for e in self.events:
+            if tag_slug and not any(t["slug"] == tag_slug for t in e["tags"]):
+                continue
+            markets = [m.gamma(now) for m in e["markets"]]
+            out.append({
+                "id": e["id"],
+                "slug": e["slug"],
+                "title": e["title"],
+                "active": True,
+                "closed": False,
+                "tags": e["tags"],
+                "liquidity": round(sum(m["liquidityNum"] for m in markets), 4),
+                "volume": round(sum(m["volumeNum"] for m in markets), 4),
+                "markets": markets,
+            })
+        # Filtros server-side de Gamma (a nivel evento)
+        out = [e for e in out if e["liquidity"] >= liquidity_min and e["volume"] >= volume_min]
+        out.sort(key=lambda x: x["volume"], reverse=True)
+        return out[offset: offset + limit]
+
+
+# =========================
+# SERVER
+# =========================
+
+class SimStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def inc(self, key: str, n: int = 1):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counts)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "PolySim/1.0"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    # ------------- FAULTS -------------
+    def _sample_latency(self) -> float:
+        cfg = self.server.sim_cfg
+        rnd = self.server.rnd
+        if cfg.latency_ms <= 0:
+            return 0.0
+        if cfg.latency_dist == "fixed":
+            ms = cfg.latency_ms
+        elif cfg.latency_dist == "uniform":
+            ms = rnd.uniform(0.0, cfg.latency_ms)
+        else:
+            mu = math.log(cfg.latency_ms) - 0.5 * cfg.latency_sigma ** 2
+            ms = rnd.lognormvariate(mu, cfg.latency_sigma)
+        return ms / 1000.0
+
+    def _inject_faults(self) -> bool:
+        """
+        Aplica latencia y fallos. Devuelve True si ya respondió (429).
+        """
+        cfg = self.server.sim_cfg
+        rnd = self.server.rnd
+        stats = self.server.stats
+
+        lat = self._sample_latency()
+        if lat > 0:
+            time.sleep(lat)
+
+        if cfg.p_timeout > 0 and rnd.random() < cfg.p_timeout:
+            stats.inc("fault_timeout")
+            time.sleep(cfg.timeout_sec)
+
+        if cfg.p_429 > 0 and rnd.random() < cfg.p_429:
+            stats.inc("fault_429")
+            self._send_json({"error": "Too Many Requests"}, status=429, extra_headers={"Retry-After": "1"})
+            return True
+        return False
+
+    def _send_json(self, payload, status: int = 200, extra_headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        cfg = self.server.sim_cfg
+        if status == 200 and cfg.p_malformed > 0 and self.server.rnd.random() < cfg.p_malformed:
+            self.server.stats.inc("fault_malformed")
+            body = body[: max(1, len(body) // 2)]
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (extra_headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    # ------------- ROUTES -------------
+    def do_GET(self):
+        url = urlparse(self.path)
+        qs = parse_qs(url.query)
+        stats = self.server.stats
+
+        if url.path.rstrip("/") in ("/ws/market", "/ws"):
+            stats.inc("ws_connections")
+            self._serve_ws()
+            return
+
+        if url.path.rstrip("/") == "/events":
+            stats.inc("events")
+            if self._inject_faults():
+                return
+            limit = int((qs.get("limit") or ["500"])[0])
+            offset = int((qs.get("offset") or ["0"])[0])
+            self._send_json(self.server.universe.events_payload(
+                time.time(),
+                offset,
+                limit,
+                liquidity_min=float((qs.get("liquidity_min") or ["0"])[0]),
+                volume_min=float((qs.get("volume_min") or ["0"])[0]),
+                tag_slug=(qs.get("tag_slug") or [None])[0],
+            ))
+            return
+
+        if url.path.rstrip("/") == "/book":
+            stats.inc("book")
+            if self._inject_faults():
+                return
+            tid = (qs.get("token_id") or [""])[0]
+            m = self.server.universe.by_token.get(tid)
+            if m is None:
+                self._send_json({"error": "No orderbook exists for the requested token id"}, status=404)
+                return
+            self._send_json(m.book(tid, time.time()))
+            return
+
+        if url.path.rstrip("/") == "/stats":
+            self._send_json(stats.snapshot())
+            return
+
+        self._send_json({"error": "not found"}, status=404)
+
+    # ------------- WEBSOCKET (market channel) -------------
+    def _serve_ws(self):
+        key = self.headers.get("Sec-WebSocket-Key")
+        if not key or "websocket" not in (self.headers.get("Upgrade") or "").lower():
+            self._send_json({"error": "expected websocket upgrade"}, status=400)
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        sock = self.connection
+        universe = self.server.universe
+        cfg = self.server.sim_cfg
+        assets: List[str] = []
+        versions: Dict[str, int] = {}
+
+        try:
+            while not self.server.stopping.is_set():
+                ready, _, _ = select.select([sock], [], [], cfg.ws_interval_sec)
+                if ready:
+                    op, payload = _ws_recv(self.rfile)
+                    if op is None or op == 0x8:
+                        _ws_send(sock, b"", opcode=0x8)
+                        return
+                    if op == 0x9:
+                        _ws_send(sock, payload, opcode=0xA)
+                        continue
+                    if op == 0x1:
+                        try:
+                            msg = json.loads(payload.decode("utf-8"))
+                        except Exception:
+                            continue
+                        if isinstance(msg, dict) and msg.get("assets_ids"):
+                            assets = [str(a) for a in msg["assets_ids"] if str(a) in universe.by_token]
+                            versions = {}
+
+                now = time.time()
+                out = []
+                for tid in assets:
+                    m = universe.by_token[tid]
+                    m.advance(now)
+                    if versions.get(tid) == m.version:
+                        continue
+                    versions[tid] = m.version
+                    b = m.book(tid, now)
+                    b["event_type"] = "book"
+                    out.append(b)
+                if out:
+                    self.server.stats.inc("ws_messages", len(out))
+                    _ws_send(sock, json.dumps(out).encode("utf-8"))
+        except (OSError, ConnectionError):
+            return
+
+
+def _ws_recv(rfile) -> Tuple[Optional[int], bytes]:
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None, b""
+    b0, b1 = head[0], head[1]
+    opcode = b0 & 0x0F
+    masked = b1 & 0x80
+    n = b1 & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", rfile.read(2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", rfile.read(8))[0]
+    mask = rfile.read(4) if masked else b""
+    data = rfile.read(n)
+    if masked:
+        data = bytes(c ^ mask[i % 4] for i, c in enumerate(data))
+    return opcode, data
+
+
+def _ws_send(sock: socket.socket, data: bytes, opcode: int = 0x1):
+    n = len(data)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < (1 << 16):
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    sock.sendall(header + data)
+
+
+class _SimServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+
+class PolymarketSimulator:
+    """
+    Servidor local que imita Gamma /events, CLOB /book y el WS market channel.
+    """
+
+    def __init__(self, cfg: Optional[SimConfig] = None):
+        self.cfg = cfg or SimConfig()
+        self.universe = SimUniverse(self.cfg)
+        self.stats = SimStats()
+        self.httpd: Optional[_SimServer] = None
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2] if self.httpd else (self.cfg.host, self.cfg.port)
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self.httpd = _SimServer((self.cfg.host, self.cfg.port), _Handler)
+        self.httpd.sim_cfg = self.cfg
+        self.httpd.universe = self.universe
+        self.httpd.stats = self.stats
+        self.httpd.rnd = random.Random(self.cfg.seed + 1)
+        self.httpd.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.stopping.set()
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+# ---------------- MAIN ----------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Simulador local de Polymarket")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--events", type=int, default=500)
+    ap.add_argument("--max-markets-per-event", type=int, default=4)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--walk-sigma", type=float, default=0.004)
+    ap.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    ap.add_argument("--latency-sigma", type=float, default=0.5)
+    ap.add_argument("--p-429", type=float, default=0.0)
+    ap.add_argument("--p-timeout", type=float, default=0.0)
+    ap.add_argument("--timeout-sec", type=float, default=5.0)
+    ap.add_argument("--p-malformed", type=float, default=0.0)
+    args = ap.parse_args(argv)
+
+    cfg = SimConfig(
+        host=args.host,
+        port=args.port,
+        n_events=args.events,
+        max_markets_per_event=args.max_markets_per_event,
+        seed=args.seed,
+        walk_sigma=args.walk_sigma,
+        latency_dist=args.latency_dist,
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        p_429=args.p_429,
+        p_timeout=args.p_timeout,
+        timeout_sec=args.timeout_sec,
+        p_malformed=args.p_malformed,
+    )
+    sim = PolymarketSimulator(cfg)
+    url = sim.start()
+    print(f"[Simulator] {len(sim.universe.markets)} mercados en {url}")
+    print(f"  export POLYMARKET_GAMMA_HOST={url}")
+    print(f"  export POLYMARKET_CLOB_HOST={url}")
+    print(f"  WS market channel: {url.replace('http', 'ws', 1)}/ws/market")
+
+    try:
+        while True:
+            time.sleep(5)
+            print(f"[Simulator] {sim.stats.snapshot()}")
+    except KeyboardInterrupt:
+        sim.stop()
+        print("[Simulator] Cerrado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# test_load_controller.py
+# decide() del LoadController contra un scanner falso (sin red ni threads).
+#
+# Uso:
+#   python -m pytest -q test_load_controller.py
+
+import threading
+from collections import deque
+
+from load_controller import LoadController
+
+
+class FakePool:
+    def __init__(self, size: int):
+        self.pool_size = size
+
+    def resize(self, size: int):
+        self.pool_size = size
+
+
+class FakeScanner:
+    def __init__(self, **kw):
+        self.lock = threading.Lock()
+        self.clob_http = FakePool(64)
+        self.snapshots_total = 0
+        self.loops = 0
+        self.last_loop_topN = 40
+        self.loop_ms = deque()
+        self.top_n_orderbook = 40
+        self.clob_workers = 16
+        self.orderbook_cooldown = 0.35
+        self.min_loop_interval = 0.15
+        self.__dict__.update(kw)
+
+
+def _measure(ticks: float, p99_ms: float, loop_period: float, ctrl: LoadController):
+    ctrl.loop_period = loop_period
+    return {"ticks": ticks, "p99_ms": p99_ms, "loop_period": loop_period, "markets": 40}
+
+
+def test_pocos_ticks_no_baja_cooldown():
+    # Cooldown por encima del periodo del loop (tops de cache reutilizados): no se toca
+    sc = FakeScanner(orderbook_cooldown=1.0, min_loop_interval=0.05)
+    ctrl = LoadController(sc, target_ticks=2.0, target_p99_ms=1500)
+    change = ctrl.decide(_measure(0.5, 800.0, 0.5, ctrl))
+    assert change == ("clob_workers", 16, 20)
+    assert sc.orderbook_cooldown == 1.0
+
+
+def test_pocos_ticks_baja_intervalo_si_limita():
+    sc = FakeScanner(min_loop_interval=0.5)
+    ctrl = LoadController(sc, target_ticks=2.0, target_p99_ms=1500)
+    change = ctrl.decide(_measure(1.0, 800.0, 0.5, ctrl))
+    assert change == ("min_loop_interval", 0.5, 0.4)
+    assert sc.orderbook_cooldown == 0.35
+
+
+def test_lento_sube_workers():
+    sc = FakeScanner()
+    ctrl = LoadController(sc, target_ticks=1.0, target_p99_ms=1000)
+    assert ctrl.decide(_measure(1.0, 2000.0, 1.0, ctrl)) == ("clob_workers", 16, 20)
+    assert ctrl.state == "lento"
+
+
+def test_holgura_sube_mercados():
+    sc = FakeScanner()
+    ctrl = LoadController(sc, target_ticks=1.0, target_p99_ms=1500)
+    assert ctrl.decide(_measure(3.0, 300.0, 0.3, ctrl)) == ("top_n_orderbook", 40, 46)
+
+
+def test_en_objetivo_no_ajusta():
+    sc = FakeScanner()
+    ctrl = LoadController(sc, target_ticks=1.0, target_p99_ms=1500)
+    assert ctrl.decide(_measure(1.0, 1500.0, 1.0, ctrl)) is None
+    assert ctrl.state == "en objetivo"
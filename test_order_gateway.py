@@ -0,0 +1,49 @@
+# test_order_gateway.py
+# Regresiones del OrderGateway contra MockExchange (sin red).
+#
+# Uso:
+#   python -m pytest -q test_order_gateway.py
+
+from order_gateway import MockExchange, OrderGateway
+
+
+def _gateway(**kw) -> OrderGateway:
+    return OrderGateway(MockExchange(latency_ms=5, jitter_ms=0, seed=1), **kw).start()
+
+
+def test_cancel_mismo_lote_que_place():
+    # place + cancel seguidos caen en el mismo lote: el cancel espera al ack del place
+    g = _gateway(batch_window_ms=50)
+    try:
+        cid, f_place = g.place("tok", "BUY", 0.40, 10)
+        f_cancel = g.cancel(cid)
+        place_ack = f_place.result(timeout=2)
+        cancel_ack = f_cancel.result(timeout=2)
+        assert place_ack.ok
+        assert cancel_ack.ok, cancel_ack.error
+        assert cid not in g.order_ids
+        assert not g.transport.orders
+    finally:
+        g.stop()
+
+
+def test_cancel_tras_ack():
+    g = _gateway(batch_window_ms=0)
+    try:
+        cid, f_place = g.place("tok", "SELL", 0.60, 5)
+        assert f_place.result(timeout=2).ok
+        assert cid in g.order_ids
+        assert g.cancel(cid).result(timeout=2).ok
+        assert cid not in g.order_ids
+    finally:
+        g.stop()
+
+
+def test_cancel_desconocido():
+    g = _gateway(batch_window_ms=0)
+    try:
+        ack = g.cancel("no-existe").result(timeout=2)
+        assert not ack.ok
+        assert ack.error == "orden desconocida"
+    finally:
+        g.stop()
@@ -0,0 +1,62 @@
+# test_scanner_pipeline.py
+# Regresiones del pipeline books -> build del scanner (sin red: fetch_book_tops falso).
+#
+# Uso:
+#   python -m pytest -q test_scanner_pipeline.py
+
+import time
+
+from scanner import BookTop, EventScannerGamma
+
+MARKET = {
+    "id": "m1",
+    "question": "¿Test?",
+    "outcomePrices": '["0.5", "0.5"]',
+    "clobTokenIds": '["tok-yes", "tok-no"]',
+}
+
+
+def _top(bid: float, ask: float) -> BookTop:
+    mid = 0.5 * (bid + ask)
+    return BookTop(bid, 100.0, ask, 100.0, mid, 0.5, mid, ((bid, 100.0),), ((ask, 100.0),), None)
+
+
+def _scanner(clock: dict, bid: dict) -> EventScannerGamma:
+    sc = EventScannerGamma(
+        min_liquidity=0, min_volume=0, categories=None,
+        orderbook_cooldown=0.0, max_book_age=0.5, http_prewarm=False, pipelined=False,
+    )
+
+    def fake_fetch(tokens):
+        # Como _fetch_tops: la hora de llegada va a orderbook_last_fetch
+        out = {}
+        for tid in tokens:
+            sc.orderbook_last_fetch[tid] = clock["t"]
+            out[tid] = _top(bid["v"], bid["v"] + 0.02)
+        return out
+
+    sc.fetch_book_tops = fake_fetch
+    return sc
+
+
+def test_lote_n_construido_tras_fetch_n1():
+    now = time.time()
+    clock = {"t": now - 1.0}
+    bid = {"v": 0.40}
+    sc = _scanner(clock, bid)
+    seen = []
+    sc.snapshot_listeners.append(lambda mid, snap: seen.append(sc.batch_tops[snap["yes_token_id"]].bid))
+
+    batch_n = sc.fetch_top_books([MARKET])
+    clock["t"], bid["v"] = now, 0.45
+    sc.fetch_top_books([MARKET])          # lote N+1 ya descargado
+    sc.build_snapshots(batch_n)
+
+    snap = sc.history["m1"][-1]
+    assert snap["fetch_ts_yes"] == now - 1.0
+    assert snap["age_yes"] >= 1.0
+    assert snap["bestBid_yes"] == 0.40
+    assert sc.stale_snapshots_count == 1
+    # Los listeners ven los books del lote N, no los de book_tops (N+1)
+    assert seen == [0.40]
+    assert sc.book_tops["tok-yes"].bid == 0.45
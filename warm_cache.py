@@ -0,0 +1,107 @@
+# warm_cache.py
+# Arranque en caliente del scanner.
+#
+# Guarda en un JSON local el universo trackeado (dicts de Gamma del top-N, con sus
+# token ids) y los últimos snapshots de cada mercado. Al arrancar:
+#   - el ranking se siembra con ese universo => el primer loop pide books sin
+#     esperar a Gamma (Gamma refresca el universo desde el segundo loop)
+#   - el historial se restaura con los snapshots aún recientes => las ventanas
+#     de lookback de las estrategias tienen datos desde el primer loop
+# La cache se ignora si es vieja o si se generó con otros filtros.
+
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+# =======================
+# CONFIG
+# =======================
+
+WARM_CACHE_VERSION = 1
+WARM_CACHE_SNAPSHOTS = 40           # snapshots por mercado que se guardan
+WARM_CACHE_MAX_AGE_SEC = 900.0      # cache más vieja => arranque en frío
+
+
+def filters_signature(scanner) -> List:
+    return [
+        scanner.min_liquidity,
+        scanner.min_volume,
+        sorted(scanner.categories) if scanner.categories else None,
+        scanner.multi_outcome,
+    ]
+
+
+def save_warm_cache(scanner, path: str, snapshots: int = WARM_CACHE_SNAPSHOTS) -> int:
+    """
+    Escribe la cache de forma atómica (tmp + rename). Devuelve los bytes escritos.
+    """
+    with scanner.lock, scanner.ranking.lock:
+        market_ids = list(scanner.ranking.last_top) or list(scanner.tracked_market_ids)
+        markets = [scanner.ranking.markets[k] for k in market_ids if k in scanner.ranking.markets]
+        history = {k: scanner.history[k][-snapshots:] for k in market_ids if scanner.history.get(k)}
+
+    tokens: Dict[str, List[Optional[str]]] = {}
+    for m in markets:
+        yes_tid, no_tid = scanner.get_yes_no_token_ids(m)
+        tokens[str(m.get("id") or m.get("conditionId") or "unknown")] = [yes_tid, no_tid]
+
+    payload = {
+        "version": WARM_CACHE_VERSION,
+        "saved_ts": time.time(),
+        "filters": filters_signature(scanner),
+        "markets": markets,
+        "tokens": tokens,
+        "history": history,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(raw)
+    os.replace(tmp, path)
+    return len(raw)
+
+
+def load_warm_cache(scanner, path: str, max_age_sec: float = WARM_CACHE_MAX_AGE_SEC) -> bool:
+    """
+    Siembra ranking + historial del scanner. False si no hay cache utilizable.
+    """
+    try:
+        with open(path, "rb") as f:
+            payload = json.loads(f.read())
+    except (OSError, ValueError):
+        return False
+
+    if not isinstance(payload, dict) or payload.get("version") != WARM_CACHE_VERSION:
+        return False
+    now = time.time()
+    age = now - float(payload.get("saved_ts") or 0.0)
+    if age > max_age_sec:
+        print(f"🧊 Cache de arranque descartada: {age:.0f}s de antigüedad")
+        return False
+    if payload.get("filters") != filters_signature(scanner):
+        print("🧊 Cache de arranque descartada: filtros distintos")
+        return False
+
+    markets = payload.get("markets") or []
+    cutoff = now - max_age_sec
+    restored = 0
+
+    with scanner.lock:
+        for market_id, snaps in (payload.get("history") or {}).items():
+            if market_id in scanner.history:
+                continue
+            snaps = [s for s in snaps if s.get("ts", 0) >= cutoff][-scanner.max_snapshots:]
+            if snaps:
+                scanner.history[market_id] = snaps
+                restored += len(snaps)
+        scanner.tracked_market_ids = set(payload.get("tokens") or {})
+
+    if markets:
+        scanner.ranking.update(markets, scanner.market_score)
+
+    print(
+        f"♻️ Arranque en caliente: {len(markets)} mercados, {restored} snapshots "
+        f"(cache de hace {age:.0f}s)"
+    )
+    return bool(markets)